@@ -1,36 +1,137 @@
 # reimbursement/admin.py
-import os
-import zipfile
-from io import BytesIO
-from datetime import datetime
+from django import forms
 from django.contrib import admin
-from django.http import HttpResponse, FileResponse
-from django.utils.html import format_html
-from django.urls import path
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from .models import ReimbursementRequest, Notice, AccountBook
+from django.template.response import TemplateResponse
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.html import format_html, format_html_join
+from django.urls import path, reverse
+from .models import (
+    ReimbursementRequest, Notice, AccountBook, LedgerSnapshot, BackgroundJob, InvoiceFingerprint, SpendingSummary,
+    ApprovalSummary, PendingFileDeletion, ArchivedRequest, ArchivedAccountBook
+)
+from .fingerprints import find_duplicates
+from .ledger import aggregate_totals, get_balance
+from .bulk import approve_requests, reject_requests, delete_requests, clear_invoice_files
 from .admin_site import restricted_admin_site
+from .zipstream import stream_zip
+from .xlsx_export import xlsx_response
+from . import exports
+from .jobs import artifact_path, enqueue, retry_jobs, should_run_inline
+from .downloads import FILE_KINDS, serve_file
+from .files import file_deletion_stats, retry_file_deletions
+from .archive import serve_archived
+from .file_metadata import PDF_MIME, empty_metadata, format_file_size, inspect_file, model_values
+from .search import search
+from .reports import APPROVAL_DIMENSIONS, SPENDING_DIMENSIONS, approval_report, parse_month, spending_report
+
+def enqueue_admin_job(model_admin, request, kind, queryset, total, label):
+    """选中记录较多时提交后台任务，立即返回"""
+    ids = list(queryset.values_list('id', flat=True))
+    job = enqueue(kind, {'ids': ids}, user=request.user, total=total)
+    url = reverse(f'{model_admin.admin_site.name}:reimbursement_backgroundjob_change', args=[job.pk])
+    model_admin.message_user(request, format_html(
+        '选中 {} 条记录，已提交后台任务 <a href="{}">#{}（{}）</a>，完成后可在“后台任务”中下载结果',
+        total, url, job.pk, label
+    ))
+    return None
+
+
+class IndexedSearchMixin:
+    """搜索走索引（见 search.py），search_fields 只用于显示搜索框，语义与其相同"""
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search(queryset, search_term), False
+
+
+def file_info_html(filename, size, pages):
+    details = f'文件大小: {format_file_size(size)}'
+    if pages:
+        details += f'，{pages} 页'
+    return format_html(
+        '<div style="padding: 8px; background: #f8f9fa; border-radius: 4px;">'
+        '<div style="margin-bottom: 4px;"><strong>📄 {}</strong></div>'
+        '<div style="color: #666; font-size: 12px;">{}</div>'
+        '</div>',
+        filename, details
+    )
+
+
+class ReimbursementRequestAdminForm(forms.ModelForm):
+    """新上传的文件在保存前检查是否为 PDF，并记录文件信息"""
+    
+    class Meta:
+        model = ReimbursementRequest
+        fields = '__all__'
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        self.file_metadata = {}
+        for kind, field in FILE_KINDS.items():
+            if field not in self.changed_data:
+                continue
+            upload = cleaned_data.get(field)
+            if not upload:
+                self.file_metadata.update(empty_metadata(kind))
+                continue
+            info = inspect_file(upload)
+            if info['mime'] != PDF_MIME:
+                self.add_error(field, '文件内容不是PDF，请上传PDF文件')
+                continue
+            upload.sha256 = info['sha256']  # 存储层直接使用，不再重复计算
+            self.file_metadata.update(model_values(kind, info))
+        return cleaned_data
+
+
+class RejectionForm(forms.Form):
+    rejection_reason = forms.CharField(label='不通过理由', widget=forms.Textarea(attrs={'rows': 4, 'cols': 60}))
+
 
 @admin.register(ReimbursementRequest, site=restricted_admin_site)
-class ReimbursementRequestAdmin(admin.ModelAdmin):
+class ReimbursementRequestAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('submission_date', 'real_name', 'reason', 'amount', 'is_taxi_invoice', 'status', 'user', 'download_link', 'itinerary_download_link', 'pdf_file_link')
-    list_filter = ('status', 'is_taxi_invoice', 'submission_date')
-    search_fields = ('real_name', 'reason', 'user__username')
-    readonly_fields = ('user', 'submission_date', 'last_modified_date', 'download_link', 'itinerary_download_link', 'pdf_file_link', 'itinerary_file_link')
-    actions = ['download_approved_invoices', 'delete_unapproved_requests', 'export_approved_to_excel', 'delete_pdf_files']
+    form = ReimbursementRequestAdminForm
+    list_filter = ('status', 'is_taxi_invoice', 'is_suspected_duplicate', 'submission_date')
+    search_fields = ('real_name', 'reason', 'remarks', 'user__username')
+    ordering = ('-submission_date', '-id')
+    readonly_fields = ('user', 'submission_date', 'last_modified_date', 'approved_at', 'download_link', 'itinerary_download_link', 'pdf_file_link', 'itinerary_file_link', 'is_suspected_duplicate', 'duplicate_requests')
+    actions = ['approve_selected', 'reject_selected', 'download_approved_invoices', 'delete_unapproved_requests', 'export_approved_to_excel', 'delete_pdf_files']
     fieldsets = (
         ('申请详情', {'fields': ('user', 'real_name', 'reason', 'amount', 'invoice_pdf', 'is_taxi_invoice', 'itinerary_pdf', 'remarks')}),
-        ('审核区域', {'fields': ('status', 'rejection_reason')}),
-        ('日期信息', {'fields': ('submission_date', 'last_modified_date')}),
+        ('审核区域', {'fields': ('status', 'rejection_reason', 'is_suspected_duplicate', 'duplicate_requests')}),
+        ('日期信息', {'fields': ('submission_date', 'last_modified_date', 'approved_at')}),
         ('文件管理', {'fields': ('download_link', 'itinerary_download_link', 'pdf_file_link', 'itinerary_file_link')}),
     )
     
+    def save_model(self, request, obj, form, change):
+        for field, value in getattr(form, 'file_metadata', {}).items():
+            setattr(obj, field, value)
+        super().save_model(request, obj, form, change)
+    
+    def get_urls(self):
+        urls = [
+            path('<int:object_id>/file/<str:kind>/', self.admin_site.admin_view(self.file_view),
+                 name='reimbursement_reimbursementrequest_file'),
+        ]
+        return urls + super().get_urls()
+    
+    def file_view(self, request, object_id, kind):
+        """后台下载发票/行程单：权限校验后交给 nginx 发送（见 downloads.py）"""
+        obj = self.get_object(request, str(object_id))
+        if obj is None or kind not in FILE_KINDS or not self.has_view_permission(request, obj):
+            raise Http404
+        return serve_file(request, obj, kind, as_attachment=True)
+    
+    def file_url(self, obj, kind):
+        return reverse(f'{self.admin_site.name}:reimbursement_reimbursementrequest_file', args=[obj.pk, kind])
+    
     def download_link(self, obj):
         """显示发票下载链接"""
         if obj.invoice_pdf and obj.status == 'approved':
-            url = obj.invoice_pdf.url
-            filename = os.path.basename(obj.invoice_pdf.name)
+            url = self.file_url(obj, 'invoice')
+            filename = obj.invoice_display_name
             return format_html('<a href="{}" download="{}" target="_blank">📥 下载发票PDF</a>', url, filename)
         elif obj.invoice_pdf:
             return '<span style="color: #999;">⏳ 待审核通过后可下载</span>'
@@ -40,14 +141,31 @@ class ReimbursementRequestAdmin(admin.ModelAdmin):
     def itinerary_download_link(self, obj):
         """显示行程单下载链接"""
         if obj.itinerary_pdf and obj.status == 'approved':
-            url = obj.itinerary_pdf.url
-            filename = os.path.basename(obj.itinerary_pdf.name)
+            url = self.file_url(obj, 'itinerary')
+            filename = obj.itinerary_display_name
             return format_html('<a href="{}" download="{}" target="_blank">📥 下载行程单</a>', url, filename)
         elif obj.itinerary_pdf:
             return '<span style="color: #999;">⏳ 待审核通过后可下载</span>'
         return '<span style="color: #ccc;">无行程单</span>'
     itinerary_download_link.short_description = '行程单下载'
     
+    def duplicate_requests(self, obj):
+        """列出与本申请发票指纹相同的其他申请"""
+        keys = list(obj.fingerprints.values_list('kind', 'key'))
+        duplicates = find_duplicates(keys, exclude_request_id=obj.pk)
+        if not duplicates:
+            return '-'
+        kinds = dict(InvoiceFingerprint.KIND_CHOICES)
+        return format_html_join(
+            format_html('<br>'), '{}：<a href="{}">#{}</a>',
+            (
+                (kinds[kind], reverse(f'{self.admin_site.name}:reimbursement_reimbursementrequest_change', args=[request_id]), request_id)
+                for kind, request_ids in sorted(duplicates.items())
+                for request_id in sorted(request_ids)
+            ),
+        )
+    duplicate_requests.short_description = '相同发票的其他申请'
+    
     def download_approved_invoices(self, request, queryset):
         """批量下载已审核通过的发票（打包成ZIP）"""
         approved = queryset.filter(status='approved', invoice_pdf__isnull=False)
@@ -56,30 +174,24 @@ class ReimbursementRequestAdmin(admin.ModelAdmin):
             self.message_user(request, '所选申请中没有已审核通过的发票可下载', level='warning')
             return
         
-        # 创建ZIP文件
-        zip_buffer = BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for req in approved:
-                if req.invoice_pdf:
-                    try:
-                        file_path = req.invoice_pdf.path
-                        file_name = os.path.basename(req.invoice_pdf.name)
-                        zip_file.write(file_path, arcname=file_name)
-                    except Exception as e:
-                        self.message_user(request, f'文件 {req.invoice_pdf.name} 读取失败: {str(e)}', level='error')
+        total = approved.count()
+        if not should_run_inline(total):
+            return enqueue_admin_job(self, request, 'invoice_zip', approved, total, '打包发票')
         
-        # 返回ZIP文件
-        zip_buffer.seek(0)
-        response = HttpResponse(zip_buffer.read(), content_type='application/zip')
-        response['Content-Disposition'] = f'attachment; filename="approved_invoices_{queryset.count()}files.zip"'
+        # 流式打包：边读边发送，已压缩的PDF直接存储，内存占用与文件数量无关
+        response = StreamingHttpResponse(
+            stream_zip(exports.invoice_zip_entries(approved)),
+            content_type='application/zip'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{exports.invoice_zip_filename(total)}"'
         
-        self.message_user(request, f'成功打包 {approved.count()} 个已审核发票')
+        self.message_user(request, f'成功打包 {total} 个已审核申请的发票及行程单')
         return response
     
     download_approved_invoices.short_description = '📦 批量下载已审核通过的发票（ZIP）'
     
     def delete_unapproved_requests(self, request, queryset):
-        """删除未审核通过的报销申请（包括文件）"""
+        """删除未审核通过的报销申请（包括文件），按批次删除"""
         # 只能删除待审核或审核不通过的申请
         unapproved = queryset.exclude(status='approved')
         
@@ -87,52 +199,52 @@ class ReimbursementRequestAdmin(admin.ModelAdmin):
             self.message_user(request, '所选申请都已审核通过，无法删除！', level='warning')
             return
         
-        deleted_count = 0
-        for req in unapproved:
-            # 删除关联的文件
-            if req.invoice_pdf:
-                try:
-                    if os.path.exists(req.invoice_pdf.path):
-                        os.remove(req.invoice_pdf.path)
-                except Exception as e:
-                    self.message_user(request, f'发票文件删除失败: {str(e)}', level='error')
-            if req.itinerary_pdf:
-                try:
-                    if os.path.exists(req.itinerary_pdf.path):
-                        os.remove(req.itinerary_pdf.path)
-                except Exception as e:
-                    self.message_user(request, f'行程单文件删除失败: {str(e)}', level='error')
-            # 删除数据库记录
-            req.delete()
-            deleted_count += 1
-        
+        deleted_count = delete_requests(unapproved)
         self.message_user(request, f'成功删除 {deleted_count} 条未审核通过的申请及其文件')
     
     delete_unapproved_requests.short_description = '🗑️ 删除未审核通过的申请（释放空间）'
     
+    def approve_selected(self, request, queryset):
+        """批量审核通过，并一次性添加到记账本"""
+        approved_count = approve_requests(queryset)
+        if not approved_count:
+            self.message_user(request, '所选申请都已审核通过', level='warning')
+            return
+        self.message_user(request, f'成功审核通过 {approved_count} 条申请，已添加到记账本')
+    
+    approve_selected.short_description = '✅ 批量审核通过'
+    
+    def reject_selected(self, request, queryset):
+        """批量审核不通过，先显示填写统一不通过理由的页面"""
+        if 'apply' in request.POST:
+            form = RejectionForm(request.POST)
+            if form.is_valid():
+                rejected_count = reject_requests(queryset, form.cleaned_data['rejection_reason'])
+                skipped = queryset.count() - rejected_count
+                message = f'已将 {rejected_count} 条申请标记为审核不通过'
+                if skipped:
+                    message += f'（跳过 {skipped} 条已审核通过的申请）'
+                self.message_user(request, message)
+                return None
+        else:
+            form = RejectionForm()
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': '批量审核不通过',
+            'opts': self.model._meta,
+            'queryset': queryset,
+            'form': form,
+            'action_checkbox_name': admin.helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, 'admin/reimbursement/reject_selected.html', context)
+    
+    reject_selected.short_description = '❌ 批量审核不通过（填写统一理由）'
+    
     def pdf_file_link(self, obj):
-        """显示PDF文件信息和删除按钮"""
+        """显示PDF文件信息（来自保存文件时记录的字段，不访问文件系统）"""
         if obj.invoice_pdf:
-            filename = os.path.basename(obj.invoice_pdf.name)
-            file_size = ''
-            try:
-                size_bytes = obj.invoice_pdf.size
-                if size_bytes < 1024:
-                    file_size = f'{size_bytes} B'
-                elif size_bytes < 1024 * 1024:
-                    file_size = f'{size_bytes / 1024:.1f} KB'
-                else:
-                    file_size = f'{size_bytes / (1024 * 1024):.1f} MB'
-            except:
-                file_size = '未知大小'
-            
-            return format_html(
-                '<div style="padding: 8px; background: #f8f9fa; border-radius: 4px;">'
-                '<div style="margin-bottom: 4px;"><strong>📄 {}</strong></div>'
-                '<div style="color: #666; font-size: 12px;">文件大小: {}</div>'
-                '</div>',
-                filename, file_size
-            )
+            return file_info_html(obj.invoice_display_name, obj.invoice_size, obj.invoice_pages)
         return format_html('<span style="color: #999;">无PDF文件</span>')
     
     pdf_file_link.short_description = 'PDF文件信息'
@@ -140,26 +252,7 @@ class ReimbursementRequestAdmin(admin.ModelAdmin):
     def itinerary_file_link(self, obj):
         """显示行程单文件信息"""
         if obj.itinerary_pdf:
-            filename = os.path.basename(obj.itinerary_pdf.name)
-            file_size = ''
-            try:
-                size_bytes = obj.itinerary_pdf.size
-                if size_bytes < 1024:
-                    file_size = f'{size_bytes} B'
-                elif size_bytes < 1024 * 1024:
-                    file_size = f'{size_bytes / 1024:.1f} KB'
-                else:
-                    file_size = f'{size_bytes / (1024 * 1024):.1f} MB'
-            except:
-                file_size = '未知大小'
-            
-            return format_html(
-                '<div style="padding: 8px; background: #f8f9fa; border-radius: 4px;">'
-                '<div style="margin-bottom: 4px;"><strong>📄 {}</strong></div>'
-                '<div style="color: #666; font-size: 12px;">文件大小: {}</div>'
-                '</div>',
-                filename, file_size
-            )
+            return file_info_html(obj.itinerary_display_name, obj.itinerary_size, obj.itinerary_pages)
         return format_html('<span style="color: #999;">无行程单文件</span>')
     
     itinerary_file_link.short_description = '行程单文件信息'
@@ -172,20 +265,7 @@ class ReimbursementRequestAdmin(admin.ModelAdmin):
             self.message_user(request, '所选申请中没有PDF文件', level='warning')
             return
         
-        deleted_count = 0
-        for req in has_pdf:
-            if req.invoice_pdf:
-                try:
-                    # 删除物理文件
-                    if os.path.exists(req.invoice_pdf.path):
-                        os.remove(req.invoice_pdf.path)
-                    # 清空数据库字段
-                    req.invoice_pdf = None
-                    req.save()
-                    deleted_count += 1
-                except Exception as e:
-                    self.message_user(request, f'删除 {req.real_name} 的PDF文件失败: {str(e)}', level='error')
-        
+        deleted_count = clear_invoice_files(has_pdf)
         self.message_user(request, f'成功删除 {deleted_count} 个PDF文件（申请记录保留）')
     
     delete_pdf_files.short_description = '🗑️ 删除选中申请的PDF文件'
@@ -198,60 +278,16 @@ class ReimbursementRequestAdmin(admin.ModelAdmin):
             self.message_user(request, '所选申请中没有已审核通过的记录', level='warning')
             return
         
-        # 创建Excel工作簿
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "已审核报销申请"
-        
-        # 设置表头
-        headers = ['提交日期', '提交人姓名', '报销事由', '金额', '备注']
-        ws.append(headers)
-        
-        # 设置表头样式
-        header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-        header_font = Font(bold=True, color='FFFFFF', size=12)
-        for cell in ws[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # 添加数据
-        for req in approved:
-            ws.append([
-                req.submission_date.strftime('%Y-%m-%d'),
-                req.real_name,
-                req.reason,
-                -float(req.amount),  # 负数形式，方便计算
-                req.remarks or ''
-            ])
+        total = approved.count()
+        if not should_run_inline(total):
+            return enqueue_admin_job(self, request, 'approved_excel', approved, total, '导出Excel')
         
-        # 设置列宽
-        ws.column_dimensions['A'].width = 15
-        ws.column_dimensions['B'].width = 15
-        ws.column_dimensions['C'].width = 30
-        ws.column_dimensions['D'].width = 12
-        ws.column_dimensions['E'].width = 40
-        
-        # 设置金额列格式为标准数字格式（带两位小数）
-        for row in range(2, ws.max_row + 1):
-            cell = ws.cell(row=row, column=4)
-            cell.number_format = '#,##0.00'
-            cell.alignment = Alignment(horizontal='right')
-        
-        # 保存到内存
-        excel_buffer = BytesIO()
-        wb.save(excel_buffer)
-        excel_buffer.seek(0)
-        
-        # 返回Excel文件
-        filename = f'approved_reimbursements_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        response = HttpResponse(
-            excel_buffer.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        response = xlsx_response(
+            exports.approved_export_filename(), exports.APPROVED_EXPORT_SHEET,
+            exports.APPROVED_EXPORT_COLUMNS, exports.approved_export_rows(approved)
         )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         
-        self.message_user(request, f'成功导出 {approved.count()} 条已审核记录到Excel')
+        self.message_user(request, f'成功导出 {total} 条已审核记录到Excel')
         return response
     
     export_approved_to_excel.short_description = '📊 导出已审核通过的申请到Excel表格'
@@ -271,7 +307,7 @@ class NoticeAdmin(admin.ModelAdmin):
     ordering = ['-priority', '-created_at']
 
 @admin.register(AccountBook, site=restricted_admin_site)
-class AccountBookAdmin(admin.ModelAdmin):
+class AccountBookAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('entry_date', 'real_name', 'reason', 'amount_display', 'entry_type', 'remarks_short', 'reimbursement_link')
     list_filter = ('entry_type', 'entry_date')
     search_fields = ('real_name', 'reason', 'remarks')
@@ -327,83 +363,31 @@ class AccountBookAdmin(admin.ModelAdmin):
     
     def export_to_excel(self, request, queryset):
         """导出选中的记账记录到Excel"""
-        # 创建工作簿
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "财务记账本"
-        
-        # 设置表头样式
-        header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-        header_font = Font(color='FFFFFF', bold=True, size=12)
-        header_alignment = Alignment(horizontal='center', vertical='center')
-        
-        # 表头
-        headers = ['记账日期', '提交人姓名', '报销事由', '金额', '备注']
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = header_alignment
-        
-        # 设置列宽
-        ws.column_dimensions['A'].width = 20
-        ws.column_dimensions['B'].width = 15
-        ws.column_dimensions['C'].width = 30
-        ws.column_dimensions['D'].width = 15
-        ws.column_dimensions['E'].width = 40
-        
-        # 填充数据
-        for row_num, entry in enumerate(queryset.order_by('entry_date'), 2):
-            ws.cell(row=row_num, column=1, value=entry.entry_date.strftime('%Y-%m-%d %H:%M'))
-            ws.cell(row=row_num, column=2, value=entry.real_name)
-            ws.cell(row=row_num, column=3, value=entry.reason)
-            
-            # 金额显示（收入为正，支出为负）
-            amount_value = float(entry.amount) if entry.entry_type == 'income' else -float(entry.amount)
-            amount_cell = ws.cell(row=row_num, column=4, value=amount_value)
-            amount_cell.number_format = '#,##0.00'
-            
-            ws.cell(row=row_num, column=5, value=entry.remarks or '')
+        total = queryset.count()
+        if not should_run_inline(total):
+            return enqueue_admin_job(self, request, 'account_book_excel', queryset, total, '导出Excel')
         
-        # 保存到BytesIO
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        # 返回Excel文件
-        filename = f'财务记账本_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        response = HttpResponse(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        response = xlsx_response(
+            exports.account_book_export_filename(), exports.ACCOUNT_BOOK_EXPORT_SHEET,
+            exports.ACCOUNT_BOOK_EXPORT_COLUMNS, exports.account_book_export_rows(queryset)
         )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         
-        self.message_user(request, f'成功导出 {queryset.count()} 条记账记录到Excel')
+        self.message_user(request, f'成功导出 {total} 条记账记录到Excel')
         return response
     
     export_to_excel.short_description = '📊 导出选中记录到Excel'
     
     def calculate_balance(self, request, queryset):
-        """计算账户余额"""
-        from decimal import Decimal
-        
-        # 计算所有记录（不仅是选中的）
-        all_entries = AccountBook.objects.all()
-        
-        total_income = Decimal('0.00')
-        total_expense = Decimal('0.00')
-        
-        for entry in all_entries:
-            if entry.entry_type == 'income':
-                total_income += entry.amount
-            else:  # reimbursement 或 expense
-                total_expense += entry.amount
-        
+        """计算选中记录的收支合计及账户余额（数据库聚合 + 月度快照，不逐行加载）"""
+        selected_income, selected_expense, selected_count = aggregate_totals(queryset)
+        total_income, total_expense = get_balance()
         balance = total_income - total_expense
         
         # 显示消息
         message = (
             f'💰 账户余额计算结果：\n'
+            f'选中 {selected_count} 条记录：收入 ¥{selected_income:,.2f}，支出 ¥{selected_expense:,.2f}，'
+            f'净额 ¥{selected_income - selected_expense:,.2f}\n'
             f'总收入：¥{total_income:,.2f}\n'
             f'总支出：¥{total_expense:,.2f}\n'
             f'当前余额：¥{balance:,.2f}'
@@ -416,3 +400,287 @@ class AccountBookAdmin(admin.ModelAdmin):
     
     calculate_balance.short_description = '💰 计算账户余额'
 
+@admin.register(LedgerSnapshot, site=restricted_admin_site)
+class LedgerSnapshotAdmin(admin.ModelAdmin):
+    """月度结账快照只读展示，由记账记录自动维护"""
+    list_display = ('period', 'income', 'expense', 'entry_count', 'closing_income', 'closing_expense', 'closing_balance', 'closed_at')
+    date_hierarchy = 'period'
+    
+    def closing_balance(self, obj):
+        return f'¥{obj.closing_balance:,.2f}'
+    closing_balance.short_description = '月末余额'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class ReportForm(forms.Form):
+    GROUP_CHOICES = [('month', '月份'), ('person', '姓名'), ('entry_type', '类型（记账汇总）'), ('taxi', '打车/非打车（审核汇总）')]
+    group_by = forms.MultipleChoiceField(label='分组', choices=GROUP_CHOICES, required=False, widget=forms.CheckboxSelectMultiple)
+    start = forms.CharField(label='起始月份', required=False, widget=forms.TextInput(attrs={'placeholder': 'YYYY-MM', 'size': 8}))
+    end = forms.CharField(label='截止月份', required=False, widget=forms.TextInput(attrs={'placeholder': 'YYYY-MM', 'size': 8}))
+    person = forms.CharField(label='姓名', required=False)
+    
+    def clean_month(self, name):
+        value = self.cleaned_data[name]
+        if not value:
+            return None
+        try:
+            return parse_month(value)
+        except ValueError:
+            raise forms.ValidationError('月份格式应为 YYYY-MM')
+    
+    def clean_start(self):
+        return self.clean_month('start')
+    
+    def clean_end(self):
+        return self.clean_month('end')
+
+
+REPORT_LABELS = {'month': '月份', 'person': '姓名', 'entry_type': '类型', 'taxi': '打车/非打车'}
+
+
+def report_cell(name, value):
+    if name == 'month':
+        return value.strftime('%Y-%m')
+    if name == 'entry_type':
+        return dict(AccountBook.ENTRY_TYPE_CHOICES).get(value, value)
+    if name == 'taxi':
+        return '打车' if value else '非打车'
+    return value
+
+
+def report_table(title, group_by, rows, extra_columns):
+    """报表行转为表头和单元格，供模板直接输出"""
+    headers = [REPORT_LABELS[name] for name in group_by] + ['金额', '笔数'] + [label for label, _ in extra_columns]
+    cells = [
+        [report_cell(name, row[name]) for name in group_by]
+        + [f"¥{row['amount']:,.2f}", row['count']]
+        + [row[key] for _, key in extra_columns]
+        for row in rows
+    ]
+    return {'title': title, 'headers': headers, 'rows': cells}
+
+
+class SummaryAdmin(admin.ModelAdmin):
+    """汇总表只读展示，由记账记录和报销申请自动维护（见 reports.py）"""
+    change_list_template = 'admin/reimbursement/summary_change_list.html'
+    date_hierarchy = 'period'
+    search_fields = ('real_name',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        urls = [
+            path('report/', self.admin_site.admin_view(self.report_view), name='%s_%s_report' % info),
+        ]
+        return urls + super().get_urls()
+    
+    def report_view(self, request):
+        """按所选维度汇总记账金额和审核通过情况（只查询汇总表）"""
+        form = ReportForm(request.GET or {'group_by': ['month', 'person']})
+        tables = []
+        if form.is_valid():
+            data = form.cleaned_data
+            filters = {'start': data['start'], 'end': data['end'], 'person': data['person'] or None}
+            spending_group = [name for name in data['group_by'] if name in SPENDING_DIMENSIONS]
+            approval_group = [name for name in data['group_by'] if name in APPROVAL_DIMENSIONS]
+            tables = [
+                report_table('记账金额', spending_group, spending_report(spending_group, **filters), []),
+                report_table('审核通过的报销', approval_group, approval_report(approval_group, **filters),
+                             [('平均审核耗时（小时）', 'average_latency_hours')]),
+            ]
+        context = {
+            **self.admin_site.each_context(request),
+            'title': '报销统计报表',
+            'opts': self.model._meta,
+            'form': form,
+            'tables': tables,
+        }
+        return TemplateResponse(request, 'admin/reimbursement/spending_report.html', context)
+
+
+@admin.register(SpendingSummary, site=restricted_admin_site)
+class SpendingSummaryAdmin(SummaryAdmin):
+    list_display = ('period', 'real_name', 'entry_type', 'amount', 'entry_count')
+    list_filter = ('entry_type',)
+
+
+@admin.register(ApprovalSummary, site=restricted_admin_site)
+class ApprovalSummaryAdmin(SummaryAdmin):
+    list_display = ('period', 'real_name', 'is_taxi_invoice', 'approved_count', 'amount', 'average_latency_display')
+    list_filter = ('is_taxi_invoice',)
+    
+    def average_latency_display(self, obj):
+        if obj.average_latency is None:
+            return '-'
+        return f'{obj.average_latency / 3600:.1f} 小时'
+    average_latency_display.short_description = '平均审核耗时'
+
+
+@admin.register(BackgroundJob, site=restricted_admin_site)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    """后台任务：查看进度、下载结果、重试失败任务"""
+    list_display = ('id', 'kind', 'status', 'progress_display', 'attempts', 'created_by', 'created_at', 'finished_at', 'result_link')
+    list_filter = ('status', 'kind')
+    actions = ['retry_failed']
+    readonly_fields = (
+        'kind', 'status', 'progress_display', 'attempts', 'max_attempts', 'message', 'error', 'result_link',
+        'created_by', 'created_at', 'run_after', 'started_at', 'heartbeat_at', 'finished_at',
+    )
+    fields = readonly_fields
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def get_urls(self):
+        urls = [
+            path('<int:job_id>/download/', self.admin_site.admin_view(self.download_view),
+                 name='reimbursement_backgroundjob_download'),
+        ]
+        return urls + super().get_urls()
+    
+    def download_view(self, request, job_id):
+        job = get_object_or_404(BackgroundJob, pk=job_id, status='succeeded')
+        if not job.result_file:
+            raise Http404('该任务没有生成文件')
+        try:
+            result = open(artifact_path(job.result_file), 'rb')
+        except FileNotFoundError:
+            raise Http404('结果文件已被删除')
+        return FileResponse(result, as_attachment=True, filename=job.result_name)
+    
+    def progress_display(self, obj):
+        if obj.total:
+            return f'{obj.progress}/{obj.total}（{obj.progress * 100 // obj.total}%）'
+        return str(obj.progress) if obj.progress else '-'
+    progress_display.short_description = '进度'
+    
+    def result_link(self, obj):
+        if obj.status == 'succeeded' and obj.result_file:
+            url = reverse(f'{self.admin_site.name}:reimbursement_backgroundjob_download', args=[obj.pk])
+            return format_html('<a href="{}">📥 {}</a>', url, obj.result_name)
+        return obj.message or '-'
+    result_link.short_description = '结果'
+    
+    def retry_failed(self, request, queryset):
+        count = retry_jobs(queryset)
+        self.message_user(request, f'已重新排队 {count} 个失败任务')
+    retry_failed.short_description = '🔁 重试失败的任务'
+
+
+@admin.register(PendingFileDeletion, site=restricted_admin_site)
+class PendingFileDeletionAdmin(admin.ModelAdmin):
+    """待删除文件：由 run_jobs worker 删除，这里只查看积压和失败原因"""
+    list_display = ('name', 'created_at', 'run_after', 'attempts', 'last_error')
+    list_filter = ('attempts',)
+    search_fields = ('name',)
+    actions = ['retry_now']
+    readonly_fields = ('name', 'created_at', 'run_after', 'attempts', 'last_error')
+    fields = readonly_fields
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def changelist_view(self, request, extra_context=None):
+        stats = file_deletion_stats()
+        self.message_user(
+            request,
+            f'待删除 {stats["pending"]} 个文件，已到期 {stats["due"]} 个，重试中 {stats["retrying"]} 个，'
+            f'最早的登记于 {stats["oldest_age"]} 秒前',
+        )
+        return super().changelist_view(request, extra_context)
+    
+    def retry_now(self, request, queryset):
+        count = retry_file_deletions(queryset)
+        self.message_user(request, f'已安排立即删除 {count} 个文件')
+    retry_now.short_description = '🔁 立即重新删除'
+
+
+class ArchivedAccountBookInline(admin.TabularInline):
+    model = ArchivedAccountBook
+    fields = ('entry_date', 'entry_type', 'real_name', 'reason', 'amount', 'remarks')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedRequest, site=restricted_admin_site)
+class ArchivedRequestAdmin(admin.ModelAdmin):
+    """
+    归档的报销申请（只读）：归档表很大，不输入关键词时不查询，按需搜索
+    文件从月度归档中直接读取
+    """
+    list_display = ('original_id', 'submission_date', 'real_name', 'reason', 'amount', 'is_taxi_invoice', 'username', 'download_link', 'itinerary_download_link')
+    search_fields = ('real_name', 'reason', 'remarks', 'username', '=original_id')
+    show_full_result_count = False
+    inlines = [ArchivedAccountBookInline]
+    readonly_fields = (
+        'original_id', 'username', 'real_name', 'reason', 'amount', 'is_taxi_invoice', 'remarks', 'status',
+        'submission_date', 'approved_at', 'download_link', 'itinerary_download_link', 'container', 'archived_at',
+    )
+    fields = readonly_fields
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset.none(), False
+        return super().get_search_results(request, queryset, search_term)
+    
+    def changelist_view(self, request, extra_context=None):
+        if not request.GET.get('q'):
+            self.message_user(request, '归档数据较多，请输入姓名、事由、备注、用户名或原申请ID搜索')
+        return super().changelist_view(request, extra_context)
+    
+    def get_urls(self):
+        urls = [
+            path('<int:archived_id>/file/<str:kind>/', self.admin_site.admin_view(self.file_view),
+                 name='reimbursement_archivedrequest_file'),
+        ]
+        return urls + super().get_urls()
+    
+    def file_view(self, request, archived_id, kind):
+        """后台查看归档的发票/行程单：与在线申请相同，需有查看权限"""
+        obj = self.get_object(request, str(archived_id))
+        if obj is None or kind not in FILE_KINDS or not self.has_view_permission(request, obj):
+            raise Http404
+        return serve_archived(obj, kind)
+    
+    def file_link(self, obj, kind, label):
+        if not getattr(obj, f'{kind}_member'):
+            return format_html('<span style="color: #ccc;">无文件</span>')
+        url = reverse(f'{self.admin_site.name}:reimbursement_archivedrequest_file', args=[obj.pk, kind])
+        return format_html('<a href="{}" target="_blank">📥 {}</a>', url, label)
+    
+    def download_link(self, obj):
+        return self.file_link(obj, 'invoice', '发票PDF')
+    download_link.short_description = '发票下载'
+    
+    def itinerary_download_link(self, obj):
+        return self.file_link(obj, 'itinerary', '行程单')
+    itinerary_download_link.short_description = '行程单下载'
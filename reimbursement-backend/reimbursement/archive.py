@@ -0,0 +1,284 @@
+# reimbursement/archive.py
+"""
+冷数据归档：把提交超过 ARCHIVE_AFTER_DAYS 天的已通过申请移出热表（manage.py archive_requests）
+
+- 申请及其关联的记账记录、发票指纹复制到 ArchivedRequest / ArchivedAccountBook / ArchivedFingerprint，
+  再从热表删除（不处理逐行删除信号）：统计汇总表不变，记账记录所在月份都已结账，余额由 LedgerSnapshot 保存
+- 发票/行程单按提交月份写入 ARCHIVE_ROOT/<年>/<年-月>.zip，成员名为 <sha256>.pdf（同一内容只存一份）；
+  zip 末尾的中央目录即索引，读取单个文件时直接定位，不解压整个归档
+- 写归档时先写临时文件，校验新成员的 CRC 后再替换；数据库事务失败时归档中多出的成员无害，重新执行会复用
+- 热表中的原文件登记删除（files.queue_file_deletions），仍被其他申请引用的文件保留
+- 原申请ID保存在 ArchivedRequest.original_id：原下载链接（/api/reimbursements/<ID>/files/<类型>/）继续可用，
+  重复报销检查也会查归档的指纹
+- 只归档记账记录都在已结账月份中的申请；汇总表、记账快照的全量校验会把归档数据一并计入
+"""
+import os
+import shutil
+import zipfile
+from datetime import timedelta
+from uuid import uuid4
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.db.models.functions import TruncMonth
+from django.http import FileResponse, Http404
+from django.utils import timezone
+from .downloads import FILE_KINDS, content_disposition
+from .files import queue_file_deletions
+from .fingerprints import stored_digest
+from .ledger import close_periods, month_of, month_start, next_month
+from .models import (
+    AccountBook, ArchivedAccountBook, ArchivedFingerprint, ArchivedRequest, InvoiceFingerprint, ReimbursementRequest,
+    suppress_delete_signals,
+)
+from .search import unindex
+from .storage import media_storage, path_sha256
+from .sync import record_deletions
+
+ARCHIVE_BATCH_SIZE = 500
+VERIFY_CHUNK_SIZE = 1024 * 1024
+# 原样复制到 ArchivedRequest 的字段
+REQUEST_FIELDS = (
+    'real_name', 'reason', 'amount', 'is_taxi_invoice', 'remarks', 'status', 'submission_date', 'last_modified_date',
+    'approved_at', 'invoice_filename', 'itinerary_filename',
+    'invoice_size', 'invoice_pages', 'invoice_sha256', 'invoice_mime',
+    'itinerary_size', 'itinerary_pages', 'itinerary_sha256', 'itinerary_mime',
+)
+ENTRY_FIELDS = ('entry_date', 'entry_type', 'real_name', 'reason', 'amount', 'remarks', 'created_at', 'created_by_id')
+
+
+def archive_path(relative):
+    return os.path.join(settings.ARCHIVE_ROOT, relative)
+
+
+def container_name(period):
+    return f'{period.year}/{period.strftime("%Y-%m")}.zip'
+
+
+def default_cutoff():
+    return timezone.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+
+
+def candidates(cutoff):
+    """
+    可归档的申请：已通过、提交早于 cutoff，且关联的记账记录都在已结账的月份（本月之前）
+    调用前先 close_periods()，保证本月之前的月份都有快照
+    """
+    boundary = month_start(month_of(timezone.now()))
+    open_entries = AccountBook.objects.filter(reimbursement_id=OuterRef('pk'), entry_date__gte=boundary)
+    return (
+        ReimbursementRequest.objects.filter(status='approved', submission_date__lt=min(cutoff, boundary))
+        .exclude(Exists(open_entries))
+    )
+
+
+def pending_months(cutoff):
+    """{月份: 申请数}"""
+    rows = (
+        candidates(cutoff).annotate(month=TruncMonth('submission_date'))
+        .values('month').annotate(count=Count('id')).order_by('month')
+    )
+    return {month_of(row['month']): row['count'] for row in rows}
+
+
+# ── 归档文件 ──────────────────────────────────────────────────────────────
+
+def member_name(name, digest=''):
+    """归档中的成员名：<sha256><扩展名>，与热表的按内容寻址一致"""
+    ext = os.path.splitext(name)[1].lower() or '.pdf'
+    digest = stored_digest(name) or digest or path_sha256(media_storage.path(name))
+    return f'{digest}{ext}'
+
+
+def verify_members(path, members):
+    """读完每个成员，zipfile 在读到末尾时校验 CRC，损坏时抛出 BadZipFile"""
+    with zipfile.ZipFile(path) as zf:
+        for member in members:
+            with zf.open(member) as f:
+                while f.read(VERIFY_CHUNK_SIZE):
+                    pass
+
+
+def write_container(relative, files):
+    """
+    把 files {成员名: 存储名称} 写入月度归档（已有的成员跳过，磁盘上不存在的文件跳过）
+    在副本上追加、校验后原子替换，读取中的旧文件不受影响；返回归档中的全部成员名
+    """
+    path = archive_path(relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{uuid4().hex}.tmp'
+    try:
+        exists = os.path.exists(path)
+        if exists:
+            shutil.copyfile(path, temp_path)
+        added = []
+        with zipfile.ZipFile(temp_path, 'a' if exists else 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            present = set(zf.namelist())
+            for member, name in sorted(files.items()):
+                source = media_storage.path(name)
+                if member in present or not os.path.isfile(source):
+                    continue
+                zf.write(source, member)
+                present.add(member)
+                added.append(member)
+        if added:
+            verify_members(temp_path, added)
+            with open(temp_path, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        return present
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+# ── 归档 ──────────────────────────────────────────────────────────────────
+
+def request_files(req):
+    """{类型: (存储名称, 成员名)}，没有文件的类型不包含"""
+    result = {}
+    for kind, field in FILE_KINDS.items():
+        name = getattr(req, field).name
+        if not name:
+            continue
+        try:
+            result[kind] = (name, member_name(name, getattr(req, f'{kind}_sha256')))
+        except FileNotFoundError:
+            result[kind] = (name, '')
+    return result
+
+
+def container_files(ids):
+    """{成员名: 存储名称}：这些申请要写入归档的文件"""
+    files = {}
+    for offset in range(0, len(ids), ARCHIVE_BATCH_SIZE):
+        for req in ReimbursementRequest.objects.filter(pk__in=ids[offset:offset + ARCHIVE_BATCH_SIZE]):
+            for name, member in request_files(req).values():
+                if member:
+                    files[member] = name
+    return files
+
+
+def archive_batch(container, present, ids):
+    """把一批申请转入归档表（文件已写入 container，present 为其中的成员名），返回 (归档数, 文件缺失数)"""
+    missing = 0
+    with transaction.atomic():
+        # 写归档期间被修改的申请以数据库中的最新值为准，文件不在归档中的留到下次
+        current = ReimbursementRequest.objects.select_for_update().filter(pk__in=ids, status='approved')
+        archived = []
+        names = []
+        for req in current.select_related('user'):
+            members = {}
+            skip = False
+            stored = request_files(req)
+            for kind, (name, member) in stored.items():
+                if member in present:
+                    members[kind] = member
+                elif member and os.path.isfile(media_storage.path(name)):
+                    skip = True
+                else:
+                    missing += 1
+                    print(f"归档时文件不存在: 申请 #{req.pk} {name}")
+            if skip:
+                continue
+            names.extend(name for name, _ in stored.values())
+            archived.append(ArchivedRequest(
+                original_id=req.pk, user_id=req.user_id, username=req.user.username,
+                container=container if members else '',
+                invoice_member=members.get('invoice', ''), itinerary_member=members.get('itinerary', ''),
+                **{field: getattr(req, field) for field in REQUEST_FIELDS},
+            ))
+        if not archived:
+            return 0, missing
+        ArchivedRequest.objects.bulk_create(archived)
+        by_original = {item.original_id: item for item in archived}
+        request_ids = list(by_original)
+
+        entries = list(AccountBook.objects.filter(reimbursement_id__in=request_ids).values_list(
+            'pk', 'reimbursement_id', *ENTRY_FIELDS,
+        ))
+        ArchivedAccountBook.objects.bulk_create([
+            ArchivedAccountBook(
+                original_id=pk, request=by_original[request_id], **dict(zip(ENTRY_FIELDS, values)),
+            )
+            for pk, request_id, *values in entries
+        ])
+        fingerprints = InvoiceFingerprint.objects.filter(request_id__in=request_ids).values_list('kind', 'key', 'request_id')
+        ArchivedFingerprint.objects.bulk_create([
+            ArchivedFingerprint(kind=kind, key=key, request=by_original[request_id])
+            for kind, key, request_id in fingerprints
+        ])
+
+        # 从热表删除（发票指纹级联删除），逐行删除信号不处理：汇总表和记账快照保持不变
+        entry_ids = [entry[0] for entry in entries]
+        record_deletions([(item.original_id, item.user_id) for item in archived])
+        unindex(AccountBook, entry_ids)
+        unindex(ReimbursementRequest, request_ids)
+        with suppress_delete_signals():
+            AccountBook.objects.filter(pk__in=entry_ids).delete()
+            ReimbursementRequest.objects.filter(pk__in=request_ids).delete()
+        queue_file_deletions(names)
+    return len(archived), missing
+
+
+def archive_month(period, cutoff, log=print):
+    """归档某月全部可归档的申请，返回 (归档数, 文件缺失数)"""
+    start, end = month_start(period), month_start(next_month(period))
+    ids = list(
+        candidates(cutoff).filter(submission_date__gte=start, submission_date__lt=end)
+        .order_by('pk').values_list('pk', flat=True)
+    )
+    if not ids:
+        return 0, 0
+    # 整月的文件一次写入归档：每批各写一次时，每次都要复制整个归档，数据量随批数平方增长
+    container = container_name(period)
+    present = write_container(container, container_files(ids))
+    archived = missing = 0
+    for offset in range(0, len(ids), ARCHIVE_BATCH_SIZE):
+        batch_archived, batch_missing = archive_batch(container, present, ids[offset:offset + ARCHIVE_BATCH_SIZE])
+        archived += batch_archived
+        missing += batch_missing
+        log(f'{period.strftime("%Y-%m")}：已归档 {archived}/{len(ids)} 条')
+    return archived, missing
+
+
+def archive_requests(cutoff=None, log=print):
+    """归档所有可归档的申请，返回 (归档数, 文件缺失数)"""
+    cutoff = cutoff or default_cutoff()
+    close_periods()
+    archived = missing = 0
+    for period in pending_months(cutoff):
+        month_archived, month_missing = archive_month(period, cutoff, log)
+        archived += month_archived
+        missing += month_missing
+    return archived, missing
+
+
+# ── 读取 ──────────────────────────────────────────────────────────────────
+
+def open_member(archived, kind):
+    """打开归档中的文件（只读取该成员，不解压整个归档），不存在时抛出 Http404"""
+    member = getattr(archived, f'{kind}_member')
+    if not member or not archived.container:
+        raise Http404('文件不存在')
+    try:
+        zf = zipfile.ZipFile(archive_path(archived.container))
+    except (OSError, zipfile.BadZipFile):
+        raise Http404('归档文件不存在')
+    try:
+        return zf.open(member)
+    except KeyError:
+        raise Http404('文件不存在')
+    finally:
+        # 已打开的成员持有底层文件，关闭 ZipFile 后仍可读取
+        zf.close()
+
+
+def serve_archived(archived, kind, as_attachment=False):
+    source = open_member(archived, kind)
+    download_name = archived.invoice_display_name if kind == 'invoice' else archived.itinerary_display_name
+    response = FileResponse(source, content_type='application/pdf')
+    response['Content-Disposition'] = content_disposition(download_name, as_attachment)
+    response['Cache-Control'] = 'private, max-age=3600'
+    response['ETag'] = f'"{os.path.splitext(getattr(archived, f"{kind}_member"))[0]}"'
+    return response
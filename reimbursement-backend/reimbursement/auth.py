@@ -0,0 +1,148 @@
+# reimbursement/auth.py
+"""
+JWT 认证的用户缓存：已认证的请求不再每次按 user_id 查询 auth_user
+
+- 进程内缓存，键为 (用户ID, 令牌版本)，有效期 AUTH_USER_CACHE_TTL 秒
+- 令牌版本写在 JWT 的 ver 声明中，取自 get_session_auth_hash()（由密码哈希派生）：
+  修改密码后旧令牌的版本对不上，认证失败，也不会命中旧缓存；没有 ver 的旧令牌不校验版本
+- 用户保存或删除时（信号）清除本进程中该用户的缓存，并递增共享缓存中的代数；
+  其他 gunicorn 进程最多每 AUTH_USER_CACHE_CHECK_INTERVAL 秒检查一次代数，变化时清空本进程缓存
+- 登录成功时直接把用户放入缓存，随后的接口请求即可命中
+- 缓存的用户不带权限缓存，权限组变化不受影响（has_perm 每个请求重新查询）
+- 命中/未命中次数定期累加到共享缓存，manage.py auth_cache_stats 查看命中率
+"""
+import copy
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+VERSION_CLAIM = 'ver'
+GENERATION_KEY = 'auth:user-cache:generation'
+STATS_KEYS = {'hits': 'auth:user-cache:hits', 'misses': 'auth:user-cache:misses'}
+STATS_FLUSH_INTERVAL = 60
+# 权限缓存不随用户缓存复用，每个请求重新查询
+PERM_CACHE_ATTRS = ('_perm_cache', '_user_perm_cache', '_group_perm_cache')
+
+
+def token_version(user):
+    return user.get_session_auth_hash()[:16]
+
+
+class UserCache:
+    """单进程内的用户缓存（gevent 下各协程共享）"""
+
+    def __init__(self):
+        self.entries = {}  # (用户ID, 令牌版本) -> (用户, 过期时间)
+        self.generation = None
+        self.checked_at = 0.0
+        self.stats = {'hits': 0, 'misses': 0}
+        self.flushed_at = time.monotonic()
+
+    def check_generation(self):
+        now = time.monotonic()
+        if now - self.checked_at < settings.AUTH_USER_CACHE_CHECK_INTERVAL:
+            return
+        self.checked_at = now
+        generation = cache.get(GENERATION_KEY, 0)
+        if generation != self.generation:
+            self.entries.clear()
+            self.generation = generation
+        if now - self.flushed_at >= STATS_FLUSH_INTERVAL:
+            self.flush_stats()
+
+    def get(self, user_id, version):
+        self.check_generation()
+        entry = self.entries.get((str(user_id), version))
+        if entry is not None and entry[1] > time.monotonic():
+            self.stats['hits'] += 1
+            return copy.copy(entry[0])
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, user, version):
+        self.check_generation()  # 先同步代数，避免刚放入的用户被随后的检查清掉
+        now = time.monotonic()
+        if len(self.entries) >= settings.AUTH_USER_CACHE_SIZE:
+            self.entries = {key: entry for key, entry in self.entries.items() if entry[1] > now}
+            if len(self.entries) >= settings.AUTH_USER_CACHE_SIZE:
+                self.entries.clear()
+        user = copy.copy(user)
+        for attr in PERM_CACHE_ATTRS:
+            user.__dict__.pop(attr, None)
+        self.entries[(str(user.pk), version)] = (user, now + settings.AUTH_USER_CACHE_TTL)
+
+    def invalidate(self, user_id):
+        user_id = str(user_id)
+        for key in [key for key in self.entries if key[0] == user_id]:
+            del self.entries[key]
+
+    def flush_stats(self):
+        """把本进程的计数累加到共享缓存（文件缓存的 incr 不是原子操作，并发时计数是近似值）"""
+        self.flushed_at = time.monotonic()
+        for name, count in self.stats.items():
+            if not count:
+                continue
+            try:
+                cache.incr(STATS_KEYS[name], count)
+            except ValueError:
+                cache.set(STATS_KEYS[name], count, None)
+            self.stats[name] = 0
+
+
+user_cache = UserCache()
+
+
+def invalidate_user(user_id):
+    """用户信息变化：清除本进程缓存，并通知其他进程清空缓存"""
+    user_cache.invalidate(user_id)
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def remember_user(user):
+    """登录成功后放入缓存"""
+    user_cache.put(user, token_version(user))
+
+
+def cache_stats():
+    """返回共享缓存中累计的 (命中次数, 未命中次数)"""
+    user_cache.flush_stats()
+    return cache.get(STATS_KEYS['hits'], 0), cache.get(STATS_KEYS['misses'], 0)
+
+
+def reset_cache_stats():
+    cache.delete_many(list(STATS_KEYS.values()))
+
+
+class VersionedTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """签发的令牌带上令牌版本（刷新得到的访问令牌沿用该声明）"""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[VERSION_CLAIM] = token_version(user)
+        return token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """与 JWTAuthentication 相同，但用户先从缓存中查找"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+        version = validated_token.get(VERSION_CLAIM, '')
+        user = user_cache.get(user_id, version)
+        if user is None:
+            user = super().get_user(validated_token)
+            if version and token_version(user) != version:
+                raise AuthenticationFailed('密码已修改，请重新登录', code='token_version_mismatch')
+            user_cache.put(user, version)
+        return user
@@ -0,0 +1,93 @@
+# reimbursement/bulk.py
+"""
+后台批量审核/删除：按批次发出一条 UPDATE/DELETE，不逐行 save()/delete()，
+记账、审核汇总、搜索索引和文件清理在这里集中批量处理
+（删除用 QuerySet.delete() 处理级联，在 suppress_delete_signals() 中执行，逐行的删除信号不再重复处理）
+"""
+from django.db import transaction
+from django.utils import timezone
+from .file_metadata import empty_metadata
+from .files import queue_file_deletions
+from .ledger import post_approved
+from .models import ReimbursementRequest, suppress_delete_signals
+from .reports import apply_bulk_requests
+from .search import unindex
+from .sync import record_deletions
+
+BATCH_SIZE = 1000
+
+
+def batched(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def approve_requests(queryset):
+    """批量审核通过并为新通过的申请记账，返回新通过的数量"""
+    ids = list(queryset.exclude(status='approved').values_list('id', flat=True))
+    if not ids:
+        return 0
+    now = timezone.now()
+    with transaction.atomic():
+        approved = []
+        for batch in batched(ids):
+            # 再次限定状态：并发审核时只处理本次真正发生状态变化的行
+            rows = ReimbursementRequest.objects.filter(pk__in=batch).exclude(status='approved')
+            batch_ids = list(rows.select_for_update().values_list('id', flat=True))
+            ReimbursementRequest.objects.filter(pk__in=batch_ids).update(
+                status='approved', rejection_reason='', approved_at=now, last_modified_date=now
+            )
+            apply_bulk_requests(batch_ids)
+            approved.extend(batch_ids)
+        post_approved(approved)
+    return len(approved)
+
+
+def reject_requests(queryset, reason):
+    """批量审核不通过（已通过的申请已记账，不在此处理），返回处理数量"""
+    ids = list(queryset.exclude(status='approved').values_list('id', flat=True))
+    now = timezone.now()
+    rejected = 0
+    with transaction.atomic():
+        for batch in batched(ids):
+            # 按实际更新的行数计数：期间被其他管理员审核通过的申请不会被更新
+            rejected += ReimbursementRequest.objects.filter(pk__in=batch).exclude(status='approved').update(
+                status='rejected', rejection_reason=reason, last_modified_date=now
+            )
+    return rejected
+
+
+def delete_requests(queryset):
+    """
+    批量删除申请，关联的记账记录按 SET_NULL 解除关联，发票指纹级联删除（QuerySet.delete()）
+    审核汇总、搜索索引、删除记录按批处理；文件在同一事务中登记删除，提交后由 worker 批量删除，返回删除的申请数量
+    """
+    rows = list(queryset.values_list('id', 'user_id', 'invoice_pdf', 'itinerary_pdf'))
+    if not rows:
+        return 0
+    ids = [row[0] for row in rows]
+    names = [name for row in rows for name in row[2:] if name]
+    with transaction.atomic(), suppress_delete_signals():
+        record_deletions([row[:2] for row in rows])
+        for batch in batched(ids):
+            apply_bulk_requests(batch, sign=-1)
+            unindex(ReimbursementRequest, batch)
+            ReimbursementRequest.objects.filter(pk__in=batch).delete()
+        queue_file_deletions(names)
+    return len(ids)
+
+
+def clear_invoice_files(queryset):
+    """批量清空发票文件字段（保留申请记录），文件登记删除、提交后由 worker 批量删除，返回处理数量"""
+    rows = list(queryset.exclude(invoice_pdf='').exclude(invoice_pdf__isnull=True).values_list('id', 'invoice_pdf'))
+    if not rows:
+        return 0
+    now = timezone.now()
+    with transaction.atomic():
+        for batch in batched([row[0] for row in rows]):
+            ReimbursementRequest.objects.filter(pk__in=batch).update(
+                invoice_pdf=None, invoice_filename='', last_modified_date=now, **empty_metadata('invoice')
+            )
+        names = [row[1] for row in rows]
+        queue_file_deletions(names)
+    return len(rows)
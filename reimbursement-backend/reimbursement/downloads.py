@@ -0,0 +1,155 @@
+# reimbursement/downloads.py
+"""
+发票/行程单下载：先校验权限，再交给 nginx 传输文件
+
+- 前端拿到的是带签名的短期链接（新标签页打开时无法携带 JWT），签名只对指定申请的指定文件有效
+- 配置了 MEDIA_ACCEL_REDIRECT_PREFIX 时返回 X-Accel-Redirect，由 nginx 的 internal location 发送文件（支持 sendfile 和 Range）
+- 未配置时（开发环境或没有 nginx）由 Django 分块发送，支持单个 Range 请求
+"""
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from .storage import is_blob, media_storage
+
+DOWNLOAD_SALT = 'reimbursement.download'
+FILE_KINDS = {'invoice': 'invoice_pdf', 'itinerary': 'itinerary_pdf'}
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def download_token(request_id, kind):
+    return signing.dumps([request_id, kind], salt=DOWNLOAD_SALT, compress=False)
+
+
+def check_download_token(token, request_id, kind):
+    """签名有效、未过期且与申请和文件类型一致"""
+    try:
+        value = signing.loads(token, salt=DOWNLOAD_SALT, max_age=settings.DOWNLOAD_URL_MAX_AGE)
+    except signing.BadSignature:  # 包含 SignatureExpired
+        return False
+    return value == [request_id, kind]
+
+
+def signed_download_url(obj, kind):
+    """报销申请文件的短期下载链接（相对路径）"""
+    url = reverse('reimbursement-file', args=[obj.pk, kind])
+    return f'{url}?token={download_token(obj.pk, kind)}'
+
+
+class DownloadUrlBuilder:
+    """
+    批量生成签名下载链接：域名前缀、路径模板和签名器只准备一次，结果与 signed_download_url 相同
+    列表接口每行都要生成两个链接，逐行 reverse() 和 build_absolute_uri() 的开销比签名本身还大
+    """
+    PK_PLACEHOLDER = 987654321
+
+    def __init__(self, request=None):
+        self.prefix = request.build_absolute_uri('/')[:-1] if request is not None else ''
+        self.signer = signing.TimestampSigner(salt=DOWNLOAD_SALT)
+        self.templates = {}
+        for kind in FILE_KINDS:
+            head, tail = reverse('reimbursement-file', args=[self.PK_PLACEHOLDER, kind]).split(str(self.PK_PLACEHOLDER))
+            self.templates[kind] = (self.prefix + head, f'{tail}?token=')
+
+    def __call__(self, request_id, kind):
+        head, tail = self.templates[kind]
+        return f'{head}{request_id}{tail}{self.signer.sign_object([request_id, kind])}'
+
+
+def content_disposition(filename, as_attachment=False):
+    disposition = 'attachment' if as_attachment else 'inline'
+    try:
+        filename.encode('ascii')
+        escaped = filename.replace('\\', '\\\\').replace('"', r'\"')
+        return f'{disposition}; filename="{escaped}"'
+    except UnicodeEncodeError:
+        return f"{disposition}; filename*=utf-8''{quote(filename)}"
+
+
+def serve_file(request, obj, kind, as_attachment=False):
+    """返回申请的发票或行程单，下载文件名使用显示文件名"""
+    field_file = getattr(obj, FILE_KINDS[kind])
+    if not field_file:
+        raise Http404('文件不存在')
+    download_name = obj.invoice_display_name if kind == 'invoice' else obj.itinerary_display_name
+    return file_response(request, field_file.name, download_name, as_attachment)
+
+
+def file_response(request, name, download_name, as_attachment=False):
+    """X-Accel-Redirect 或支持 Range 的流式响应"""
+    prefix = settings.MEDIA_ACCEL_REDIRECT_PREFIX
+    if prefix:
+        response = HttpResponse(content_type='application/pdf')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(name)
+    else:
+        path = media_storage.path(name)
+        if not os.path.isfile(path):
+            raise Http404('文件不存在')
+        response = ranged_file_response(request, path)
+    response['Content-Disposition'] = content_disposition(download_name, as_attachment)
+    response['Cache-Control'] = 'private, max-age=3600'
+    if is_blob(name):
+        # 按内容寻址存储的文件内容不会变化，文件名即 ETag
+        response['ETag'] = f'"{os.path.splitext(os.path.basename(name))[0]}"'
+    return response
+
+
+def can_view_all_files(user):
+    return user.is_active and user.is_staff and user.has_perm('reimbursement.view_reimbursementrequest')
+
+
+def staff_media_view(request, name):
+    """MEDIA_URL 只对已登录后台的管理员开放（后台表单中的“当前文件”链接），其他人一律 404"""
+    if not can_view_all_files(request.user):
+        raise Http404
+    try:
+        media_storage.path(name)  # 拒绝越出 MEDIA_ROOT 的路径
+    except SuspiciousFileOperation:
+        raise Http404
+    return file_response(request, name, os.path.basename(name))
+
+
+def ranged_file_response(request, path):
+    """没有反向代理时的回退：整文件用 FileResponse，单个 Range 请求返回 206"""
+    size = os.path.getsize(path)
+    match = RANGE_RE.match(request.headers.get('Range', '').strip())
+    if not match or match.groups() == ('', ''):
+        response = FileResponse(open(path, 'rb'), content_type='application/pdf')
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    start, end = match.groups()
+    if start:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    else:
+        # bytes=-N：最后 N 个字节
+        start = max(size - int(end), 0)
+        end = size - 1
+    if start >= size or start > end:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    response = StreamingHttpResponse(read_range(path, start, end), status=206, content_type='application/pdf')
+    response['Content-Length'] = str(end - start + 1)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def read_range(path, start, end):
+    remaining = end - start + 1
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while remaining > 0:
+            data = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
@@ -0,0 +1,202 @@
+# reimbursement/events.py
+"""
+审核结果推送（Server-Sent Events），由 ASGI 入口直接处理，不经过 Django 中间件和视图
+
+- 前端先用 JWT 换取订阅凭证（ticket），再用 EventSource 连接 STATUS_EVENTS_PATH?ticket=...
+- 每个进程一个 StatusHub：连接按用户登记各自的队列，只有一个后台协程轮询数据库
+  （WHERE last_modified_date >= 水位，走 last_modified_date 索引），再分发给对应用户的连接；
+  空闲连接只占一个协程和一个队列，不占线程和数据库连接，也不需要 Redis 等外部消息服务
+- 审核在其他进程中保存（gunicorn、后台批量操作）也能发现：批量操作同样更新 last_modified_date
+- 事件 id 为同步游标，断线重连时浏览器带上 Last-Event-ID，补发断线期间的变化
+- 连接的队列积压（客户端读取太慢）时断开连接，由客户端重连补发
+"""
+import asyncio
+import json
+from datetime import timedelta
+from urllib.parse import parse_qs, urlencode
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import close_old_connections
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from .sync import decode_cursor, encode_cursor
+
+STATUS_EVENTS_PATH = '/api/reimbursements/events/'
+EVENTS_SALT = 'reimbursement.events'
+STATUS_FIELDS = ('id', 'user_id', 'status', 'rejection_reason', 'last_modified_date')
+QUEUE_SIZE = 100
+REPLAY_LIMIT = 500
+RETRY_MS = 5000  # 浏览器断线后重连的等待时间
+
+
+def event_ticket(user):
+    return signing.dumps(user.pk, salt=EVENTS_SALT, compress=False)
+
+
+def check_event_ticket(ticket):
+    """返回凭证中的用户ID，无效或过期时返回 None"""
+    try:
+        return signing.loads(ticket, salt=EVENTS_SALT, max_age=settings.STATUS_EVENT_TICKET_MAX_AGE)
+    except signing.BadSignature:  # 包含 SignatureExpired
+        return None
+
+
+def status_events_url(user, last_event_id=None):
+    params = {'ticket': event_ticket(user)}
+    if last_event_id:
+        params['last_event_id'] = last_event_id
+    return f'{STATUS_EVENTS_PATH}?{urlencode(params)}'
+
+
+def fetch_changes(since, user_id=None):
+    """last_modified_date >= since 的申请，返回 [(id, user_id, status, rejection_reason, last_modified_date)]"""
+    from .models import ReimbursementRequest
+    close_old_connections()
+    queryset = ReimbursementRequest.objects.filter(last_modified_date__gte=since)
+    queryset = queryset.order_by('last_modified_date').values_list(*STATUS_FIELDS)
+    if user_id is not None:
+        # 断线补发：走 (user, last_modified_date) 索引
+        queryset = queryset.filter(user_id=user_id)[:REPLAY_LIMIT]
+    return list(queryset)
+
+
+def format_event(row):
+    request_id, _, status, rejection_reason, modified = row
+    data = json.dumps({
+        'id': request_id,
+        'status': status,
+        'rejection_reason': rejection_reason,
+        'last_modified_date': modified.isoformat(),
+    }, ensure_ascii=False)
+    return f'id: {encode_cursor(modified)}\nevent: status\ndata: {data}\n\n'.encode('utf-8')
+
+
+class StatusHub:
+    """单进程内的订阅表和轮询协程"""
+
+    def __init__(self):
+        self.subscribers = {}  # 用户ID -> {队列}
+        self.task = None
+        self.watermark = None
+        self.sent = {}  # 申请ID -> 已分发的 last_modified_date，重叠窗口内去重
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        if self.task is None or self.task.done():
+            self.watermark = timezone.now()
+            self.task = asyncio.ensure_future(self.poll())
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self.subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_id]
+
+    @staticmethod
+    def close(queue):
+        """清空队列并放入结束标记，连接读到后断开"""
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def poll(self):
+        overlap = timedelta(seconds=settings.DELTA_SYNC_OVERLAP)
+        while self.subscribers:
+            await asyncio.sleep(settings.STATUS_EVENT_POLL_INTERVAL)
+            started = timezone.now()
+            try:
+                rows = await sync_to_async(fetch_changes)(self.watermark - overlap)
+            except Exception as e:  # 数据库暂时不可用：保留水位，下一轮重试
+                print(f"状态推送轮询失败: {e}")
+                continue
+            self.dispatch(rows)
+            self.watermark = started
+            self.sent = {pk: moment for pk, moment in self.sent.items() if moment >= started - overlap}
+
+    def dispatch(self, rows):
+        for row in rows:
+            request_id, user_id, modified = row[0], row[1], row[4]
+            if self.sent.get(request_id) == modified:
+                continue
+            self.sent[request_id] = modified
+            for queue in list(self.subscribers.get(user_id, ())):
+                try:
+                    queue.put_nowait(row)
+                except asyncio.QueueFull:
+                    self.close(queue)
+
+
+hub = StatusHub()
+
+
+async def send_json(send, status, body):
+    await send({
+        'type': 'http.response.start', 'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps(body, ensure_ascii=False).encode('utf-8')})
+
+
+def resume_point(scope, params):
+    """Last-Event-ID 请求头（浏览器自动重连）或 last_event_id 参数（前端重新获取凭证后连接）"""
+    value = dict(scope['headers']).get(b'last-event-id', b'').decode('latin-1')
+    value = value or params.get('last_event_id', [''])[0]
+    if not value:
+        return None
+    try:
+        return decode_cursor(value)
+    except NotFound:
+        return None
+
+
+async def status_events_app(scope, receive, send):
+    """ASGI 应用：GET STATUS_EVENTS_PATH?ticket=... 返回 text/event-stream"""
+    if scope['method'] != 'GET':
+        return await send_json(send, 405, {'detail': '只支持 GET'})
+    params = parse_qs(scope['query_string'].decode('latin-1'))
+    user_id = check_event_ticket(params.get('ticket', [''])[0])
+    if user_id is None:
+        return await send_json(send, 403, {'detail': '订阅凭证无效或已过期'})
+
+    queue = hub.subscribe(user_id)
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        hub.close(queue)
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        await send({
+            'type': 'http.response.start', 'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),  # nginx 不缓冲，事件立即发出
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': f'retry: {RETRY_MS}\n\n'.encode(), 'more_body': True})
+        since = resume_point(scope, params)
+        if since is not None:
+            overlap = timedelta(seconds=settings.DELTA_SYNC_OVERLAP)
+            for row in await sync_to_async(fetch_changes)(since - overlap, user_id):
+                await send({'type': 'http.response.body', 'body': format_event(row), 'more_body': True})
+        while True:
+            try:
+                row = await asyncio.wait_for(queue.get(), settings.STATUS_EVENT_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # 注释行保持连接，防止代理因空闲断开
+                await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                continue
+            if row is None:
+                break
+            await send({'type': 'http.response.body', 'body': format_event(row), 'more_body': True})
+        if not watcher.done():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        watcher.cancel()
+        hub.unsubscribe(user_id, queue)
@@ -0,0 +1,72 @@
+# reimbursement/exports.py
+"""后台导出的内容定义（列、行数据、压缩包条目），后台操作和后台任务共用"""
+from datetime import datetime
+from openpyxl.styles import Alignment
+from .xlsx_export import ExcelColumn
+from .zipstream import safe_folder_name
+
+APPROVED_EXPORT_COLUMNS = [
+    ExcelColumn('提交日期', 15),
+    ExcelColumn('提交人姓名', 15),
+    ExcelColumn('报销事由', 30),
+    ExcelColumn('金额', 12, number_format='#,##0.00', alignment=Alignment(horizontal='right')),
+    ExcelColumn('备注', 40),
+]
+APPROVED_EXPORT_SHEET = '已审核报销申请'
+
+ACCOUNT_BOOK_EXPORT_COLUMNS = [
+    ExcelColumn('记账日期', 20),
+    ExcelColumn('提交人姓名', 15),
+    ExcelColumn('报销事由', 30),
+    ExcelColumn('金额', 15, number_format='#,##0.00'),
+    ExcelColumn('备注', 40),
+]
+ACCOUNT_BOOK_EXPORT_SHEET = '财务记账本'
+
+
+def timestamp():
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def approved_export_filename():
+    return f'approved_reimbursements_{timestamp()}.xlsx'
+
+
+def account_book_export_filename():
+    return f'财务记账本_{timestamp()}.xlsx'
+
+
+def invoice_zip_filename(total):
+    return f'approved_invoices_{total}files.zip'
+
+
+def approved_export_rows(queryset):
+    """已审核报销申请的导出行，金额为负数形式，方便计算"""
+    rows = queryset.filter(status='approved').order_by('submission_date').values_list(
+        'submission_date', 'real_name', 'reason', 'amount', 'remarks'
+    )
+    for submission_date, real_name, reason, amount, remarks in rows.iterator(chunk_size=2000):
+        yield [submission_date.strftime('%Y-%m-%d'), real_name, reason, -float(amount), remarks or '']
+
+
+def account_book_export_rows(queryset):
+    """记账记录的导出行（收入为正，支出为负）"""
+    rows = queryset.order_by('entry_date').values_list(
+        'entry_date', 'entry_type', 'real_name', 'reason', 'amount', 'remarks'
+    )
+    for entry_date, entry_type, real_name, reason, amount, remarks in rows.iterator(chunk_size=2000):
+        amount_value = float(amount) if entry_type == 'income' else -float(amount)
+        yield [entry_date.strftime('%Y-%m-%d %H:%M'), real_name, reason, amount_value, remarks or '']
+
+
+def invoice_zip_entries(queryset):
+    """按人分文件夹列出已审核申请的发票和行程单：(磁盘路径, 压缩包内路径)"""
+    rows = queryset.filter(status='approved', invoice_pdf__isnull=False).only(
+        'real_name', 'invoice_pdf', 'itinerary_pdf', 'invoice_filename', 'itinerary_filename'
+    ).order_by('real_name', 'pk')
+    for req in rows.iterator(chunk_size=500):
+        folder = safe_folder_name(req.real_name)
+        if req.invoice_pdf:
+            yield req.invoice_pdf.path, f'{folder}/{req.invoice_display_name}'
+        if req.itinerary_pdf:
+            yield req.itinerary_pdf.path, f'{folder}/{req.itinerary_display_name}'
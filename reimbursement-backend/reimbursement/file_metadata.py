@@ -0,0 +1,101 @@
+# reimbursement/file_metadata.py
+"""
+发票/行程单的文件信息：大小、页数、SHA-256、按内容识别的文件类型
+
+- 在文件保存时计算一次并写入模型的 <kind>_size / _pages / _sha256 / _mime 字段
+  （提交/修改申请的序列化器、后台编辑表单），后台列表只读数据库列，不再逐行访问文件系统
+- 文件类型按文件头识别，不信任客户端提供的 Content-Type 和扩展名；不是 PDF 的文件在提交时拒绝
+- 页数需要安装 pypdf，未安装或解析失败时为空
+- 旧数据由 manage.py backfill_file_metadata 补齐
+"""
+import os
+from .storage import file_sha256, media_storage
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # 未安装 pypdf 时不记录页数
+    PdfReader = None
+
+PDF_MIME = 'application/pdf'
+# PDF 规范允许 %PDF- 之前有少量字节
+SNIFF_SIZE = 1024
+SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+    (b'PK\x03\x04', 'application/zip'),
+)
+METADATA_SUFFIXES = ('size', 'pages', 'sha256', 'mime')
+
+
+def metadata_fields(kind):
+    return [f'{kind}_{suffix}' for suffix in METADATA_SUFFIXES]
+
+
+def empty_metadata(kind):
+    """文件被清空时的字段值"""
+    return {f'{kind}_size': None, f'{kind}_pages': None, f'{kind}_sha256': '', f'{kind}_mime': ''}
+
+
+def sniff_mime(head):
+    if b'%PDF-' in head[:SNIFF_SIZE]:
+        return PDF_MIME
+    for signature, mime in SIGNATURES:
+        if head.startswith(signature):
+            return mime
+    return 'application/octet-stream'
+
+
+def count_pages(source):
+    if PdfReader is None:
+        return None
+    try:
+        return len(PdfReader(source, strict=False).pages)
+    except Exception as e:
+        print(f"读取PDF页数失败: {e}")
+        return None
+
+
+def inspect_file(source, digest=None):
+    """
+    source 为上传的文件对象或磁盘路径，返回 {'size', 'pages', 'sha256', 'mime'}
+    digest 已知时（存储名称中含哈希、上传时已计算）不再重新读取整个文件
+    """
+    if not hasattr(source, 'read'):
+        with open(source, 'rb') as f:
+            return inspect_file(f, digest)
+    source.seek(0)
+    head = source.read(SNIFF_SIZE)
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    source.seek(0)
+    mime = sniff_mime(head)
+    info = {
+        'size': size,
+        'pages': count_pages(source) if mime == PDF_MIME else None,
+        'sha256': digest or getattr(source, 'sha256', None) or file_sha256(source),
+        'mime': mime,
+    }
+    source.seek(0)
+    return info
+
+
+def inspect_stored(name, digest=None):
+    """已在存储中的文件（分片上传完成的文件、补齐旧数据）"""
+    return inspect_file(media_storage.path(name), digest)
+
+
+def model_values(kind, info):
+    """inspect_file 的结果转为模型字段"""
+    return {f'{kind}_{suffix}': info[suffix] for suffix in METADATA_SUFFIXES}
+
+
+def format_file_size(size):
+    """字节数转为便于阅读的大小"""
+    if size is None:
+        return '未知大小'
+    if size < 1024:
+        return f'{size} B'
+    if size < 1024 * 1024:
+        return f'{size / 1024:.1f} KB'
+    return f'{size / (1024 * 1024):.1f} MB'
@@ -0,0 +1,164 @@
+# reimbursement/files.py
+"""
+媒体文件的删除（按引用计数）
+
+- 请求中不直接删除文件：queue_file_deletions() 在当前事务中登记 PendingFileDeletion，
+  事务回滚时登记一并撤销，不会出现记录还在、文件已被删除的情况
+- run_jobs worker 空闲时调用 drain_file_deletions()：领取一批到期的登记，用线程池并发删除；
+  仍被引用的文件只撤销登记，宽限期内的文件推迟，删除失败的按指数退避重试
+- file_deletion_stats() 汇总积压情况（manage.py file_deletion_stats、后台“待删除文件”）
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from uuid import uuid4
+from django.conf import settings
+from django.db.models import Count, F, Max, Min, Q
+from django.utils import timezone
+from .storage import blob_in_grace_period, is_blob, media_storage
+
+CLAIM_LEASE = 600           # 领取后未处理完（worker 退出）的登记在此秒数后可被重新领取
+RETRY_BASE_DELAY = 30       # 第 n 次失败后等待 30 * 2^(n-1) 秒再重试
+RETRY_MAX_DELAY = 3600
+
+
+def referenced_names(names):
+    """返回 names 中仍被报销申请（发票或行程单）或尚未使用的已完成上传引用的名称"""
+    from .models import ReimbursementRequest, UploadSession
+    names = list(names)
+    if not names:
+        return set()
+    referenced = set(
+        ReimbursementRequest.objects.filter(invoice_pdf__in=names).values_list('invoice_pdf', flat=True)
+    )
+    referenced.update(
+        ReimbursementRequest.objects.filter(itinerary_pdf__in=names).values_list('itinerary_pdf', flat=True)
+    )
+    referenced.update(
+        UploadSession.objects.filter(file__in=names, status='complete').values_list('file', flat=True)
+    )
+    return referenced
+
+
+def remove_file(name):
+    """删除一个存储文件，返回错误信息（成功或文件不存在时为 None）"""
+    try:
+        os.remove(media_storage.path(name))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        return str(e)
+    return None
+
+
+def remove_media_files(names):
+    """
+    按存储名称批量删除文件，不存在的文件直接跳过
+    仍被其他记录引用的文件、刚写入或刚被复用的文件（宽限期内）不删除
+    返回 (已删除数量, 失败列表[(名称, 错误信息)])
+    """
+    names = {name for name in names if name}
+    names -= referenced_names(names)
+    removed = 0
+    failures = []
+    for name in sorted(names):
+        if is_blob(name) and blob_in_grace_period(name):
+            continue
+        error = remove_file(name)
+        if error:
+            print(f"删除文件失败: {name}, 错误: {error}")
+            failures.append((name, error))
+        else:
+            removed += 1
+    return removed, failures
+
+
+# ── 延迟删除 ──────────────────────────────────────────────────────────────
+
+def queue_file_deletions(names, delay=0):
+    """在当前事务中登记待删除的文件，提交后才会被 worker 看到；delay 秒内不删除"""
+    from .models import PendingFileDeletion
+    names = sorted({name for name in names if name})
+    if not names:
+        return
+    run_after = timezone.now() + timedelta(seconds=delay)
+    # 同一文件已有登记时保留原登记
+    PendingFileDeletion.objects.bulk_create(
+        [PendingFileDeletion(name=name, run_after=run_after) for name in names],
+        batch_size=settings.FILE_DELETE_BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def claim_file_deletions(batch_size):
+    """领取一批到期的登记；条件 UPDATE 保证多个 worker 不会领取同一条，返回 (领取标记, {名称: 失败次数})"""
+    from .models import PendingFileDeletion
+    now = timezone.now()
+    ids = list(
+        PendingFileDeletion.objects.filter(run_after__lte=now)
+        .order_by('run_after').values_list('pk', flat=True)[:batch_size]
+    )
+    if not ids:
+        return None, {}
+    token = uuid4().hex
+    PendingFileDeletion.objects.filter(pk__in=ids, run_after__lte=now).update(
+        claim=token, run_after=now + timedelta(seconds=CLAIM_LEASE),
+    )
+    return token, dict(PendingFileDeletion.objects.filter(claim=token).values_list('name', 'attempts'))
+
+
+def drain_file_deletions(batch_size=None, threads=None):
+    """删除一批到期的待删除文件，返回领取的登记数（0 表示没有到期的登记）"""
+    from .models import PendingFileDeletion
+    token, claimed = claim_file_deletions(batch_size or settings.FILE_DELETE_BATCH_SIZE)
+    if not claimed:
+        return 0
+    referenced = referenced_names(claimed)
+    recent = {name for name in claimed.keys() - referenced if is_blob(name) and blob_in_grace_period(name)}
+    to_remove = sorted(claimed.keys() - referenced - recent)
+    with ThreadPoolExecutor(max_workers=threads or settings.FILE_DELETE_THREADS) as executor:
+        errors = dict(zip(to_remove, executor.map(remove_file, to_remove)))
+
+    rows = PendingFileDeletion.objects.filter(claim=token)
+    # 仍被引用的文件不删除，只撤销登记；引用消失时会再次登记
+    done = referenced | {name for name, error in errors.items() if error is None}
+    rows.filter(name__in=done).delete()
+    now = timezone.now()
+    rows.filter(name__in=recent).update(
+        claim='', run_after=now + timedelta(seconds=settings.MEDIA_BLOB_DELETE_GRACE),
+    )
+    for name, error in errors.items():
+        if error is None:
+            continue
+        print(f"删除文件失败: {name}, 错误: {error}")
+        attempts = claimed[name] + 1
+        rows.filter(name=name).update(
+            claim='', attempts=F('attempts') + 1, last_error=error,
+            run_after=now + timedelta(seconds=retry_delay(attempts)),
+        )
+    return len(claimed)
+
+
+def retry_file_deletions(queryset):
+    """后台手动重试：立即重新删除"""
+    return queryset.update(claim='', run_after=timezone.now())
+
+
+def file_deletion_stats():
+    """积压情况：登记数、已到期数、重试中的数量、最多失败次数、最早登记距今秒数"""
+    from .models import PendingFileDeletion
+    now = timezone.now()
+    stats = PendingFileDeletion.objects.aggregate(
+        pending=Count('pk'),
+        due=Count('pk', filter=Q(run_after__lte=now)),
+        retrying=Count('pk', filter=Q(attempts__gt=0)),
+        max_attempts=Max('attempts'),
+        oldest=Min('created_at'),
+    )
+    oldest = stats.pop('oldest')
+    stats['max_attempts'] = stats['max_attempts'] or 0
+    stats['oldest_age'] = int((now - oldest).total_seconds()) if oldest else 0
+    return stats
@@ -0,0 +1,128 @@
+# reimbursement/fingerprints.py
+"""
+发票指纹：提交时检测重复报销
+
+每张发票生成三类指纹，保存在 InvoiceFingerprint 表，按 (kind, key) 索引查找：
+- sha256：文件内容哈希，完全相同的文件
+- invoice_no：从 PDF 文本中提取的发票代码+号码（需要安装 pypdf，提取不到时跳过）
+- amount_date：金额 + 开票日期（提取不到开票日期时用提交日期），只作为“疑似重复”提示
+
+文件哈希或发票号码相同视为重复报销，直接拒绝；金额和日期相同只标记疑似重复，由管理员判断。
+已被审核不通过的申请不参与比较，可以重新提交。
+"""
+import os
+import re
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Q
+from .storage import file_sha256, is_blob
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # 未安装 pypdf 时只使用文件哈希和金额+日期
+    PdfReader = None
+
+BLOCKING_KINDS = ('sha256', 'invoice_no')
+
+INVOICE_NO_RE = re.compile(r'发票号码[:：\s]*(\d{8,20})')
+INVOICE_CODE_RE = re.compile(r'发票代码[:：\s]*(\d{10,12})')
+INVOICE_DATE_RE = re.compile(r'开票日期[:：\s]*(\d{4})\s*年\s*(\d{1,2})\s*月\s*(\d{1,2})\s*日')
+
+
+def amount_date_key(amount, invoice_date):
+    return f'{Decimal(amount).quantize(Decimal("0.01"))}@{invoice_date.isoformat()}'
+
+
+def extract_invoice_info(source):
+    """
+    从 PDF 首页文本中提取发票号码和开票日期，source 为路径或文件对象
+    返回 {'invoice_no': ..., 'invoice_date': date}，提取不到的项不返回
+    """
+    if PdfReader is None:
+        return {}
+    try:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        reader = PdfReader(source)
+        text = reader.pages[0].extract_text() if reader.pages else ''
+    except Exception as e:
+        print(f"读取发票PDF文本失败: {e}")
+        return {}
+    finally:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+
+    info = {}
+    text = text or ''
+    number = INVOICE_NO_RE.search(text)
+    if number:
+        code = INVOICE_CODE_RE.search(text)
+        # 旧版发票号码只在同一发票代码下唯一；全电发票只有 20 位号码
+        info['invoice_no'] = f'{code.group(1)}-{number.group(1)}' if code else number.group(1)
+    issued = INVOICE_DATE_RE.search(text)
+    if issued:
+        try:
+            info['invoice_date'] = date(*(int(part) for part in issued.groups()))
+        except ValueError:
+            pass
+    return info
+
+
+def invoice_fingerprints(source, amount, fallback_date, digest=None):
+    """计算一张发票的指纹列表 [(kind, key)]"""
+    if digest is None:
+        if hasattr(source, 'read'):
+            digest = file_sha256(source)
+        else:
+            with open(source, 'rb') as f:
+                digest = file_sha256(f)
+    info = extract_invoice_info(source)
+    keys = [
+        ('sha256', digest),
+        ('amount_date', amount_date_key(amount, info.get('invoice_date') or fallback_date)),
+    ]
+    if info.get('invoice_no'):
+        keys.append(('invoice_no', info['invoice_no']))
+    return keys
+
+
+def stored_digest(name):
+    """按内容寻址存储的文件名中已包含哈希，无需重新读取文件"""
+    if is_blob(name):
+        return os.path.splitext(os.path.basename(name))[0]
+    return None
+
+
+def find_duplicates(keys, exclude_request_id=None):
+    """按指纹查找其他未被驳回的申请（包括已归档的申请，返回原申请ID），返回 {kind: {申请ID, ...}}"""
+    from .models import ArchivedFingerprint, InvoiceFingerprint
+    query = Q()
+    for kind, key in keys:
+        query |= Q(kind=kind, key=key)
+    if not query:
+        return {}
+    matches = InvoiceFingerprint.objects.filter(query).exclude(request__status='rejected')
+    if exclude_request_id is not None:
+        matches = matches.exclude(request_id=exclude_request_id)
+    found = defaultdict(set)
+    for kind, request_id in matches.values_list('kind', 'request_id'):
+        found[kind].add(request_id)
+    for kind, request_id in ArchivedFingerprint.objects.filter(query).values_list('kind', 'request__original_id'):
+        found[kind].add(request_id)
+    return dict(found)
+
+
+def save_fingerprints(request_ids_to_keys):
+    """替换若干申请的指纹：{申请ID: [(kind, key)]}"""
+    from .models import InvoiceFingerprint
+    if not request_ids_to_keys:
+        return
+    with transaction.atomic():
+        InvoiceFingerprint.objects.filter(request_id__in=list(request_ids_to_keys)).delete()
+        InvoiceFingerprint.objects.bulk_create([
+            InvoiceFingerprint(kind=kind, key=key, request_id=request_id)
+            for request_id, keys in request_ids_to_keys.items()
+            for kind, key in dict.fromkeys(keys)
+        ])
@@ -0,0 +1,229 @@
+# reimbursement/jobs.py
+"""
+基于数据库的后台任务：不依赖外部消息队列
+
+- enqueue() 写入一条 BackgroundJob 后立即返回
+- manage.py run_jobs 启动若干 worker 进程，用条件 UPDATE 领取任务（同一任务只会被一个进程领取）
+- 任务失败时按指数退避重新排队，超过最多尝试次数后标记为失败
+- 生成的文件保存在 JOB_ARTIFACT_ROOT，只能通过后台下载
+"""
+import os
+import time
+import traceback
+from datetime import timedelta
+from uuid import uuid4
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from . import exports
+from .files import remove_media_files
+from .models import AccountBook, BackgroundJob, ReimbursementRequest
+from .xlsx_export import write_xlsx
+from .zipstream import stream_zip
+
+JOB_HANDLERS = {}
+
+PROGRESS_INTERVAL = 1.0   # 进度最多每秒写一次数据库
+RETRY_BASE_DELAY = 30     # 第 n 次失败后等待 30 * 2^(n-1) 秒再重试
+FILE_BATCH_SIZE = 500
+
+
+def job_handler(kind):
+    """注册任务处理函数：handler(context, payload)"""
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def artifact_path(relative_name):
+    return os.path.join(settings.JOB_ARTIFACT_ROOT, relative_name)
+
+
+def discard_artifact(job):
+    """删除任务的结果文件（失败任务的半成品或被删除的任务）"""
+    if not job.result_file:
+        return
+    try:
+        os.remove(artifact_path(job.result_file))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"删除任务文件失败: {job.result_file}, 错误: {e}")
+    job.result_file = job.result_name = ''
+
+
+def enqueue(kind, payload=None, user=None, total=0, max_attempts=3):
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'未知的任务类型: {kind}')
+    return BackgroundJob.objects.create(
+        kind=kind, payload=payload or {}, total=total, max_attempts=max_attempts,
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def should_run_inline(count):
+    """选中数量不超过 JOB_INLINE_LIMIT 时仍在请求内直接执行"""
+    return count <= settings.JOB_INLINE_LIMIT
+
+
+class JobContext:
+    """传给任务处理函数：汇报进度、生成结果文件"""
+
+    def __init__(self, job):
+        self.job = job
+        self._last_report = 0.0
+
+    def progress(self, done, total=None, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        self.job.progress = done
+        fields = {'progress': done, 'heartbeat_at': timezone.now()}
+        if total is not None:
+            self.job.total = total
+            fields['total'] = total
+        BackgroundJob.objects.filter(pk=self.job.pk).update(**fields)
+
+    def counted(self, iterable, total=None):
+        """迭代时自动汇报进度"""
+        done = 0
+        for item in iterable:
+            yield item
+            done += 1
+            self.progress(done, total)
+        self.progress(done, total, force=True)
+
+    def new_artifact(self, download_name):
+        """返回结果文件的磁盘路径，任务成功后可在后台下载"""
+        ext = os.path.splitext(download_name)[1]
+        relative = os.path.join(timezone.localdate().strftime('%Y%m'), f'job{self.job.pk}-{uuid4().hex[:8]}{ext}')
+        path = artifact_path(relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.job.result_file = relative
+        self.job.result_name = download_name
+        return path
+
+
+# ── 领取与执行 ────────────────────────────────────────────────────────────
+
+def claim_next_job():
+    """领取一个到期的排队任务；条件 UPDATE 保证多个进程不会领取同一任务"""
+    now = timezone.now()
+    candidates = (
+        BackgroundJob.objects.filter(status='queued', run_after__lte=now)
+        .order_by('run_after', 'id').values_list('id', flat=True)[:10]
+    )
+    for job_id in candidates:
+        claimed = BackgroundJob.objects.filter(pk=job_id, status='queued').update(
+            status='running', started_at=now, heartbeat_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return BackgroundJob.objects.get(pk=job_id)
+    return None
+
+
+def run_job(job):
+    handler = JOB_HANDLERS.get(job.kind)
+    context = JobContext(job)
+    try:
+        if handler is None:
+            raise ValueError(f'未知的任务类型: {job.kind}')
+        job.message = handler(context, job.payload) or ''
+    except Exception:
+        job.error = traceback.format_exc()
+        discard_artifact(job)
+        if job.attempts < job.max_attempts:
+            job.status = 'queued'
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BASE_DELAY * 2 ** (job.attempts - 1))
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+        print(f"后台任务 {job} 执行失败（第 {job.attempts} 次）:\n{job.error}")
+    else:
+        job.status = 'succeeded'
+        job.error = ''
+        job.finished_at = timezone.now()
+    job.save(update_fields=[
+        'status', 'message', 'error', 'run_after', 'finished_at', 'progress', 'total', 'result_file', 'result_name',
+    ])
+    return job
+
+
+def requeue_stale_jobs(stale_after):
+    """
+    worker 异常退出后遗留的“执行中”任务：心跳超时则重新排队
+    已用完尝试次数的标记为失败，避免导致 worker 崩溃（内存不足、被杀）的任务每次启动都被重新执行
+    返回 (重新排队数, 标记失败数)
+    """
+    now = timezone.now()
+    stale = BackgroundJob.objects.filter(status='running', heartbeat_at__lt=now - timedelta(seconds=stale_after))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=now, error=f'worker 异常退出（心跳超过 {stale_after} 秒未更新），已达到最多尝试次数',
+    )
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(status='queued', run_after=now)
+    return requeued, failed
+
+
+def retry_jobs(queryset):
+    """后台手动重试失败的任务"""
+    return queryset.filter(status='failed').update(
+        status='queued', run_after=timezone.now(), max_attempts=F('attempts') + 1, error='',
+    )
+
+
+# ── 任务类型 ──────────────────────────────────────────────────────────────
+
+@job_handler('invoice_zip')
+def build_invoice_zip(context, payload):
+    queryset = ReimbursementRequest.objects.filter(pk__in=payload['ids'])
+    approved = queryset.filter(status='approved', invoice_pdf__isnull=False)
+    total = approved.count()
+    # 按文件汇报进度：发票数 + 行程单数
+    file_count = total + approved.exclude(itinerary_pdf='').exclude(itinerary_pdf__isnull=True).count()
+    path = context.new_artifact(exports.invoice_zip_filename(total))
+    entries = context.counted(exports.invoice_zip_entries(queryset), file_count)
+    with open(path, 'wb') as target:
+        for chunk in stream_zip(entries):
+            target.write(chunk)
+    return f'已打包 {total} 个已审核申请的发票及行程单'
+
+
+@job_handler('approved_excel')
+def build_approved_excel(context, payload):
+    queryset = ReimbursementRequest.objects.filter(pk__in=payload['ids'])
+    total = queryset.filter(status='approved').count()
+    path = context.new_artifact(exports.approved_export_filename())
+    rows = context.counted(exports.approved_export_rows(queryset), total)
+    count = write_xlsx(path, exports.APPROVED_EXPORT_SHEET, exports.APPROVED_EXPORT_COLUMNS, rows)
+    return f'已导出 {count} 条已审核记录'
+
+
+@job_handler('account_book_excel')
+def build_account_book_excel(context, payload):
+    queryset = AccountBook.objects.filter(pk__in=payload['ids'])
+    total = len(payload['ids'])
+    path = context.new_artifact(exports.account_book_export_filename())
+    rows = context.counted(exports.account_book_export_rows(queryset), total)
+    count = write_xlsx(path, exports.ACCOUNT_BOOK_EXPORT_SHEET, exports.ACCOUNT_BOOK_EXPORT_COLUMNS, rows)
+    return f'已导出 {count} 条记账记录'
+
+
+@job_handler('remove_files')
+def remove_files(context, payload):
+    """升级前排队的文件删除任务；现在文件删除登记在 PendingFileDeletion（见 files.py）"""
+    names = payload['names']
+    removed = 0
+    failures = []
+    for start in range(0, len(names), FILE_BATCH_SIZE):
+        batch_removed, batch_failures = remove_media_files(names[start:start + FILE_BATCH_SIZE])
+        removed += batch_removed
+        failures.extend(batch_failures)
+        context.progress(min(start + FILE_BATCH_SIZE, len(names)), len(names))
+    if failures:
+        # 只重试失败的文件
+        payload['names'] = [name for name, _ in failures]
+        BackgroundJob.objects.filter(pk=context.job.pk).update(payload=payload)
+        raise OSError(f'{len(failures)} 个文件删除失败，例如 {failures[0][0]}: {failures[0][1]}')
+    return f'已删除 {removed} 个文件'
@@ -0,0 +1,330 @@
+# reimbursement/ledger.py
+"""
+记账本余额计算
+
+- 已结束的月份保存为 LedgerSnapshot（当月收支 + 截至月末的累计收支）
+- 记账记录增删改时，通过 F() 表达式增量修正受影响月份及之后所有快照
+- 查询余额 = 最近一个快照 + 之后记录的数据库聚合（通常只有当月）
+- check_snapshots() 用全量重算校验快照，可选择修复（已归档的记账记录一并计入）
+- 同时维护按人/按类型的月度汇总（reports.SpendingSummary）
+"""
+from datetime import datetime, time
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .models import AccountBook, ArchivedAccountBook, LedgerSnapshot, ReimbursementRequest
+from .search import index_objects
+
+ZERO = Decimal('0.00')
+INCOME_FILTER = Q(entry_type='income')
+
+_STATE_FIELDS = ('entry_type', 'amount', 'entry_date', 'real_name')
+
+
+def month_of(value):
+    """日期时间所在月份的1日（按本地时区）"""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        value = value.date()
+    return value.replace(day=1)
+
+
+def next_month(period):
+    if period.month == 12:
+        return period.replace(year=period.year + 1, month=1)
+    return period.replace(month=period.month + 1)
+
+
+def month_start(period):
+    """月份1日零点（本地时区的aware时间）"""
+    return timezone.make_aware(datetime.combine(period, time.min))
+
+
+def split_amount(entry_type, amount):
+    """按类型拆分为 (收入, 支出)；报销支出和其他支出都计为支出"""
+    if entry_type == 'income':
+        return amount, ZERO
+    return ZERO, amount
+
+
+def aggregate_totals(queryset):
+    """数据库端聚合：返回 (收入合计, 支出合计, 记录数)"""
+    totals = queryset.aggregate(
+        income=Sum('amount', filter=INCOME_FILTER),
+        expense=Sum('amount', filter=~INCOME_FILTER),
+        count=Count('id'),
+    )
+    return totals['income'] or ZERO, totals['expense'] or ZERO, totals['count']
+
+
+# ── 增量维护 ──────────────────────────────────────────────────────────────
+
+def remember_entry_state(entry):
+    """记录实例在数据库中的当前值；字段被延迟加载时不记录，避免逐行补查询"""
+    deferred = entry.get_deferred_fields()
+    if any(name in deferred for name in _STATE_FIELDS):
+        entry._ledger_state = None
+    else:
+        entry._ledger_state = entry_state(entry)
+
+
+def entry_state(entry):
+    return (entry.entry_type, entry.amount, entry.entry_date, entry.real_name)
+
+
+def ensure_entry_state(entry):
+    if entry._state.adding or getattr(entry, '_ledger_state', None) is not None:
+        return
+    row = AccountBook.objects.filter(pk=entry.pk).values_list(*_STATE_FIELDS).first()
+    entry._ledger_state = row
+
+
+def apply_delta(period, income, expense, count):
+    """
+    修正某月的快照：当月合计及该月之后所有月份的累计值
+    该月尚未结账时两条 UPDATE 都不会命中任何行，差额在查询余额时由聚合得到
+    """
+    if not (income or expense or count):
+        return
+    LedgerSnapshot.objects.filter(period=period).update(
+        income=F('income') + income,
+        expense=F('expense') + expense,
+        entry_count=F('entry_count') + count,
+    )
+    if income or expense:
+        LedgerSnapshot.objects.filter(period__gte=period).update(
+            closing_income=F('closing_income') + income,
+            closing_expense=F('closing_expense') + expense,
+        )
+
+
+def apply_entry_change(entry, created=False, deleted=False):
+    """记账记录保存/删除后调用，撤销旧值并计入新值"""
+    old = None if created else getattr(entry, '_ledger_state', None)
+    if deleted:
+        # 删除时以数据库中的原始值为准
+        old = old or entry_state(entry)
+        new = None
+    else:
+        new = entry_state(entry)
+    if old == new:
+        return
+
+    changes = {}
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None:
+            continue
+        entry_type, amount, entry_date, _ = state
+        income, expense = split_amount(entry_type, Decimal(amount))
+        period = month_of(entry_date)
+        total = changes.setdefault(period, [ZERO, ZERO, 0])
+        total[0] += sign * income
+        total[1] += sign * expense
+        total[2] += sign
+    for period, (income, expense, count) in changes.items():
+        apply_delta(period, income, expense, count)
+
+    from .reports import apply_spending_changes
+    apply_spending_changes([(state, sign) for state, sign in ((old, -1), (new, 1)) if state is not None])
+    entry._ledger_state = new
+
+
+def apply_bulk_entries(entries, sign=1):
+    """bulk_create/批量删除不会触发信号，调用方用此函数一次性计入（sign=-1 表示撤销）"""
+    changes = {}
+    for entry in entries:
+        income, expense = split_amount(entry.entry_type, Decimal(entry.amount))
+        total = changes.setdefault(month_of(entry.entry_date), [ZERO, ZERO, 0])
+        total[0] += sign * income
+        total[1] += sign * expense
+        total[2] += sign
+    for period, (income, expense, count) in changes.items():
+        apply_delta(period, income, expense, count)
+
+    from .reports import apply_spending_changes
+    apply_spending_changes([(entry_state(entry), sign) for entry in entries])
+
+
+# ── 报销记账 ──────────────────────────────────────────────────────────────
+
+POST_BATCH_SIZE = 500
+
+
+def reimbursement_entry(req):
+    """由审核通过的报销申请生成（未保存的）记账记录"""
+    return AccountBook(
+        entry_date=req.submission_date,
+        entry_type='reimbursement',
+        real_name=req.real_name,
+        reason=req.reason,
+        amount=req.amount,
+        remarks=req.remarks or f'报销申请 #{req.id}',
+        reimbursement=req,
+        created_by_id=req.user_id,
+    )
+
+
+def post_reimbursement(req):
+    """为单个报销申请记账，已记过账时返回 None"""
+    try:
+        with transaction.atomic():
+            entry = reimbursement_entry(req)
+            entry.save()
+    except IntegrityError:
+        return None
+    return entry
+
+
+def post_reimbursements(requests):
+    """
+    为一批审核通过的报销申请记账：一次查询排除已记账的申请，其余 bulk_create
+    并发记账导致唯一约束冲突时，退回逐条记账
+    返回新建的记账记录列表
+    """
+    requests = list(requests)
+    posted = set()
+    for start in range(0, len(requests), POST_BATCH_SIZE):
+        ids = [req.pk for req in requests[start:start + POST_BATCH_SIZE]]
+        posted.update(
+            AccountBook.objects.filter(entry_type='reimbursement', reimbursement_id__in=ids)
+            .values_list('reimbursement_id', flat=True)
+        )
+    entries = [reimbursement_entry(req) for req in requests if req.pk not in posted]
+    if not entries:
+        return []
+    try:
+        with transaction.atomic():
+            AccountBook.objects.bulk_create(entries, batch_size=POST_BATCH_SIZE)
+            apply_bulk_entries(entries)
+            index_objects(entries)
+    except IntegrityError:
+        return [entry for entry in map(post_reimbursement, (e.reimbursement for e in entries)) if entry]
+    return entries
+
+
+def post_approved(ids):
+    """按ID为已审核通过的报销申请批量记账"""
+    fields = ('id', 'user_id', 'real_name', 'reason', 'amount', 'remarks', 'submission_date')
+    requests = ReimbursementRequest.objects.filter(pk__in=ids, status='approved').only(*fields)
+    return post_reimbursements(requests.iterator(chunk_size=POST_BATCH_SIZE))
+
+
+# ── 结账与查询 ────────────────────────────────────────────────────────────
+
+def _monthly_totals(queryset):
+    """按月分组聚合，返回 {月份: (收入, 支出, 记录数)}"""
+    rows = (
+        queryset.annotate(month=TruncMonth('entry_date'))
+        .values('month')
+        .annotate(
+            income=Sum('amount', filter=INCOME_FILTER),
+            expense=Sum('amount', filter=~INCOME_FILTER),
+            count=Count('id'),
+        )
+        .order_by()
+    )
+    result = {}
+    for row in rows:
+        result[month_of(row['month'])] = (row['income'] or ZERO, row['expense'] or ZERO, row['count'])
+    return result
+
+
+@transaction.atomic
+def close_periods():
+    """为本月之前所有尚未结账的月份生成快照（包括没有记录的月份，保证月份连续），返回新快照列表"""
+    current = month_of(timezone.now())
+    last = LedgerSnapshot.objects.select_for_update().order_by('-period').first()
+    if last:
+        period = next_month(last.period)
+        closing_income, closing_expense = last.closing_income, last.closing_expense
+    else:
+        first_date = AccountBook.objects.order_by('entry_date').values_list('entry_date', flat=True).first()
+        if first_date is None:
+            return []
+        period = month_of(first_date)
+        closing_income = closing_expense = ZERO
+    if period >= current:
+        return []
+
+    monthly = _monthly_totals(
+        AccountBook.objects.filter(entry_date__gte=month_start(period), entry_date__lt=month_start(current))
+    )
+    snapshots = []
+    while period < current:
+        income, expense, count = monthly.get(period, (ZERO, ZERO, 0))
+        closing_income += income
+        closing_expense += expense
+        snapshots.append(LedgerSnapshot(
+            period=period, income=income, expense=expense, entry_count=count,
+            closing_income=closing_income, closing_expense=closing_expense,
+        ))
+        period = next_month(period)
+    return LedgerSnapshot.objects.bulk_create(snapshots)
+
+
+def get_balance(as_of=None):
+    """
+    返回 (累计收入, 累计支出)
+    as_of 为空时计算包含所有记录的当前余额（并顺带为已结束的月份结账），
+    否则计算截至 as_of（含）的余额
+    """
+    snapshots = LedgerSnapshot.objects.order_by('-period')
+    if as_of is None:
+        latest = snapshots.first()
+        if latest is None or next_month(latest.period) < month_of(timezone.now()):
+            close_periods()
+            latest = snapshots.first()
+        entries = AccountBook.objects.all()
+    else:
+        latest = snapshots.filter(period__lt=month_of(as_of)).first()
+        entries = AccountBook.objects.filter(entry_date__lte=as_of)
+
+    if latest is None:
+        income, expense, _ = aggregate_totals(entries)
+        if as_of is not None:
+            # 早于第一个快照的日期：已归档的记录不在快照中体现
+            archived_income, archived_expense, _ = aggregate_totals(ArchivedAccountBook.objects.filter(entry_date__lte=as_of))
+            income, expense = income + archived_income, expense + archived_expense
+        return income, expense
+    income, expense, _ = aggregate_totals(entries.filter(entry_date__gte=month_start(next_month(latest.period))))
+    return latest.closing_income + income, latest.closing_expense + expense
+
+
+def check_snapshots(repair=False):
+    """
+    全量重算每个已结账月份并与快照比较，返回不一致的月份列表 [(月份, 快照值, 重算值)]
+    repair=True 时用重算值覆盖快照
+    """
+    mismatches = []
+    with transaction.atomic():
+        snapshots = list(LedgerSnapshot.objects.select_for_update().order_by('period'))
+        if not snapshots:
+            return mismatches
+        end = month_start(next_month(snapshots[-1].period))
+        monthly = _monthly_totals(AccountBook.objects.filter(entry_date__lt=end))
+        # 已归档的记账记录都在已结账的月份中
+        for period, totals in _monthly_totals(ArchivedAccountBook.objects.filter(entry_date__lt=end)).items():
+            monthly[period] = tuple(a + b for a, b in zip(monthly.get(period, (ZERO, ZERO, 0)), totals))
+        # 第一个快照之前的记录（例如补录到更早月份）计入第一个快照的累计值
+        closing_income = closing_expense = ZERO
+        for period, (income, expense, _) in monthly.items():
+            if period < snapshots[0].period:
+                closing_income += income
+                closing_expense += expense
+
+        for snapshot in snapshots:
+            income, expense, count = monthly.get(snapshot.period, (ZERO, ZERO, 0))
+            closing_income += income
+            closing_expense += expense
+            stored = (snapshot.income, snapshot.expense, snapshot.entry_count, snapshot.closing_income, snapshot.closing_expense)
+            expected = (income, expense, count, closing_income, closing_expense)
+            if stored != expected:
+                mismatches.append((snapshot.period, stored, expected))
+                if repair:
+                    (snapshot.income, snapshot.expense, snapshot.entry_count,
+                     snapshot.closing_income, snapshot.closing_expense) = expected
+                    snapshot.save(update_fields=['income', 'expense', 'entry_count', 'closing_income', 'closing_expense'])
+    return mismatches
@@ -0,0 +1,127 @@
+# reimbursement/local_cache.py
+"""
+本机共享的缓存后端：数据存在本机的 SQLite 文件中（WAL 模式），同一台机器上的所有 gunicorn 进程共享
+
+- add/incr/touch 在同一个写事务内完成（原子），并发时不会少计；默认的文件缓存 incr 是先读后写
+- 用于需要跨进程精确计数的小数据量场景（登录失败计数，见 lockout.py），不经过数据库服务器
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+CULL_EVERY = 200  # 每写入这么多次清理一次过期记录
+
+
+class LocalCounterCache(BaseCache):
+    """基于本机 SQLite 文件的缓存后端，LOCATION 为数据库文件路径"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = str(location)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._writes = 0
+
+    def _connection(self):
+        # 每个进程一个连接（gunicorn fork 之后重新连接）；sqlite 调用期间不会切换 gevent 协程
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _write(self, func):
+        """在写事务中执行：BEGIN IMMEDIATE 先取得写锁，读取和写入之间不会被其他进程插入"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = func(conn)
+                self._writes += 1
+                if self._writes % CULL_EVERY == 0:
+                    conn.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires < ?', (time.time(),))
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+            return result
+
+    @staticmethod
+    def _live(conn, key):
+        row = conn.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return row
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        def add(conn):
+            if self._live(conn, key) is not None:
+                return False
+            conn.execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)', (key, data, expires))
+            return True
+        return self._write(add)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            row = self._live(self._connection(), key)
+        return default if row is None else pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self._write(lambda conn: conn.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)', (key, data, expires)
+        ))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+
+        def touch(conn):
+            if self._live(conn, key) is None:
+                return False
+            conn.execute('UPDATE cache SET expires = ? WHERE key = ?', (expires, key))
+            return True
+        return self._write(touch)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+
+        def incr(conn):
+            row = self._live(conn, key)
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            conn.execute('UPDATE cache SET value = ? WHERE key = ?', (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key))
+            return value
+        return self._write(incr)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._write(lambda conn: conn.execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount > 0)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            return self._live(self._connection(), key) is not None
+
+    def clear(self):
+        self._write(lambda conn: conn.execute('DELETE FROM cache'))
+
+    def close(self, **kwargs):
+        # 保持进程内的长连接，请求结束时不关闭
+        pass
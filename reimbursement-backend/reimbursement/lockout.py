@@ -0,0 +1,72 @@
+# reimbursement/lockout.py
+"""
+登录失败计数与锁定（django-axes）：计数放在本机共享缓存中，不再读写数据库
+
+- AXES_HANDLER 使用 AuditedAxesCacheHandler：失败次数记在 AXES_CACHE（LocalCounterCache，见 local_cache.py），
+  每次登录尝试不再查询/写入 axes 的数据表，撞库攻击不会变成数据库写入压力
+- 锁定规则不变：AXES_FAILURE_LIMIT 次失败后锁定 AXES_COOLOFF_TIME 小时（计数的过期时间即锁定时长）
+- 数据库只写审计记录：IP 或用户名的计数达到上限时各写一条 AccessFailureLog，后台登录成功时写一条 AccessLog
+"""
+from datetime import timedelta
+from django.utils import timezone
+from axes.conf import settings as axes_settings
+from axes.handlers.cache import AxesCacheHandler
+from axes.helpers import get_client_cache_keys, get_client_session_hash, get_client_username, get_failure_limit
+from axes.models import AccessFailureLog, AccessLog
+
+
+class AuditedAxesCacheHandler(AxesCacheHandler):
+    """计数和锁定判断沿用 AxesCacheHandler，数据库只在开始锁定和登录成功时各写一条审计记录"""
+
+    def user_login_failed(self, sender, credentials, request=None, **kwargs):
+        if request is None or not axes_settings.AXES_LOCK_OUT_AT_FAILURE:
+            return super().user_login_failed(sender, credentials, request=request, **kwargs)
+        # IP 与用户名各有一个计数，axes_failures_since_start 只是其中的最大值：
+        # 比较每个计数在本次失败前后的值，每个刚好达到上限的计数写一条（锁定期间的后续尝试只增加缓存计数）
+        cache_keys = get_client_cache_keys(request, credentials)
+        before = self.cache.get_many(cache_keys)
+        super().user_login_failed(sender, credentials, request=request, **kwargs)
+        after = self.cache.get_many(cache_keys)
+        limit = get_failure_limit(request, credentials)
+        for key in cache_keys:
+            if before.get(key, 0) < limit <= after.get(key, 0):
+                self.log_lockout(request, credentials)
+
+    @staticmethod
+    def log_lockout(request, credentials):
+        AccessFailureLog.objects.create(
+            username=get_client_username(request, credentials),
+            ip_address=request.axes_ip_address,
+            user_agent=request.axes_user_agent,
+            http_accept=request.axes_http_accept,
+            path_info=request.axes_path_info,
+            attempt_time=request.axes_attempt_time,
+            locked_out=True,
+        )
+
+    def user_logged_in(self, sender, request, user, **kwargs):
+        super().user_logged_in(sender, request, user, **kwargs)
+        if axes_settings.AXES_DISABLE_ACCESS_LOG:
+            return
+        AccessLog.objects.create(
+            username=user.get_username(),
+            ip_address=request.axes_ip_address,
+            user_agent=request.axes_user_agent,
+            http_accept=request.axes_http_accept,
+            path_info=request.axes_path_info,
+            attempt_time=request.axes_attempt_time,
+            session_hash=get_client_session_hash(request),
+        )
+
+    def reset_logs(self, *, age_days=None):
+        return self._reset(AccessLog, age_days)
+
+    def reset_failure_logs(self, *, age_days=None):
+        return self._reset(AccessFailureLog, age_days)
+
+    @staticmethod
+    def _reset(model, age_days):
+        queryset = model.objects.all()
+        if age_days is not None:
+            queryset = queryset.filter(attempt_time__lte=timezone.now() - timedelta(days=age_days))
+        return queryset.delete()[0]
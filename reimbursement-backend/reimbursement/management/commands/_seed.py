@@ -0,0 +1,98 @@
+# reimbursement/management/commands/_seed.py
+"""压测命令共用的造数工具（以下划线开头，不会被当作管理命令）"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+from reimbursement.models import ReimbursementRequest, AccountBook
+
+REASONS = ['差旅交通费', '会议注册费', '办公用品采购', '出租车费', '餐饮招待', '资料打印', '实验耗材', '快递费']
+NAMES = ['张伟', '王芳', '李娜', '刘洋', '陈静', '杨磊', '赵敏', '黄强', '周杰', '吴昊']
+
+
+@contextmanager
+def manual_timestamps(*fields):
+    """临时关闭 auto_now/auto_now_add，让造数时可以写入分散的历史时间"""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field, _, _ in saved:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+@contextmanager
+def rolled_back():
+    """在事务中执行并在结束时回滚，压测数据不会留在数据库中"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def analyze():
+    """刷新查询规划器统计信息，否则刚插入的数据不会影响执行计划"""
+    with connection.cursor() as cursor:
+        if connection.vendor in ('postgresql', 'sqlite'):
+            cursor.execute('ANALYZE')
+
+
+def seed_dataset(requests=100000, entries=50000, users=200, days=3 * 365, batch_size=2000, seed=42, log=None):
+    """
+    批量生成用户、报销申请和记账记录（bulk_create，不触发信号），返回生成的用户列表
+    状态分布约为 已通过 80% / 不通过 12% / 待审核 8%，与实际使用相近
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    log = log or (lambda message: None)
+
+    prefix = f'bench_{rng.randrange(16 ** 6):06x}'
+    created_users = User.objects.bulk_create(
+        [User(username=f'{prefix}_{i}', password='!') for i in range(users)],
+        batch_size=batch_size,
+    )
+    log(f'已生成 {len(created_users)} 个用户')
+
+    request_fields = [ReimbursementRequest._meta.get_field(name) for name in ('submission_date', 'last_modified_date')]
+    with manual_timestamps(*request_fields):
+        for start in range(0, requests, batch_size):
+            batch = []
+            for _ in range(min(batch_size, requests - start)):
+                submitted = now - timedelta(seconds=rng.randrange(days * 86400))
+                roll = rng.random()
+                status = 'approved' if roll < 0.8 else 'rejected' if roll < 0.92 else 'pending'
+                batch.append(ReimbursementRequest(
+                    user=rng.choice(created_users),
+                    real_name=rng.choice(NAMES),
+                    reason=rng.choice(REASONS),
+                    amount=Decimal(rng.randrange(100, 500000)) / 100,
+                    is_taxi_invoice=rng.random() < 0.3,
+                    status=status,
+                    remarks='' if rng.random() < 0.7 else '压测数据',
+                    submission_date=submitted,
+                    last_modified_date=submitted + timedelta(hours=rng.randrange(1, 240)),
+                ))
+            ReimbursementRequest.objects.bulk_create(batch)
+    log(f'已生成 {requests} 条报销申请')
+
+    with manual_timestamps(AccountBook._meta.get_field('created_at')):
+        for start in range(0, entries, batch_size):
+            batch = []
+            for _ in range(min(batch_size, entries - start)):
+                entry_date = now - timedelta(seconds=rng.randrange(days * 86400))
+                roll = rng.random()
+                batch.append(AccountBook(
+                    entry_date=entry_date,
+                    entry_type='reimbursement' if roll < 0.7 else 'income' if roll < 0.85 else 'expense',
+                    real_name=rng.choice(NAMES),
+                    reason=rng.choice(REASONS),
+                    amount=Decimal(rng.randrange(100, 500000)) / 100,
+                    created_at=entry_date,
+                ))
+            AccountBook.objects.bulk_create(batch)
+    log(f'已生成 {entries} 条记账记录')
+    return created_users
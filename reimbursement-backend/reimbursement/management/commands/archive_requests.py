@@ -0,0 +1,41 @@
+# reimbursement/management/commands/archive_requests.py
+from datetime import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from reimbursement.archive import archive_requests, default_cutoff, pending_months
+from reimbursement.ledger import close_periods
+
+
+class Command(BaseCommand):
+    help = (
+        '把提交超过 ARCHIVE_AFTER_DAYS 天的已通过申请（及其记账记录）移入归档表，发票/行程单按月打包到 ARCHIVE_ROOT；'
+        '可随时中断，重新执行会继续'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='只归档在此日期（YYYY-MM-DD）之前提交的申请，默认按 ARCHIVE_AFTER_DAYS 计算')
+        parser.add_argument('--dry-run', action='store_true', help='只列出每个月可归档的申请数')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff = timezone.make_aware(datetime.strptime(options['before'], '%Y-%m-%d'))
+            except ValueError:
+                raise CommandError('--before 的格式应为 YYYY-MM-DD')
+        else:
+            cutoff = default_cutoff()
+        self.stdout.write(f'归档 {timezone.localtime(cutoff):%Y-%m-%d} 之前提交的已通过申请，归档目录 {settings.ARCHIVE_ROOT}')
+
+        if options['dry_run']:
+            close_periods()
+            months = pending_months(cutoff)
+            for period, count in months.items():
+                self.stdout.write(f'  {period:%Y-%m}：{count} 条')
+            self.stdout.write(f'共 {sum(months.values())} 条可归档')
+            return
+
+        archived, missing = archive_requests(cutoff, log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'已归档 {archived} 条申请'))
+        if missing:
+            self.stdout.write(self.style.WARNING(f'{missing} 个文件在归档时已不存在（见上方输出）'))
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from reimbursement.auth import cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = (
+        '查看 JWT 认证用户缓存的累计命中率（各 gunicorn 进程每分钟汇总一次，为近似值），'
+        '--reset 清零后重新统计'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='显示后清零计数')
+
+    def handle(self, *args, **options):
+        hits, misses = cache_stats()
+        total = hits + misses
+        rate = f'{hits * 100 / total:.1f}%' if total else '-'
+        self.stdout.write(f'命中 {hits} 次，未命中 {misses} 次，命中率 {rate}')
+        self.stdout.write(f'缓存有效期 {settings.AUTH_USER_CACHE_TTL} 秒，每进程最多 {settings.AUTH_USER_CACHE_SIZE} 个用户')
+        if options['reset']:
+            reset_cache_stats()
+            self.stdout.write(self.style.SUCCESS('已清零'))
@@ -0,0 +1,62 @@
+# reimbursement/management/commands/backfill_file_metadata.py
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connections
+from reimbursement.downloads import FILE_KINDS
+from reimbursement.file_metadata import inspect_stored, model_values
+from reimbursement.fingerprints import stored_digest
+from reimbursement.models import ReimbursementRequest
+
+
+def inspect_task(name):
+    """在子进程中读取一个文件的信息（只读文件，不访问数据库）"""
+    try:
+        return name, inspect_stored(name, stored_digest(name)), None
+    except OSError as e:
+        return name, None, str(e)
+
+
+class Command(BaseCommand):
+    help = (
+        '为已有报销申请补齐发票/行程单的文件信息（大小、页数、哈希、类型）；'
+        '同一内容的文件只读取一次，已补齐的申请跳过，中断后重新执行即可继续'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重新计算所有申请（默认只处理尚无文件信息的申请）')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='进程数，默认等于 CPU 核数')
+
+    def handle(self, *args, **options):
+        for kind, field in FILE_KINDS.items():
+            queryset = ReimbursementRequest.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            if not options['all']:
+                queryset = queryset.filter(**{f'{kind}_size__isnull': True})
+            # 按内容寻址存储，多条申请共用一个文件：按文件名去重后读取
+            names = sorted(set(queryset.values_list(field, flat=True)))
+            if not names:
+                self.stdout.write(f'{field}：没有需要补齐的申请')
+                continue
+            self.backfill(kind, field, names, options['workers'], options['all'])
+
+    def backfill(self, kind, field, names, workers, overwrite):
+        self.stdout.write(f'{field}：{len(names)} 个文件，使用 {workers} 个进程')
+        updated = 0
+        failed = 0
+        # 子进程通过 fork 继承父进程，fork 前关闭数据库连接
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            for done, (name, info, error) in enumerate(executor.map(inspect_task, names, chunksize=16), 1):
+                if error:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'{name} 读取失败: {error}'))
+                    continue
+                rows = ReimbursementRequest.objects.filter(**{field: name})
+                if not overwrite:
+                    rows = rows.filter(**{f'{kind}_size__isnull': True})
+                # 只写文件信息，不更新 last_modified_date，不影响“我的报销”增量同步
+                updated += rows.update(**model_values(kind, info))
+                if done % 500 == 0:
+                    self.stdout.write(f'已处理 {done}/{len(names)} 个文件')
+        self.stdout.write(self.style.SUCCESS(f'{field}：已更新 {updated} 条申请，{failed} 个文件读取失败'))
@@ -0,0 +1,51 @@
+# reimbursement/management/commands/bench_excel_export.py
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from reimbursement.exports import ACCOUNT_BOOK_EXPORT_COLUMNS
+from reimbursement.xlsx_export import write_xlsx
+
+
+def synthetic_rows(count):
+    """生成与记账本导出格式相同的模拟数据，不占用数据库"""
+    start = datetime(2025, 1, 1, 9, 0)
+    for i in range(count):
+        amount = float(Decimal(i % 5000) + Decimal('0.35'))
+        yield [
+            (start + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M'),
+            f'测试用户{i % 300}',
+            f'差旅报销-{i % 97}',
+            amount if i % 7 == 0 else -amount,
+            '' if i % 3 else f'备注 {i}',
+        ]
+
+
+class Command(BaseCommand):
+    help = '压测流式Excel导出：对比不同行数下的耗时与Python内存峰值（应基本持平）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+            help='要测试的行数，例如 --rows 1000 10000 100000 1000000'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"行数":>10} {"耗时(s)":>10} {"行/秒":>10} {"内存峰值(MB)":>14} {"文件大小(MB)":>14}')
+        for count in options['rows']:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                target = os.path.join(tmpdir, 'bench.xlsx')
+                tracemalloc.start()
+                started = time.perf_counter()
+                write_xlsx(target, '压测', ACCOUNT_BOOK_EXPORT_COLUMNS, synthetic_rows(count))
+                elapsed = time.perf_counter() - started
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                size = os.path.getsize(target)
+            self.stdout.write(
+                f'{count:>10} {elapsed:>10.2f} {count / elapsed:>10.0f} '
+                f'{peak / 1024 / 1024:>14.2f} {size / 1024 / 1024:>14.2f}'
+            )
@@ -0,0 +1,67 @@
+import json
+import re
+import time
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from reimbursement.models import ReimbursementRequest
+from reimbursement.serializers import ReimbursementListSerializer, ReimbursementRequestSerializer
+from ._seed import rolled_back, seed_dataset
+
+# 签名中含时间戳，比较输出时忽略
+TOKEN_RE = re.compile(r'token=[^"&]+')
+
+
+class Command(BaseCommand):
+    help = (
+        '在事务中生成一个用户的大量报销申请（结束时回滚），对比列表接口原序列化器与快速路径的'
+        '每秒处理行数（含查询），并校验两者输出的 JSON 相同'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000], help='每次序列化的行数')
+        parser.add_argument('--repeat', type=int, default=3, help='每项运行次数（取最快一次）')
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def handle(self, *args, **options):
+        largest = max(options['rows'])
+        request = RequestFactory().get('/api/reimbursements/')
+        with rolled_back():
+            user = seed_dataset(requests=largest, entries=0, users=1, log=self.stdout.write)[0]
+            requests = ReimbursementRequest.objects.filter(user=user)
+            # 造数没有文件，补上存储名称，让下载链接也参与计算
+            requests.update(invoice_pdf='blobs/ab/' + 'ab' * 32 + '.pdf')
+            requests.filter(is_taxi_invoice=True).update(itinerary_pdf='blobs/cd/' + 'cd' * 32 + '.pdf')
+            queryset = requests.order_by('-submission_date', '-id')
+
+            self.stdout.write(f'{"行数":>8} {"原序列化器(行/秒)":>18} {"快速路径(行/秒)":>16} {"提升":>8}')
+            for count in options['rows']:
+                rows = queryset[:count]
+                current = self.measure(lambda: self.current(rows, request), options['repeat'])
+                lean = self.measure(lambda: self.lean(rows, request), options['repeat'])
+                self.stdout.write(
+                    f'{count:>8} {count / current:>18.0f} {count / lean:>16.0f} {current / lean:>7.1f}x'
+                )
+            self.check_identical(queryset[:1000], request)
+
+    def current(self, rows, request):
+        return ReimbursementRequestSerializer(list(rows.all()), many=True, context={'request': request}).data
+
+    def lean(self, rows, request):
+        return ReimbursementListSerializer(request).serialize(ReimbursementListSerializer.rows(rows.all()))
+
+    def measure(self, func, repeat):
+        best = None
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def check_identical(self, rows, request):
+        expected = TOKEN_RE.sub('token=', json.dumps(self.current(rows, request), ensure_ascii=False))
+        actual = TOKEN_RE.sub('token=', json.dumps(self.lean(rows, request), ensure_ascii=False))
+        if expected == actual:
+            self.stdout.write(self.style.SUCCESS('输出一致（忽略签名）'))
+        else:
+            self.stdout.write(self.style.ERROR('输出不一致！'))
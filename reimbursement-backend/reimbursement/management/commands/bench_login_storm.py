@@ -0,0 +1,84 @@
+import logging
+import random
+import time
+from django.contrib.auth import authenticate
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from axes.handlers.proxy import AxesProxyHandler
+from ._seed import rolled_back
+
+HANDLERS = {
+    'database': 'axes.handlers.database.AxesDatabaseHandler',
+    'cache': 'reimbursement.lockout.AuditedAxesCacheHandler',
+}
+
+
+class WriteCounter:
+    """统计经过数据库连接的查询数和写入数"""
+
+    def __init__(self):
+        self.queries = 0
+        self.writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        if sql.lstrip().split(' ', 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            self.writes += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        '模拟撞库：大量随机用户名/IP 的失败登录，对比 axes 数据库处理器与缓存处理器的每秒处理次数和数据库读写次数'
+        '（数据库写入在事务中回滚；为排除密码哈希耗时，压测期间使用 MD5 哈希）'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=2000, help='登录尝试次数')
+        parser.add_argument('--usernames', type=int, default=50, help='尝试的用户名个数')
+        parser.add_argument('--ips', type=int, default=50, help='来源 IP 个数')
+        parser.add_argument('--handler', choices=['all'] + list(HANDLERS), default='all')
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        prefix = f'bench_{rng.randrange(16 ** 6):06x}'
+        usernames = [f'{prefix}_{i}' for i in range(options['usernames'])]
+        ips = [f'198.18.{i // 256}.{i % 256}' for i in range(options['ips'])]  # 压测保留网段
+        attempts = [(rng.choice(usernames), rng.choice(ips)) for _ in range(options['attempts'])]
+        names = list(HANDLERS) if options['handler'] == 'all' else [options['handler']]
+        logging.getLogger('axes').setLevel(logging.ERROR)  # 每次失败都会记日志，压测时关闭
+
+        self.stdout.write(f'{"处理器":>10} {"尝试/秒":>10} {"被锁定":>8} {"数据库查询":>10} {"数据库写入":>10}')
+        for name in names:
+            with override_settings(AXES_HANDLER=HANDLERS[name]), rolled_back():
+                handler = AxesProxyHandler.get_implementation(force=True)
+                try:
+                    elapsed, locked, counter = self.storm(attempts)
+                finally:
+                    self.reset(handler, usernames, ips)
+            self.stdout.write(
+                f'{name:>10} {len(attempts) / elapsed:>10.0f} {locked:>8} {counter.queries:>10} {counter.writes:>10}'
+            )
+        AxesProxyHandler.get_implementation(force=True)
+
+    def storm(self, attempts):
+        factory = RequestFactory()
+        counter = WriteCounter()
+        locked = 0
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            for username, ip in attempts:
+                request = factory.post('/api/token/', REMOTE_ADDR=ip)
+                authenticate(request=request, username=username, password='wrong-password')
+                locked += bool(getattr(request, 'axes_locked_out', False))
+            elapsed = time.perf_counter() - started
+        return elapsed, locked, counter
+
+    def reset(self, handler, usernames, ips):
+        """清除缓存中的压测计数（数据库中的记录随事务回滚）"""
+        for username in usernames:
+            handler.reset_attempts(username=username)
+        for ip in ips:
+            handler.reset_attempts(ip_address=ip)
@@ -0,0 +1,73 @@
+# reimbursement/management/commands/bench_queries.py
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+from reimbursement.models import ReimbursementRequest, AccountBook
+from ._seed import analyze, rolled_back, seed_dataset
+
+PAGE = 100  # 后台列表每页条数
+
+
+class Command(BaseCommand):
+    help = (
+        '在事务中生成大量压测数据（结束时回滚），逐个运行后台列表/筛选和API查询，'
+        '输出耗时与执行计划，用于验证索引效果和发现性能回退'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100000, help='生成的报销申请数')
+        parser.add_argument('--entries', type=int, default=50000, help='生成的记账记录数')
+        parser.add_argument('--users', type=int, default=200, help='生成的用户数')
+        parser.add_argument('--repeat', type=int, default=5, help='每个查询运行次数（取最快一次）')
+        parser.add_argument('--no-explain', action='store_true', help='只输出耗时，不输出执行计划')
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            users = seed_dataset(
+                requests=options['requests'], entries=options['entries'], users=options['users'],
+                log=self.stdout.write,
+            )
+            analyze()
+            for name, queryset in self.queries(users[0]):
+                elapsed = self.measure(queryset, options['repeat'])
+                self.stdout.write(self.style.MIGRATE_HEADING(f'\n{name}  {elapsed * 1000:.2f} ms'))
+                if not options['no_explain']:
+                    for line in queryset.explain().splitlines():
+                        self.stdout.write(f'    {line}')
+        self.stdout.write(self.style.SUCCESS('\n压测数据已回滚'))
+
+    def measure(self, queryset, repeat):
+        best = None
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            list(queryset.all())  # .all() 复制查询集，避免命中结果缓存
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def queries(self, user):
+        """与后台 changelist 和 API 实际发出的查询保持一致"""
+        now = timezone.now()
+        month_ago = now - timedelta(days=30)
+        requests = ReimbursementRequest.objects.order_by('-submission_date', '-id')
+        entries = AccountBook.objects.all()  # 默认排序 -entry_date, -created_at
+        return [
+            ('后台报销列表（首页）', requests[:PAGE]),
+            ('后台报销列表 status=待审核', requests.filter(status='pending')[:PAGE]),
+            ('后台报销列表 status=已通过', requests.filter(status='approved')[:PAGE]),
+            ('后台报销列表 is_taxi_invoice=是', requests.filter(is_taxi_invoice=True)[:PAGE]),
+            ('后台报销列表 提交日期=过去7天', requests.filter(submission_date__gte=now - timedelta(days=7))[:PAGE]),
+            ('后台报销列表 筛选计数 status=待审核',
+             ReimbursementRequest.objects.filter(status='pending').values('status').annotate(n=Count('id'))),
+            ('API 我的报销（首页）', requests.filter(user=user)[:21]),
+            ('API 我的报销 status=不通过', requests.filter(user=user, status='rejected')[:21]),
+            ('后台记账本列表（首页）', entries[:PAGE]),
+            ('后台记账本 entry_type=收入', entries.filter(entry_type='income')[:PAGE]),
+            ('后台记账本 date_hierarchy=本月',
+             entries.filter(entry_date__gte=now.replace(day=1, hour=0, minute=0, second=0, microsecond=0))[:PAGE]),
+            ('后台记账本 date_hierarchy 年份列表', AccountBook.objects.dates('entry_date', 'year')),
+            ('余额查询 最近一月增量', AccountBook.objects.filter(entry_date__gte=month_ago)
+             .values('entry_type').annotate(n=Count('id'))),
+        ]
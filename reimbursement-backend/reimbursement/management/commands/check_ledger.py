@@ -0,0 +1,22 @@
+# reimbursement/management/commands/check_ledger.py
+from django.core.management.base import BaseCommand
+from reimbursement.ledger import check_snapshots
+
+
+class Command(BaseCommand):
+    help = '用全量重算校验记账本月度快照，--repair 时修复不一致的快照'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='用重算结果覆盖不一致的快照')
+
+    def handle(self, *args, **options):
+        mismatches = check_snapshots(repair=options['repair'])
+        for period, stored, expected in mismatches:
+            self.stdout.write(self.style.WARNING(f'{period:%Y-%m} 快照 {stored} != 重算 {expected}'))
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('所有快照与全量重算一致'))
+        elif options['repair']:
+            self.stdout.write(self.style.SUCCESS(f'已修复 {len(mismatches)} 个月份'))
+        else:
+            # 非零退出码便于定时任务告警
+            raise SystemExit(1)
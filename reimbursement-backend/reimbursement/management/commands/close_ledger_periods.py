@@ -0,0 +1,16 @@
+# reimbursement/management/commands/close_ledger_periods.py
+from django.core.management.base import BaseCommand
+from reimbursement.ledger import close_periods
+
+
+class Command(BaseCommand):
+    help = '为本月之前所有尚未结账的月份生成记账本快照（查询余额时也会自动执行）'
+
+    def handle(self, *args, **options):
+        snapshots = close_periods()
+        for snapshot in snapshots:
+            self.stdout.write(
+                f'{snapshot.period:%Y-%m}  收入 {snapshot.income:,.2f}  支出 {snapshot.expense:,.2f}  '
+                f'月末余额 {snapshot.closing_balance:,.2f}'
+            )
+        self.stdout.write(self.style.SUCCESS(f'新结账 {len(snapshots)} 个月份'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from reimbursement.files import drain_file_deletions, file_deletion_stats
+
+
+class Command(BaseCommand):
+    help = '查看待删除文件的积压情况（由 run_jobs worker 删除），--drain 在当前进程中删除全部到期的文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drain', action='store_true', help='不等待 worker，立即删除全部到期的文件')
+
+    def handle(self, *args, **options):
+        if options['drain']:
+            claimed = 0
+            while batch := drain_file_deletions():
+                claimed += batch
+            self.stdout.write(f'已处理 {claimed} 条登记')
+        stats = file_deletion_stats()
+        self.stdout.write(
+            f'待删除 {stats["pending"]} 个文件，已到期 {stats["due"]} 个，重试中 {stats["retrying"]} 个'
+            f'（最多失败 {stats["max_attempts"]} 次），最早的登记于 {stats["oldest_age"]} 秒前'
+        )
+        if stats['retrying']:
+            self.stdout.write(self.style.WARNING('有文件删除失败，可在后台“待删除文件”中查看错误信息'))
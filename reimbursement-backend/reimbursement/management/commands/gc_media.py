@@ -0,0 +1,65 @@
+# reimbursement/management/commands/gc_media.py
+from django.core.management.base import BaseCommand
+from reimbursement.file_metadata import format_file_size
+from reimbursement.media_gc import USAGE_TYPES, MediaAudit, new_quarantine_dir, purge_quarantine
+
+
+class Command(BaseCommand):
+    help = (
+        '遍历 MEDIA_ROOT 一次：列出未被任何申请/上传引用的孤儿文件和数据库中引用但已丢失的文件，'
+        '按年份和类型统计磁盘占用；--quarantine 把孤儿文件移入 quarantine/<时间>/（默认只报告）'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quarantine', action='store_true', help='把孤儿文件移入隔离目录')
+        parser.add_argument(
+            '--min-age', type=int, default=24 * 3600,
+            help='修改时间在此秒数内的未引用文件视为尚未提交的上传，不算孤儿（默认 1 天）',
+        )
+        parser.add_argument('--report', help='把孤儿文件和丢失文件的完整列表写入该文件（制表符分隔）')
+        parser.add_argument('--purge-quarantine', type=int, metavar='DAYS', help='删除早于 DAYS 天的隔离批次后退出')
+
+    def handle(self, *args, **options):
+        if options['purge_quarantine'] is not None:
+            purged = purge_quarantine(options['purge_quarantine'])
+            self.stdout.write(self.style.SUCCESS(f'已删除 {purged} 个隔离批次'))
+            return
+
+        quarantine = new_quarantine_dir() if options['quarantine'] else None
+        report = open(options['report'], 'w', encoding='utf-8') if options['report'] else None
+        try:
+            audit = MediaAudit(options['min_age'], quarantine=quarantine, report=report).run()
+        finally:
+            if report:
+                report.close()
+
+        self.print_usage(audit.usage)
+        self.stdout.write(f'共遍历 {audit.scanned} 个文件')
+        self.stdout.write(f'孤儿文件 {audit.orphans} 个，共 {format_file_size(audit.orphan_bytes)}')
+        if quarantine:
+            self.stdout.write(self.style.SUCCESS(f'已将 {audit.quarantined} 个孤儿文件移入 {quarantine}/'))
+            if audit.failures:
+                self.stdout.write(self.style.WARNING(f'{len(audit.failures)} 个文件移动失败'))
+        if audit.missing:
+            self.stdout.write(self.style.WARNING(f'丢失文件 {len(audit.missing)} 个（数据库有引用，磁盘上不存在），例如:'))
+            for name in audit.missing[:10]:
+                self.stdout.write(f'  {name}')
+        else:
+            self.stdout.write('没有丢失的文件')
+
+    def print_usage(self, usage):
+        self.stdout.write(f'{"年份":<6} {"类型":<10} {"文件数":>8} {"大小":>12}')
+        by_year = {}
+        by_type = {}
+        for (year, kind), (count, size) in sorted(usage.items(), key=lambda item: (item[0][0] or 0, item[0][1])):
+            self.stdout.write(f'{year or "-":<6} {USAGE_TYPES[kind]:<10} {count:>8} {format_file_size(size):>12}')
+            for totals, key in ((by_year, year), (by_type, kind)):
+                total = totals.setdefault(key, [0, 0])
+                total[0] += count
+                total[1] += size
+        self.stdout.write('按年份合计：')
+        for year, (count, size) in sorted(by_year.items(), key=lambda item: item[0] or 0):
+            self.stdout.write(f'  {year or "-":<6} {count:>8} 个 {format_file_size(size):>12}')
+        self.stdout.write('按类型合计：')
+        for kind, (count, size) in by_type.items():
+            self.stdout.write(f'  {USAGE_TYPES[kind]:<10} {count:>8} 个 {format_file_size(size):>12}')
@@ -0,0 +1,90 @@
+# reimbursement/management/commands/index_invoice_fingerprints.py
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Count
+from django.utils import timezone
+from reimbursement.fingerprints import invoice_fingerprints, save_fingerprints, stored_digest
+from reimbursement.models import InvoiceFingerprint, ReimbursementRequest
+from reimbursement.storage import media_storage
+
+
+def compute_task(task):
+    """在子进程中计算一张发票的指纹（只读文件，不访问数据库）"""
+    request_id, path, amount, fallback_date, digest = task
+    try:
+        return request_id, invoice_fingerprints(path, amount, fallback_date, digest), None
+    except OSError as e:
+        return request_id, None, str(e)
+
+
+class Command(BaseCommand):
+    help = '为已有报销申请的发票建立指纹索引（多进程并行读取 PDF），并标记疑似重复的申请'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重建所有申请的指纹（默认只处理尚无指纹的申请）')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='进程数，默认等于 CPU 核数')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批写入数据库的申请数')
+
+    def handle(self, *args, **options):
+        queryset = ReimbursementRequest.objects.exclude(invoice_pdf='').exclude(invoice_pdf__isnull=True)
+        if not options['all']:
+            queryset = queryset.filter(fingerprints__isnull=True)
+        rows = list(queryset.order_by('pk').values_list('pk', 'invoice_pdf', 'amount', 'submission_date'))
+        if not rows:
+            self.stdout.write('没有需要建立指纹的申请')
+        else:
+            self.index(rows, options['workers'], options['batch_size'])
+        self.report_duplicates()
+
+    def index(self, rows, workers, batch_size):
+        tasks = [
+            (pk, media_storage.path(name), amount, timezone.localtime(submitted).date(), stored_digest(name))
+            for pk, name, amount, submitted in rows
+        ]
+        self.stdout.write(f'共 {len(tasks)} 个申请，使用 {workers} 个进程')
+        indexed = 0
+        failed = 0
+        pending = {}
+        # 子进程通过 fork 继承父进程，fork 前关闭数据库连接
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            for request_id, keys, error in executor.map(compute_task, tasks, chunksize=16):
+                if error:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'申请 #{request_id} 读取发票失败: {error}'))
+                    continue
+                pending[request_id] = keys
+                if len(pending) >= batch_size:
+                    save_fingerprints(pending)
+                    indexed += len(pending)
+                    pending = {}
+                    self.stdout.write(f'已处理 {indexed}/{len(tasks)}')
+        save_fingerprints(pending)
+        indexed += len(pending)
+        self.stdout.write(self.style.SUCCESS(f'已建立 {indexed} 个申请的指纹，{failed} 个失败'))
+
+    def report_duplicates(self):
+        """历史数据中的重复：金额+日期相同的标记为疑似重复（最早的一条除外），完全相同的发票只列出"""
+        groups = (
+            InvoiceFingerprint.objects.exclude(request__status='rejected')
+            .values('kind', 'key').annotate(count=Count('request_id')).filter(count__gt=1)
+        )
+        suspected = set()
+        for group in groups.iterator():
+            request_ids = sorted(
+                InvoiceFingerprint.objects.filter(kind=group['kind'], key=group['key'])
+                .exclude(request__status='rejected').values_list('request_id', flat=True)
+            )
+            if group['kind'] == 'amount_date':
+                suspected.update(request_ids[1:])
+            else:
+                ids = '、'.join(f'#{request_id}' for request_id in request_ids)
+                self.stdout.write(self.style.WARNING(f'重复发票（{group["kind"]}）: 申请 {ids}'))
+        if suspected:
+            marked = ReimbursementRequest.objects.filter(pk__in=suspected, is_suspected_duplicate=False).update(
+                is_suspected_duplicate=True
+            )
+            self.stdout.write(f'新标记 {marked} 个疑似重复申请')
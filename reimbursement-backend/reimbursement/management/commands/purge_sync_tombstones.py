@@ -0,0 +1,14 @@
+# reimbursement/management/commands/purge_sync_tombstones.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from reimbursement.sync import purge_tombstones
+
+
+class Command(BaseCommand):
+    help = '清理超过 DELTA_SYNC_TOMBSTONE_DAYS 天的已删除申请记录（增量同步用），建议每天定时执行'
+
+    def handle(self, *args, **options):
+        deleted = purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(
+            f'已清理 {deleted} 条 {settings.DELTA_SYNC_TOMBSTONE_DAYS} 天前的删除记录'
+        ))
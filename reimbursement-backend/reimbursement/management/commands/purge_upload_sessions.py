@@ -0,0 +1,11 @@
+# reimbursement/management/commands/purge_upload_sessions.py
+from django.core.management.base import BaseCommand
+from reimbursement.uploads import purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = '清理过期的分片上传会话（未完成的分片文件以及未被报销申请使用的合并文件），建议每天定时执行'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_sessions()
+        self.stdout.write(self.style.SUCCESS(f'已清理 {deleted} 个过期的上传会话'))
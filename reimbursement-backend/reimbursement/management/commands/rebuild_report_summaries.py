@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from reimbursement.reports import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = '由记账记录和报销申请全量重算统计报表的汇总表（首次部署时执行），--check 时只校验不修改'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='只比较汇总表与重算结果，不一致时以非零状态退出')
+
+    def handle(self, *args, **options):
+        result = rebuild_summaries(check_only=options['check'])
+        labels = {'spending': '记账汇总', 'approval': '审核汇总'}
+        for name, count in result.items():
+            if count:
+                self.stdout.write(self.style.WARNING(f'{labels[name]}：{count} 行与重算结果不一致'))
+        if not any(result.values()):
+            self.stdout.write(self.style.SUCCESS('汇总表与全量重算一致'))
+        elif options['check']:
+            # 非零退出码便于定时任务告警
+            raise SystemExit(1)
+        else:
+            self.stdout.write(self.style.SUCCESS('已用重算结果替换不一致的汇总表'))
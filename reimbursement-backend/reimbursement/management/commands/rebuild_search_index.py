@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reimbursement.search import SEARCH_MODELS, backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = '重建搜索倒排索引（SEARCH_BACKEND 为 index 时使用；PostgreSQL 默认使用 pg_trgm 索引，无需重建）'
+
+    def handle(self, *args, **options):
+        if backend() != 'index':
+            self.stdout.write(f'当前搜索后端为 {backend()}，不使用倒排索引')
+            return
+        for model in SEARCH_MODELS:
+            with transaction.atomic():
+                count = rebuild_index(model)
+            self.stdout.write(self.style.SUCCESS(f'{model._meta.verbose_name}：已索引 {count} 条记录'))
@@ -0,0 +1,121 @@
+# reimbursement/management/commands/reshard_media.py
+import os
+import shutil
+from uuid import uuid4
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reimbursement.files import queue_file_deletions
+from reimbursement.fingerprints import stored_digest
+from reimbursement.models import ReimbursementRequest, UploadSession
+from reimbursement.storage import blob_name, is_blob, media_storage, path_sha256
+
+# 保存存储名称的列
+NAME_FIELDS = (
+    (ReimbursementRequest, 'invoice_pdf'),
+    (ReimbursementRequest, 'itinerary_pdf'),
+    (UploadSession, 'file'),
+)
+
+
+def target_name(name):
+    """当前布局下的存储名称；旧的平铺文件（invoices/、itineraries/）需读取内容计算哈希"""
+    ext = os.path.splitext(name)[1].lower() or '.pdf'
+    digest = stored_digest(name) or path_sha256(media_storage.path(name))
+    return blob_name(digest, ext)
+
+
+def needs_move(name):
+    return not is_blob(name) or name != blob_name(stored_digest(name), os.path.splitext(name)[1])
+
+
+def place(name, target):
+    """
+    让 target 指向与 name 相同的内容，旧文件保留（迁移期间旧名称仍可读取）
+    同一文件系统时用硬链接，不复制数据；返回 False 表示源文件不存在
+    """
+    src = media_storage.path(name)
+    dst = media_storage.path(target)
+    if os.path.exists(dst):
+        # 新上传的相同内容、或上次中断前已放好
+        return True
+    if not os.path.exists(src):
+        return False
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        pass
+    except OSError:
+        # 不支持硬链接时复制，写完再改名，避免留下不完整的文件
+        temp_path = f'{dst}.{uuid4().hex}.tmp'
+        try:
+            shutil.copy2(src, temp_path)
+            os.replace(temp_path, dst)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return True
+
+
+class Command(BaseCommand):
+    help = (
+        '把已有的发票/行程单文件在线迁移到当前的目录布局（MEDIA_BLOB_SHARD_DEPTH），并转换残留的平铺旧文件；'
+        '每批先放好新文件，再在一个事务中改写存储名称，旧文件由 run_jobs worker 在宽限期后删除。'
+        '已迁移的名称会跳过，中断后重新执行即可继续'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每个事务改写的文件数')
+        parser.add_argument(
+            '--settle', type=int, default=settings.MEDIA_BLOB_DELETE_GRACE,
+            help='改写名称后保留旧文件的秒数（正在进行的请求仍可能使用旧名称），默认等于 MEDIA_BLOB_DELETE_GRACE',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='只统计需要迁移的文件数')
+
+    def handle(self, *args, **options):
+        names = set()
+        for model, field in NAME_FIELDS:
+            names.update(model.objects.exclude(**{field: ''}).values_list(field, flat=True).distinct().iterator())
+        pending = sorted(name for name in names if name and needs_move(name))
+        self.stdout.write(
+            f'目录层数 {settings.MEDIA_BLOB_SHARD_DEPTH}：共 {len(names)} 个文件，需要迁移 {len(pending)} 个'
+        )
+        if options['dry_run'] or not pending:
+            return
+
+        batch_size = max(1, options['batch_size'])
+        moved = missing = 0
+        for start in range(0, len(pending), batch_size):
+            batch_moved, batch_missing = self.move_batch(pending[start:start + batch_size], options['settle'])
+            moved += batch_moved
+            missing += batch_missing
+            self.stdout.write(f'已处理 {min(start + batch_size, len(pending))}/{len(pending)} 个文件')
+        self.stdout.write(self.style.SUCCESS(
+            f'已迁移 {moved} 个文件，{missing} 个文件不存在；旧文件将在 {options["settle"]} 秒后由 run_jobs worker 删除'
+        ))
+
+    def move_batch(self, names, settle):
+        moves = {}
+        missing = 0
+        for name in names:
+            try:
+                target = target_name(name)
+            except FileNotFoundError:
+                target = None
+            if target is None or not place(name, target):
+                missing += 1
+                self.stdout.write(self.style.WARNING(f'{name} 不存在，跳过'))
+                continue
+            moves[name] = target
+        if not moves:
+            return 0, missing
+        with transaction.atomic():
+            for model, field in NAME_FIELDS:
+                for name, target in moves.items():
+                    # 只改存储名称，不更新 last_modified_date；下载链接按申请ID生成，客户端无感知
+                    model.objects.filter(**{field: name}).update(**{field: target})
+            # 旧文件的删除登记与名称改写在同一事务中提交，中断也不会遗留旧文件；
+            # 删除时仍按引用计数检查，期间又被引用的旧名称不会删除（下次执行本命令时迁移）
+            queue_file_deletions(moves, delay=settle)
+        return len(moves), missing
@@ -0,0 +1,87 @@
+# reimbursement/management/commands/run_jobs.py
+import multiprocessing
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from reimbursement.files import drain_file_deletions
+from reimbursement.jobs import claim_next_job, requeue_stale_jobs, run_job
+
+
+class Worker:
+    """
+    单个 worker 进程：循环领取并执行任务，没有任务时删除一批待删除文件；
+    收到 SIGTERM/SIGINT 后执行完当前任务再退出
+    """
+
+    def __init__(self, poll_interval, once):
+        self.poll_interval = poll_interval
+        self.once = once
+        self.stopping = False
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        while not self.stopping:
+            job = claim_next_job()
+            if job is not None:
+                run_job(job)
+                continue
+            if drain_file_deletions():
+                continue
+            if self.once:
+                break
+            time.sleep(self.poll_interval)
+        connections.close_all()
+
+
+def worker_main(poll_interval, once):
+    Worker(poll_interval, once).run()
+
+
+class Command(BaseCommand):
+    help = '启动后台任务 worker（导出、打包、删除文件），进程数由 --processes 或 JOB_WORKER_PROCESSES 决定'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None, help='worker 进程数，默认取 JOB_WORKER_PROCESSES')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='队列为空时的轮询间隔（秒）')
+        parser.add_argument('--stale-after', type=int, default=600, help='执行中任务心跳超过该秒数视为 worker 已退出，重新排队')
+        parser.add_argument('--once', action='store_true', help='处理完当前队列后退出（用于定时任务）')
+
+    def handle(self, *args, **options):
+        processes = options['processes'] or settings.JOB_WORKER_PROCESSES
+        requeued, failed = requeue_stale_jobs(options['stale_after'])
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'重新排队 {requeued} 个心跳超时的任务'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} 个心跳超时的任务已达到最多尝试次数，标记为失败'))
+
+        if processes <= 1:
+            self.stdout.write('后台任务 worker 已启动（单进程）')
+            worker_main(options['poll_interval'], options['once'])
+            return
+
+        # 子进程通过 fork 继承父进程，fork 前关闭数据库连接，子进程各自重新连接
+        connections.close_all()
+        children = [
+            multiprocessing.Process(target=worker_main, args=(options['poll_interval'], options['once']), daemon=False)
+            for _ in range(processes)
+        ]
+        for child in children:
+            child.start()
+        self.stdout.write(f'后台任务 worker 已启动（{processes} 个进程）')
+
+        def forward(signum, frame):
+            for child in children:
+                if child.is_alive():
+                    child.terminate()  # 子进程收到 SIGTERM 后执行完当前任务再退出
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for child in children:
+            child.join()
+        self.stdout.write('后台任务 worker 已退出')
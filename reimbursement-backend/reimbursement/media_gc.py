@@ -0,0 +1,181 @@
+# reimbursement/media_gc.py
+"""
+媒体目录的孤儿文件检查与占用统计（manage.py gc_media）
+
+- 被引用的名称：报销申请的发票/行程单（一次 values_list().iterator()）、上传会话的合并文件和未完成的 .part 文件，
+  读入 {名称: (类型, 年份)}；按内容寻址存储时多条申请共用一个文件，内存与文件数成正比
+- 用 os.scandir 流式遍历 MEDIA_ROOT，每个文件只访问一次，不一次性列出整个目录：
+  见到的引用从待查集合中移除，遍历结束时剩下的就是丢失的文件
+- 未被引用、修改时间早于 min_age 的文件为孤儿（较新的可能是尚未提交的上传，归为新文件）；
+  按批再查一次数据库确认后才移入隔离目录 quarantine/<时间>/<原路径>，可手工移回
+- 已登记待删除（PendingFileDeletion）的文件由 worker 删除，这里不处理
+- 占用按年份和类型汇总：被引用的文件按申请提交/上传年份，其余按修改时间年份
+"""
+import os
+import shutil
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from django.utils import timezone
+from .files import referenced_names
+from .models import PendingFileDeletion, ReimbursementRequest, UploadSession
+from .storage import media_storage
+from .uploads import UPLOAD_DIR
+
+QUARANTINE_DIR = 'quarantine'
+QUARANTINE_STAMP = '%Y%m%d-%H%M%S'
+CHUNK_SIZE = 5000
+CONFIRM_BATCH_SIZE = 500
+USAGE_TYPES = {
+    'invoice': '发票',
+    'itinerary': '行程单',
+    'upload': '分片上传',
+    'queued': '待删除',
+    'recent': '新文件',
+    'orphan': '孤儿文件',
+}
+
+
+def local_year(value):
+    return timezone.localtime(value).year if value else None
+
+
+def load_references():
+    """{存储名称: (类型, 年份)}，同一文件被多处引用时取先读到的"""
+    references = {}
+    rows = ReimbursementRequest.objects.values_list('invoice_pdf', 'itinerary_pdf', 'submission_date')
+    for invoice, itinerary, submitted in rows.iterator(chunk_size=CHUNK_SIZE):
+        year = local_year(submitted)
+        if invoice:
+            references.setdefault(invoice, ('invoice', year))
+        if itinerary:
+            references.setdefault(itinerary, ('itinerary', year))
+    sessions = UploadSession.objects.values_list('pk', 'status', 'file', 'created_at')
+    for pk, status, name, created in sessions.iterator(chunk_size=CHUNK_SIZE):
+        year = local_year(created)
+        if status == 'uploading':
+            references.setdefault(f'{UPLOAD_DIR}/{pk}.part', ('upload', year))
+        if name:
+            references.setdefault(name, ('upload', year))
+    return references
+
+
+def scan_media(root, skip=()):
+    """流式遍历 root 下的文件，逐个返回 (相对路径, stat)；skip 中的目录（相对路径）不进入"""
+    stack = ['']
+    while stack:
+        directory = stack.pop()
+        with os.scandir(os.path.join(root, directory)) as entries:
+            for entry in entries:
+                name = f'{directory}/{entry.name}' if directory else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if name not in skip:
+                        stack.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    yield name, entry.stat(follow_symlinks=False)
+
+
+class MediaAudit:
+    """
+    一次遍历的结果：usage 为 {(年份, 类型): [文件数, 字节数]}，missing 为丢失的文件名
+    quarantine 为隔离目录名（相对 MEDIA_ROOT）时移动孤儿文件；report 为可写文本文件时逐行记录
+    """
+
+    def __init__(self, min_age, quarantine=None, report=None):
+        self.min_age = min_age
+        self.quarantine = quarantine
+        self.report = report
+        self.usage = defaultdict(lambda: [0, 0])
+        self.orphans = 0
+        self.orphan_bytes = 0
+        self.quarantined = 0
+        self.failures = []
+        self.missing = []
+        self.scanned = 0
+        self._candidates = []
+
+    def run(self):
+        references = load_references()
+        unseen = set(references)
+        queued = set(PendingFileDeletion.objects.values_list('name', flat=True).iterator(chunk_size=CHUNK_SIZE))
+        cutoff = time.time() - self.min_age
+        root = media_storage.location
+        for name, stat in scan_media(root, skip={QUARANTINE_DIR}):
+            self.scanned += 1
+            reference = references.get(name)
+            if reference is not None:
+                unseen.discard(name)
+                self.add_usage(reference[1], reference[0], stat.st_size)
+            elif name in queued:
+                self.add_usage(self.mtime_year(stat), 'queued', stat.st_size)
+            elif stat.st_mtime > cutoff:
+                self.add_usage(self.mtime_year(stat), 'recent', stat.st_size)
+            else:
+                self._candidates.append((name, stat))
+                if len(self._candidates) >= CONFIRM_BATCH_SIZE:
+                    self.confirm_orphans()
+        self.confirm_orphans()
+        self.missing = sorted(unseen)
+        if self.report:
+            for name in self.missing:
+                self.report.write(f'missing\t{name}\n')
+        return self
+
+    def mtime_year(self, stat):
+        return local_year(datetime.fromtimestamp(stat.st_mtime, tz=timezone.get_current_timezone()))
+
+    def add_usage(self, year, kind, size):
+        total = self.usage[(year, kind)]
+        total[0] += 1
+        total[1] += size
+
+    def confirm_orphans(self):
+        """读取引用后才提交的申请也可能用到这些文件：按批再查一次数据库"""
+        if not self._candidates:
+            return
+        referenced = referenced_names(name for name, _ in self._candidates)
+        for name, stat in self._candidates:
+            # 遍历期间才被引用的文件归为新文件
+            kind = 'recent' if name in referenced else 'orphan'
+            self.add_usage(self.mtime_year(stat), kind, stat.st_size)
+            if kind == 'orphan':
+                self.orphan(name, stat.st_size)
+        self._candidates = []
+
+    def orphan(self, name, size):
+        self.orphans += 1
+        self.orphan_bytes += size
+        if self.report:
+            self.report.write(f'orphan\t{name}\t{size}\n')
+        if self.quarantine:
+            try:
+                target = media_storage.path(f'{self.quarantine}/{name}')
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.rename(media_storage.path(name), target)
+                self.quarantined += 1
+            except OSError as e:
+                print(f"隔离文件失败: {name}, 错误: {e}")
+                self.failures.append((name, str(e)))
+
+
+def new_quarantine_dir():
+    return f'{QUARANTINE_DIR}/{timezone.localtime().strftime(QUARANTINE_STAMP)}'
+
+
+def purge_quarantine(days):
+    """删除早于 days 天的隔离批次，返回删除的批次数"""
+    root = media_storage.path(QUARANTINE_DIR)
+    if not os.path.isdir(root):
+        return 0
+    cutoff = timezone.localtime() - timedelta(days=days)
+    purged = 0
+    with os.scandir(root) as entries:
+        for entry in entries:
+            try:
+                stamp = datetime.strptime(entry.name, QUARANTINE_STAMP)
+            except ValueError:
+                continue
+            if entry.is_dir(follow_symlinks=False) and timezone.make_aware(stamp) < cutoff:
+                shutil.rmtree(entry.path)
+                purged += 1
+    return purged
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0005_accountbook'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='当月1日', unique=True, verbose_name='月份')),
+                ('income', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='当月收入')),
+                ('expense', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='当月支出')),
+                ('entry_count', models.IntegerField(default=0, verbose_name='当月记录数')),
+                ('closing_income', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='累计收入')),
+                ('closing_expense', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='累计支出')),
+                ('closed_at', models.DateTimeField(auto_now_add=True, verbose_name='结账时间')),
+            ],
+            options={
+                'verbose_name': '月度结账快照',
+                'verbose_name_plural': '月度结账快照',
+                'ordering': ['-period'],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0006_ledgersnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reimbursementrequest',
+            index=models.Index(fields=['user', '-submission_date', '-id'], name='reimb_user_submitted_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0007_reimbursement_user_submitted_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accountbook',
+            index=models.Index(fields=['-entry_date', '-created_at'], name='ledger_entry_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accountbook',
+            index=models.Index(fields=['entry_type', '-entry_date', '-created_at'], name='ledger_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reimbursementrequest',
+            index=models.Index(fields=['-submission_date', '-id'], name='reimb_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reimbursementrequest',
+            index=models.Index(fields=['status', '-submission_date', '-id'], name='reimb_status_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reimbursementrequest',
+            index=models.Index(fields=['is_taxi_invoice', '-submission_date', '-id'], name='reimb_taxi_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reimbursementrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['-submission_date', '-id'], name='reimb_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:30
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_entries(apps, schema_editor):
+    """旧的 post_save 检查存在竞态，可能为同一报销申请重复记账：保留最早的一条"""
+    AccountBook = apps.get_model('reimbursement', 'AccountBook')
+    duplicates = (
+        AccountBook.objects.filter(entry_type='reimbursement', reimbursement__isnull=False)
+        .values('reimbursement_id')
+        .annotate(keep=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        AccountBook.objects.filter(
+            entry_type='reimbursement', reimbursement_id=row['reimbursement_id']
+        ).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0008_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_entries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='accountbook',
+            constraint=models.UniqueConstraint(condition=models.Q(('entry_type', 'reimbursement')), fields=('reimbursement',), name='ledger_unique_reimbursement'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0009_unique_reimbursement_entry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50, verbose_name='任务类型')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='任务参数')),
+                ('status', models.CharField(choices=[('queued', '排队中'), ('running', '执行中'), ('succeeded', '已完成'), ('failed', '失败')], default='queued', max_length=10, verbose_name='状态')),
+                ('progress', models.PositiveIntegerField(default=0, verbose_name='已完成')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='总数')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='已尝试次数')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='最多尝试次数')),
+                ('message', models.CharField(blank=True, max_length=255, verbose_name='结果说明')),
+                ('error', models.TextField(blank=True, verbose_name='错误信息')),
+                ('result_file', models.CharField(blank=True, help_text='相对于 JOB_ARTIFACT_ROOT 的路径', max_length=255, verbose_name='结果文件')),
+                ('result_name', models.CharField(blank=True, max_length=255, verbose_name='下载文件名')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='计划执行时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='最近心跳')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='创建人')),
+            ],
+            options={
+                'verbose_name': '后台任务',
+                'verbose_name_plural': '后台任务',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx')],
+            },
+        ),
+    ]
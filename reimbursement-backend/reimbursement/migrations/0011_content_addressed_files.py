@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:35
+
+import reimbursement.models
+import reimbursement.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0010_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reimbursementrequest',
+            name='invoice_filename',
+            field=models.CharField(blank=True, max_length=255, verbose_name='发票文件名'),
+        ),
+        migrations.AddField(
+            model_name='reimbursementrequest',
+            name='itinerary_filename',
+            field=models.CharField(blank=True, max_length=255, verbose_name='行程单文件名'),
+        ),
+        migrations.AlterField(
+            model_name='reimbursementrequest',
+            name='invoice_pdf',
+            field=models.FileField(blank=True, db_index=True, null=True, storage=reimbursement.storage.ContentAddressedStorage(), upload_to=reimbursement.models.get_invoice_path, verbose_name='发票PDF'),
+        ),
+        migrations.AlterField(
+            model_name='reimbursementrequest',
+            name='itinerary_pdf',
+            field=models.FileField(blank=True, db_index=True, null=True, storage=reimbursement.storage.ContentAddressedStorage(), upload_to=reimbursement.models.get_itinerary_path, verbose_name='行程单PDF'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+"""
+把 media/invoices 和 media/itineraries 下的已有文件转为按内容寻址存储（blobs/ab/<sha256>.pdf）
+
+- 相同内容的文件只保留一份，多条记录指向同一个 blob
+- 原文件名写入 invoice_filename / itinerary_filename，后台和打包下载仍显示原名
+- 迁移过程中只创建 blob（同一文件系统用硬链接），事务提交后才删除旧文件；
+  迁移失败回滚时旧文件原样保留，多出的 blob 没有记录引用，可被清理
+- 磁盘上已不存在的文件保持原名称不变
+"""
+import hashlib
+import os
+import shutil
+from django.conf import settings
+from django.db import migrations, transaction
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def convert_to_blobs(apps, schema_editor):
+    ReimbursementRequest = apps.get_model('reimbursement', 'ReimbursementRequest')
+    root = str(settings.MEDIA_ROOT)
+    converted = {}      # 旧名称 -> blob 名称
+    obsolete = []       # 提交后删除的旧文件
+    missing = 0
+
+    def convert(name):
+        nonlocal missing
+        if name in converted:
+            return converted[name]
+        old_path = os.path.join(root, name)
+        if not os.path.isfile(old_path):
+            missing += 1
+            converted[name] = None
+            return None
+        digest = file_sha256(old_path)
+        ext = os.path.splitext(name)[1].lower() or '.pdf'
+        blob = f'blobs/{digest[:2]}/{digest}{ext}'
+        blob_path = os.path.join(root, blob)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            try:
+                os.link(old_path, blob_path)
+            except OSError:
+                shutil.copy2(old_path, blob_path)
+        obsolete.append(old_path)
+        converted[name] = blob
+        return blob
+
+    rows = (
+        ReimbursementRequest.objects.order_by('pk')
+        .values_list('pk', 'invoice_pdf', 'itinerary_pdf')
+    )
+    for pk, invoice, itinerary in rows.iterator(chunk_size=500):
+        updates = {}
+        for field, name in (('invoice', invoice), ('itinerary', itinerary)):
+            if not name or name.startswith('blobs/'):
+                continue
+            blob = convert(name)
+            if blob:
+                updates[f'{field}_pdf'] = blob
+                updates[f'{field}_filename'] = os.path.basename(name)[:255]
+        if updates:
+            ReimbursementRequest.objects.filter(pk=pk).update(**updates)
+
+    def remove_obsolete():
+        for path in obsolete:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"删除旧文件失败: {path}, 错误: {e}")
+
+    transaction.on_commit(remove_obsolete, using=schema_editor.connection.alias)
+    if not converted:
+        return
+    blobs = len({blob for blob in converted.values() if blob})
+    print(f"\n  已转换 {len(obsolete)} 个文件，去重后 {blobs} 个；{missing} 个文件在磁盘上不存在")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0011_content_addressed_files'),
+    ]
+
+    operations = [
+        # 反向迁移无需处理：blob 名称本身就是有效的相对路径，旧代码也能读取
+        migrations.RunPython(convert_to_blobs, migrations.RunPython.noop),
+    ]
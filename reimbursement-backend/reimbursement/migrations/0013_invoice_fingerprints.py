@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0012_convert_media_to_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reimbursementrequest',
+            name='is_suspected_duplicate',
+            field=models.BooleanField(default=False, help_text='金额和开票日期与其他申请相同', verbose_name='疑似重复报销'),
+        ),
+        migrations.CreateModel(
+            name='InvoiceFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('sha256', '文件哈希'), ('amount_date', '金额+开票日期'), ('invoice_no', '发票号码')], max_length=20, verbose_name='类型')),
+                ('key', models.CharField(max_length=100, verbose_name='指纹')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='reimbursement.reimbursementrequest', verbose_name='报销申请')),
+            ],
+            options={
+                'verbose_name': '发票指纹',
+                'verbose_name_plural': '发票指纹',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key', 'request'), name='fingerprint_kind_key_request')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:40
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0013_invoice_fingerprints'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('invoice', '发票'), ('itinerary', '行程单')], max_length=20, verbose_name='文件类型')),
+                ('filename', models.CharField(max_length=255, verbose_name='原文件名')),
+                ('size', models.PositiveBigIntegerField(verbose_name='文件大小')),
+                ('chunk_size', models.PositiveIntegerField(verbose_name='分片大小')),
+                ('total_chunks', models.PositiveIntegerField(verbose_name='分片数')),
+                ('sha256', models.CharField(blank=True, help_text='客户端提供时合并后校验，完成后为实际哈希', max_length=64, verbose_name='文件哈希')),
+                ('status', models.CharField(choices=[('uploading', '上传中'), ('complete', '已完成')], default='uploading', max_length=10, verbose_name='状态')),
+                ('file', models.CharField(blank=True, db_index=True, help_text='合并完成后的存储文件', max_length=255, verbose_name='存储名称')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('expires_at', models.DateTimeField(verbose_name='过期时间')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='上传用户')),
+            ],
+            options={
+                'verbose_name': '分片上传',
+                'verbose_name_plural': '分片上传',
+            },
+        ),
+        migrations.CreateModel(
+            name='UploadChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField(verbose_name='分片序号')),
+                ('size', models.PositiveIntegerField(verbose_name='大小')),
+                ('sha256', models.CharField(max_length=64, verbose_name='分片哈希')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='reimbursement.uploadsession', verbose_name='上传会话')),
+            ],
+            options={
+                'verbose_name': '上传分片',
+                'verbose_name_plural': '上传分片',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='uploadsession',
+            index=models.Index(fields=['expires_at'], name='upload_expires_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='uploadchunk',
+            constraint=models.UniqueConstraint(fields=('session', 'index'), name='upload_chunk_unique_index'),
+        ),
+    ]
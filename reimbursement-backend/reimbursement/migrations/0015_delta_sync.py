@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0014_chunked_uploads'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedReimbursement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('request_id', models.BigIntegerField(verbose_name='申请ID')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='删除时间')),
+            ],
+            options={
+                'verbose_name': '已删除的报销申请',
+                'verbose_name_plural': '已删除的报销申请',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reimbursementrequest',
+            index=models.Index(fields=['user', 'last_modified_date'], name='reimb_user_modified_idx'),
+        ),
+        migrations.AddField(
+            model_name='deletedreimbursement',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='提交用户'),
+        ),
+        migrations.AddIndex(
+            model_name='deletedreimbursement',
+            index=models.Index(fields=['user', 'deleted_at'], name='deleted_reimb_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deletedreimbursement',
+            index=models.Index(fields=['deleted_at'], name='deleted_reimb_date_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0015_delta_sync'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reimbursementrequest',
+            index=models.Index(fields=['last_modified_date'], name='reimb_modified_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:05
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_approved_at(apps, schema_editor):
+    """已审核通过的旧申请没有记录通过时间，以最后修改时间近似（汇总表由 rebuild_report_summaries 生成）"""
+    ReimbursementRequest = apps.get_model('reimbursement', 'ReimbursementRequest')
+    ReimbursementRequest.objects.filter(status='approved').update(approved_at=F('last_modified_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0016_status_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reimbursementrequest',
+            name='approved_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='审核通过时间'),
+        ),
+        migrations.RunPython(backfill_approved_at, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='ApprovalSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='提交月份的1日', verbose_name='月份')),
+                ('real_name', models.CharField(max_length=100, verbose_name='姓名')),
+                ('is_taxi_invoice', models.BooleanField(verbose_name='是否为打车发票')),
+                ('approved_count', models.IntegerField(default=0, verbose_name='通过笔数')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='金额合计')),
+                ('latency_seconds', models.BigIntegerField(default=0, help_text='提交到审核通过', verbose_name='审核耗时合计（秒）')),
+            ],
+            options={
+                'verbose_name': '审核汇总',
+                'verbose_name_plural': '审核汇总',
+                'ordering': ['-period', 'real_name', 'is_taxi_invoice'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'real_name', 'is_taxi_invoice'), name='approval_summary_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SpendingSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='当月1日', verbose_name='月份')),
+                ('real_name', models.CharField(max_length=100, verbose_name='姓名')),
+                ('entry_type', models.CharField(choices=[('reimbursement', '报销支出'), ('income', '收入'), ('expense', '其他支出')], max_length=20, verbose_name='类型')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='金额合计')),
+                ('entry_count', models.IntegerField(default=0, verbose_name='记录数')),
+            ],
+            options={
+                'verbose_name': '记账汇总',
+                'verbose_name_plural': '记账汇总',
+                'ordering': ['-period', 'real_name', 'entry_type'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'real_name', 'entry_type'), name='spending_summary_key')],
+            },
+        ),
+    ]
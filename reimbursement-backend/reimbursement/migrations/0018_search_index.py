@@ -0,0 +1,130 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:40
+"""
+搜索索引：PostgreSQL 上创建 pg_trgm 的 GIN 索引，其他数据库生成应用内倒排索引（见 reimbursement/search.py）
+"""
+
+from django.conf import settings
+from django.db import migrations, models
+
+# (表, 列)：索引表达式与 icontains 生成的 UPPER(列::text) 一致
+TRIGRAM_COLUMNS = [
+    ('reimbursement_reimbursementrequest', 'real_name'),
+    ('reimbursement_reimbursementrequest', 'reason'),
+    ('reimbursement_reimbursementrequest', 'remarks'),
+    ('reimbursement_accountbook', 'real_name'),
+    ('reimbursement_accountbook', 'reason'),
+    ('reimbursement_accountbook', 'remarks'),
+    ('auth_user', 'username'),
+]
+
+
+def trigram_index_name(table, column):
+    return f'{table.split("_", 1)[1][:20]}_{column}_trgm'
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {trigram_index_name(table, column)} '
+            f'ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {trigram_index_name(table, column)}')
+
+
+# 以下为迁移时的切分规则和索引字段，独立于 reimbursement/search.py，之后修改切分规则时执行 rebuild_search_index
+TOKEN_MODELS = [
+    ('ReimbursementRequest', 'request', ('real_name', 'reason', 'remarks')),
+    ('AccountBook', 'entry', ('real_name', 'reason', 'remarks')),
+]
+WIDE_START = 0x2E80
+INDEX_BATCH_SIZE = 1000
+
+
+def runs(text):
+    result = []
+    current = []
+    wide = False
+    for ch in (text or '').lower():
+        if not ch.isalnum():
+            if current:
+                result.append((wide, ''.join(current)))
+                current = []
+            continue
+        ch_wide = ord(ch) >= WIDE_START
+        if current and ch_wide != wide:
+            result.append((wide, ''.join(current)))
+            current = []
+        current.append(ch)
+        wide = ch_wide
+    if current:
+        result.append((wide, ''.join(current)))
+    return result
+
+
+def ngrams(run, n):
+    return {run[i:i + n] for i in range(len(run) - n + 1)}
+
+
+def document_tokens(texts):
+    tokens = set()
+    for text in texts:
+        for wide, run in runs(text):
+            if wide:
+                tokens |= ngrams(run, 1) | ngrams(run, 2)
+            else:
+                tokens |= ngrams(run, 2) | ngrams(run, 3)
+    return tokens
+
+
+def build_token_index(apps, schema_editor):
+    search_backend = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if search_backend == 'auto':
+        search_backend = 'trigram' if schema_editor.connection.vendor == 'postgresql' else 'index'
+    if search_backend != 'index':
+        return
+    SearchToken = apps.get_model('reimbursement', 'SearchToken')
+    for model_name, kind, fields in TOKEN_MODELS:
+        model = apps.get_model('reimbursement', model_name)
+        rows = []
+        for pk, *texts in model.objects.values_list('pk', *fields).iterator(chunk_size=INDEX_BATCH_SIZE):
+            rows.extend(SearchToken(kind=kind, token=token, object_id=pk) for token in document_tokens(texts))
+            if len(rows) >= INDEX_BATCH_SIZE * 10:
+                SearchToken.objects.bulk_create(rows, batch_size=INDEX_BATCH_SIZE, ignore_conflicts=True)
+                rows = []
+        SearchToken.objects.bulk_create(rows, batch_size=INDEX_BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0017_spending_reports'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('request', '报销申请'), ('entry', '记账记录')], max_length=10, verbose_name='记录类型')),
+                ('token', models.CharField(max_length=8, verbose_name='词元')),
+                ('object_id', models.BigIntegerField(verbose_name='记录ID')),
+            ],
+            options={
+                'verbose_name': '搜索索引',
+                'verbose_name_plural': '搜索索引',
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='search_token_object_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'token', 'object_id'), name='search_token_key')],
+            },
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+        migrations.RunPython(build_token_index, migrations.RunPython.noop),
+    ]
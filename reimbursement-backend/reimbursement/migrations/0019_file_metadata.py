@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0018_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reimbursementrequest',
+            name='invoice_mime',
+            field=models.CharField(blank=True, max_length=100, verbose_name='发票文件类型'),
+        ),
+        migrations.AddField(
+            model_name='reimbursementrequest',
+            name='invoice_pages',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='发票页数'),
+        ),
+        migrations.AddField(
+            model_name='reimbursementrequest',
+            name='invoice_sha256',
+            field=models.CharField(blank=True, max_length=64, verbose_name='发票文件哈希'),
+        ),
+        migrations.AddField(
+            model_name='reimbursementrequest',
+            name='invoice_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True, verbose_name='发票文件大小'),
+        ),
+        migrations.AddField(
+            model_name='reimbursementrequest',
+            name='itinerary_mime',
+            field=models.CharField(blank=True, max_length=100, verbose_name='行程单文件类型'),
+        ),
+        migrations.AddField(
+            model_name='reimbursementrequest',
+            name='itinerary_pages',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='行程单页数'),
+        ),
+        migrations.AddField(
+            model_name='reimbursementrequest',
+            name='itinerary_sha256',
+            field=models.CharField(blank=True, max_length=64, verbose_name='行程单文件哈希'),
+        ),
+        migrations.AddField(
+            model_name='reimbursementrequest',
+            name='itinerary_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True, verbose_name='行程单文件大小'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:32
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0019_file_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingFileDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='存储名称')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='登记时间')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='计划删除时间')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='失败次数')),
+                ('claim', models.CharField(blank=True, max_length=32, verbose_name='领取标记')),
+                ('last_error', models.TextField(blank=True, verbose_name='最近错误')),
+            ],
+            options={
+                'verbose_name': '待删除文件',
+                'verbose_name_plural': '待删除文件',
+                'indexes': [models.Index(fields=['run_after'], name='file_deletion_run_after_idx')],
+            },
+        ),
+    ]
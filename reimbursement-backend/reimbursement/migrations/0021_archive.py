@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reimbursement', '0020_pending_file_deletion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True, verbose_name='原申请ID')),
+                ('username', models.CharField(blank=True, max_length=150, verbose_name='提交用户名')),
+                ('real_name', models.CharField(max_length=100, verbose_name='真实姓名')),
+                ('reason', models.CharField(max_length=255, verbose_name='报销事由')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='金额')),
+                ('is_taxi_invoice', models.BooleanField(default=False, verbose_name='是否为打车发票')),
+                ('remarks', models.TextField(blank=True, verbose_name='备注')),
+                ('status', models.CharField(choices=[('pending', '待审核'), ('approved', '审核通过'), ('rejected', '审核不通过')], max_length=10, verbose_name='审核状态')),
+                ('submission_date', models.DateTimeField(verbose_name='提交日期')),
+                ('last_modified_date', models.DateTimeField(verbose_name='最后修改日期')),
+                ('approved_at', models.DateTimeField(blank=True, null=True, verbose_name='审核通过时间')),
+                ('invoice_filename', models.CharField(blank=True, max_length=255, verbose_name='发票文件名')),
+                ('itinerary_filename', models.CharField(blank=True, max_length=255, verbose_name='行程单文件名')),
+                ('invoice_size', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='发票文件大小')),
+                ('invoice_pages', models.PositiveIntegerField(blank=True, null=True, verbose_name='发票页数')),
+                ('invoice_sha256', models.CharField(blank=True, max_length=64, verbose_name='发票文件哈希')),
+                ('invoice_mime', models.CharField(blank=True, max_length=100, verbose_name='发票文件类型')),
+                ('itinerary_size', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='行程单文件大小')),
+                ('itinerary_pages', models.PositiveIntegerField(blank=True, null=True, verbose_name='行程单页数')),
+                ('itinerary_sha256', models.CharField(blank=True, max_length=64, verbose_name='行程单文件哈希')),
+                ('itinerary_mime', models.CharField(blank=True, max_length=100, verbose_name='行程单文件类型')),
+                ('container', models.CharField(blank=True, help_text='相对于 ARCHIVE_ROOT 的月度 zip', max_length=100, verbose_name='归档文件')),
+                ('invoice_member', models.CharField(blank=True, max_length=100, verbose_name='发票在归档中的名称')),
+                ('itinerary_member', models.CharField(blank=True, max_length=100, verbose_name='行程单在归档中的名称')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='归档时间')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='提交用户')),
+            ],
+            options={
+                'verbose_name': '归档的报销申请',
+                'verbose_name_plural': '归档的报销申请',
+                'ordering': ['-submission_date', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('sha256', '文件哈希'), ('amount_date', '金额+开票日期'), ('invoice_no', '发票号码')], max_length=20, verbose_name='类型')),
+                ('key', models.CharField(max_length=100, verbose_name='指纹')),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='reimbursement.archivedrequest', verbose_name='归档的报销申请')),
+            ],
+            options={
+                'verbose_name': '归档的发票指纹',
+                'verbose_name_plural': '归档的发票指纹',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedAccountBook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True, verbose_name='原记录ID')),
+                ('entry_date', models.DateTimeField(verbose_name='记账日期')),
+                ('entry_type', models.CharField(choices=[('reimbursement', '报销支出'), ('income', '收入'), ('expense', '其他支出')], max_length=20, verbose_name='类型')),
+                ('real_name', models.CharField(max_length=100, verbose_name='提交人姓名')),
+                ('reason', models.CharField(max_length=255, verbose_name='事由')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='金额')),
+                ('remarks', models.TextField(blank=True, verbose_name='备注')),
+                ('created_at', models.DateTimeField(verbose_name='创建时间')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='创建人')),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='reimbursement.archivedrequest', verbose_name='归档的报销申请')),
+            ],
+            options={
+                'verbose_name': '归档的记账记录',
+                'verbose_name_plural': '归档的记账记录',
+                'ordering': ['-entry_date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedrequest',
+            index=models.Index(fields=['-submission_date', '-id'], name='archived_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedfingerprint',
+            index=models.Index(fields=['kind', 'key'], name='archived_fingerprint_key_idx'),
+        ),
+    ]
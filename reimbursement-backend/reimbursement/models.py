@@ -1,26 +1,35 @@
 # reimbursement/models.py
 import os
+from contextlib import contextmanager
+from contextvars import ContextVar
 from uuid import uuid4
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import pre_delete, post_delete, post_save
+from django.db.models.signals import pre_delete, post_delete, pre_save, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 from datetime import datetime
+from .storage import media_storage
 
-def get_invoice_path(instance, filename):
+FILENAME_MAX_LENGTH = 255
+
+def friendly_filename(real_name, reason, label=''):
+    """下载时显示的文件名：日期-姓名-事由[-标签]-随机后缀.pdf"""
     date_str = datetime.now().strftime('%Y_%m_%d')
-    safe_reason = "".join([c for c in instance.reason if c.isalnum() or c.isspace()]).rstrip().replace(' ', '_')
+    safe_reason = "".join([c for c in reason if c.isalnum() or c.isspace()]).rstrip().replace(' ', '_')
     unique_id = uuid4().hex[:6]
-    new_filename = f"{date_str}-{instance.real_name}-{safe_reason}-{unique_id}.pdf"
-    return os.path.join('invoices', new_filename)
+    label_part = f"-{label}" if label else ""
+    return f"{date_str}-{real_name}-{safe_reason}{label_part}-{unique_id}.pdf"[-FILENAME_MAX_LENGTH:]
+
+def get_invoice_path(instance, filename):
+    """发票文件名：实际存储位置由内容哈希决定，这里生成的名称作为下载时显示的文件名"""
+    instance.invoice_filename = friendly_filename(instance.real_name, instance.reason)
+    return os.path.join('invoices', instance.invoice_filename)
 
 def get_itinerary_path(instance, filename):
-    """行程单文件路径"""
-    date_str = datetime.now().strftime('%Y_%m_%d')
-    safe_reason = "".join([c for c in instance.reason if c.isalnum() or c.isspace()]).rstrip().replace(' ', '_')
-    unique_id = uuid4().hex[:6]
-    new_filename = f"{date_str}-{instance.real_name}-{safe_reason}-行程单-{unique_id}.pdf"
-    return os.path.join('itineraries', new_filename)
+    """行程单文件名"""
+    instance.itinerary_filename = friendly_filename(instance.real_name, instance.reason, '行程单')
+    return os.path.join('itineraries', instance.itinerary_filename)
 
 class ReimbursementRequest(models.Model):
     STATUS_CHOICES = [('pending', '待审核'), ('approved', '审核通过'), ('rejected', '审核不通过')]
@@ -28,17 +37,93 @@ class ReimbursementRequest(models.Model):
     real_name = models.CharField(max_length=100, verbose_name="真实姓名")
     reason = models.CharField(max_length=255, verbose_name="报销事由")
     amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="金额")
-    invoice_pdf = models.FileField(upload_to=get_invoice_path, verbose_name="发票PDF", blank=True, null=True)
+    # 文件按内容哈希存储（blobs/ab/<sha256>.pdf），相同内容的多条记录共用一个文件
+    # db_index：删除文件前按名称查询是否还有其他记录引用
+    invoice_pdf = models.FileField(upload_to=get_invoice_path, storage=media_storage, db_index=True, verbose_name="发票PDF", blank=True, null=True)
     is_taxi_invoice = models.BooleanField(default=False, verbose_name="是否为打车发票")
-    itinerary_pdf = models.FileField(upload_to=get_itinerary_path, verbose_name="行程单PDF", blank=True, null=True)
+    itinerary_pdf = models.FileField(upload_to=get_itinerary_path, storage=media_storage, db_index=True, verbose_name="行程单PDF", blank=True, null=True)
     remarks = models.TextField(blank=True, verbose_name="备注")
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="审核状态")
     rejection_reason = models.TextField(blank=True, verbose_name="不通过理由")
     submission_date = models.DateTimeField(auto_now_add=True, verbose_name="提交日期")
     last_modified_date = models.DateTimeField(auto_now=True, verbose_name="最后修改日期")
+    # 状态变为审核通过时填写（离开审核通过时清空），用于统计审核耗时
+    approved_at = models.DateTimeField(null=True, blank=True, verbose_name="审核通过时间")
+    # 下载时显示的文件名，上传时由 get_invoice_path / get_itinerary_path 填写
+    invoice_filename = models.CharField(max_length=FILENAME_MAX_LENGTH, blank=True, verbose_name="发票文件名")
+    itinerary_filename = models.CharField(max_length=FILENAME_MAX_LENGTH, blank=True, verbose_name="行程单文件名")
+    is_suspected_duplicate = models.BooleanField(default=False, verbose_name="疑似重复报销", help_text="金额和开票日期与其他申请相同")
+    # 文件信息在保存文件时记录（见 file_metadata.py），后台列表直接显示，不访问文件系统
+    invoice_size = models.PositiveBigIntegerField(null=True, blank=True, verbose_name="发票文件大小")
+    invoice_pages = models.PositiveIntegerField(null=True, blank=True, verbose_name="发票页数")
+    invoice_sha256 = models.CharField(max_length=64, blank=True, verbose_name="发票文件哈希")
+    invoice_mime = models.CharField(max_length=100, blank=True, verbose_name="发票文件类型")
+    itinerary_size = models.PositiveBigIntegerField(null=True, blank=True, verbose_name="行程单文件大小")
+    itinerary_pages = models.PositiveIntegerField(null=True, blank=True, verbose_name="行程单页数")
+    itinerary_sha256 = models.CharField(max_length=64, blank=True, verbose_name="行程单文件哈希")
+    itinerary_mime = models.CharField(max_length=100, blank=True, verbose_name="行程单文件类型")
+    
+    class Meta:
+        indexes = [
+            # “我的报销”游标分页：WHERE user_id = ? ORDER BY submission_date DESC, id DESC
+            models.Index(fields=['user', '-submission_date', '-id'], name='reimb_user_submitted_idx'),
+            # “我的报销”增量同步：WHERE user_id = ? AND last_modified_date >= ?，以及 MAX(last_modified_date)
+            models.Index(fields=['user', 'last_modified_date'], name='reimb_user_modified_idx'),
+            # 审核结果推送：每个进程定时查询 WHERE last_modified_date >= 水位
+            models.Index(fields=['last_modified_date'], name='reimb_modified_idx'),
+            # 后台列表按提交时间倒序，以及按提交日期筛选
+            models.Index(fields=['-submission_date', '-id'], name='reimb_submitted_idx'),
+            # 后台按审核状态 / 是否打车发票筛选
+            models.Index(fields=['status', '-submission_date', '-id'], name='reimb_status_submitted_idx'),
+            models.Index(fields=['is_taxi_invoice', '-submission_date', '-id'], name='reimb_taxi_submitted_idx'),
+            # 待审核队列只占全表一小部分，部分索引体积小且常驻缓存
+            models.Index(
+                fields=['-submission_date', '-id'], name='reimb_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.submission_date.strftime('%Y-%m-%d')} - {self.real_name} - {self.reason}"
+    
+    @property
+    def invoice_display_name(self):
+        """发票的显示文件名（旧数据没有记录时取存储名称）"""
+        if not self.invoice_pdf:
+            return ''
+        return self.invoice_filename or os.path.basename(self.invoice_pdf.name)
+    
+    @property
+    def itinerary_display_name(self):
+        if not self.itinerary_pdf:
+            return ''
+        return self.itinerary_filename or os.path.basename(self.itinerary_pdf.name)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录加载时的审核状态，保存时据此判断是否发生了状态变化
+        instance._loaded_status = None if 'status' in instance.get_deferred_fields() else instance.status
+        # 记录加载时计入审核汇总的字段，保存或删除时据此增量更新汇总表
+        from .reports import remember_request_state
+        remember_request_state(instance)
+        from .search import remember_search_text
+        remember_search_text(instance)
+        return instance
+
+class DeletedReimbursement(models.Model):
+    """已删除申请的记录，供“我的报销”增量同步通知客户端移除（保留 DELTA_SYNC_TOMBSTONE_DAYS 天）"""
+    request_id = models.BigIntegerField(verbose_name="申请ID")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="提交用户")
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name="删除时间")
+    
+    class Meta:
+        verbose_name = "已删除的报销申请"
+        verbose_name_plural = "已删除的报销申请"
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='deleted_reimb_user_idx'),
+            models.Index(fields=['deleted_at'], name='deleted_reimb_date_idx'),
+        ]
 
 class Notice(models.Model):
     """系统公告/注意事项"""
@@ -86,47 +171,449 @@ class AccountBook(models.Model):
         verbose_name = "财务记账本"
         verbose_name_plural = "财务记账本"
         ordering = ['-entry_date', '-created_at']
+        indexes = [
+            # 默认排序及后台 date_hierarchy 的日期范围筛选
+            models.Index(fields=['-entry_date', '-created_at'], name='ledger_entry_date_idx'),
+            # 后台按类型筛选
+            models.Index(fields=['entry_type', '-entry_date', '-created_at'], name='ledger_type_date_idx'),
+        ]
+        constraints = [
+            # 每个报销申请最多对应一条报销支出记录
+            models.UniqueConstraint(
+                fields=['reimbursement'], condition=models.Q(entry_type='reimbursement'),
+                name='ledger_unique_reimbursement',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.entry_date.strftime('%Y-%m-%d')} - {self.real_name} - {self.reason} - ¥{self.amount}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录加载时的类型/金额/日期，保存或删除时据此增量更新月度快照
+        from .ledger import remember_entry_state
+        remember_entry_state(instance)
+        from .search import remember_search_text
+        remember_search_text(instance)
+        return instance
+
+class LedgerSnapshot(models.Model):
+    """记账本月度结账快照：当月收支合计及截至月末的累计收支"""
+    period = models.DateField(unique=True, verbose_name="月份", help_text="当月1日")
+    income = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="当月收入")
+    expense = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="当月支出")
+    entry_count = models.IntegerField(default=0, verbose_name="当月记录数")
+    closing_income = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="累计收入")
+    closing_expense = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="累计支出")
+    closed_at = models.DateTimeField(auto_now_add=True, verbose_name="结账时间")
+    
+    class Meta:
+        verbose_name = "月度结账快照"
+        verbose_name_plural = "月度结账快照"
+        ordering = ['-period']
+    
+    @property
+    def closing_balance(self):
+        return self.closing_income - self.closing_expense
+    
+    def __str__(self):
+        return f"{self.period.strftime('%Y-%m')} 月末余额 ¥{self.closing_balance}"
 
-# 信号处理：删除报销申请时自动删除关联的PDF文件
+class SearchToken(models.Model):
+    """搜索倒排索引（不支持 pg_trgm 的数据库使用）：文本切分出的 token -> 记录ID，见 search.py"""
+    KIND_CHOICES = [('request', '报销申请'), ('entry', '记账记录')]
+    
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name="记录类型")
+    token = models.CharField(max_length=8, verbose_name="词元")
+    object_id = models.BigIntegerField(verbose_name="记录ID")
+    
+    class Meta:
+        verbose_name = "搜索索引"
+        verbose_name_plural = "搜索索引"
+        constraints = [
+            # 同时作为按 (kind, token) 查找候选记录的索引
+            models.UniqueConstraint(fields=['kind', 'token', 'object_id'], name='search_token_key'),
+        ]
+        indexes = [
+            # 记录更新/删除时清除旧 token
+            models.Index(fields=['kind', 'object_id'], name='search_token_object_idx'),
+        ]
+
+class SpendingSummary(models.Model):
+    """记账本按 (月份, 姓名, 类型) 的汇总，记账记录增删改时增量维护（见 reports.py）"""
+    period = models.DateField(verbose_name="月份", help_text="当月1日")
+    real_name = models.CharField(max_length=100, verbose_name="姓名")
+    entry_type = models.CharField(max_length=20, choices=AccountBook.ENTRY_TYPE_CHOICES, verbose_name="类型")
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="金额合计")
+    entry_count = models.IntegerField(default=0, verbose_name="记录数")
+    
+    class Meta:
+        verbose_name = "记账汇总"
+        verbose_name_plural = "记账汇总"
+        ordering = ['-period', 'real_name', 'entry_type']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'real_name', 'entry_type'], name='spending_summary_key'),
+        ]
+    
+    def __str__(self):
+        return f"{self.period.strftime('%Y-%m')} - {self.real_name} - {self.get_entry_type_display()}"
+
+class ApprovalSummary(models.Model):
+    """审核通过的报销申请按 (提交月份, 姓名, 是否打车) 的汇总，状态变为/离开审核通过时增量维护"""
+    period = models.DateField(verbose_name="月份", help_text="提交月份的1日")
+    real_name = models.CharField(max_length=100, verbose_name="姓名")
+    is_taxi_invoice = models.BooleanField(verbose_name="是否为打车发票")
+    approved_count = models.IntegerField(default=0, verbose_name="通过笔数")
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="金额合计")
+    latency_seconds = models.BigIntegerField(default=0, verbose_name="审核耗时合计（秒）", help_text="提交到审核通过")
+    
+    class Meta:
+        verbose_name = "审核汇总"
+        verbose_name_plural = "审核汇总"
+        ordering = ['-period', 'real_name', 'is_taxi_invoice']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'real_name', 'is_taxi_invoice'], name='approval_summary_key'),
+        ]
+    
+    @property
+    def average_latency(self):
+        """平均审核耗时（秒）"""
+        return self.latency_seconds / self.approved_count if self.approved_count else None
+    
+    def __str__(self):
+        return f"{self.period.strftime('%Y-%m')} - {self.real_name} - {'打车' if self.is_taxi_invoice else '非打车'}"
+
+class BackgroundJob(models.Model):
+    """后台任务（导出、打包、文件清理），由 manage.py run_jobs 执行"""
+    STATUS_CHOICES = [('queued', '排队中'), ('running', '执行中'), ('succeeded', '已完成'), ('failed', '失败')]
+    
+    kind = models.CharField(max_length=50, verbose_name="任务类型")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="任务参数")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', verbose_name="状态")
+    progress = models.PositiveIntegerField(default=0, verbose_name="已完成")
+    total = models.PositiveIntegerField(default=0, verbose_name="总数")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="已尝试次数")
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name="最多尝试次数")
+    message = models.CharField(max_length=255, blank=True, verbose_name="结果说明")
+    error = models.TextField(blank=True, verbose_name="错误信息")
+    result_file = models.CharField(max_length=255, blank=True, verbose_name="结果文件", help_text="相对于 JOB_ARTIFACT_ROOT 的路径")
+    result_name = models.CharField(max_length=255, blank=True, verbose_name="下载文件名")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="创建人")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="计划执行时间")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="开始时间")
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name="最近心跳")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="完成时间")
+    
+    class Meta:
+        verbose_name = "后台任务"
+        verbose_name_plural = "后台任务"
+        ordering = ['-created_at']
+        indexes = [
+            # worker 领取任务：WHERE status = 'queued' AND run_after <= now ORDER BY run_after
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.id} {self.kind} ({self.get_status_display()})"
+
+class PendingFileDeletion(models.Model):
+    """待删除的媒体文件：与引起删除的数据修改在同一事务中登记，提交后由 run_jobs worker 批量删除"""
+    name = models.CharField(max_length=255, unique=True, verbose_name="存储名称")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="登记时间")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="计划删除时间")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="失败次数")
+    claim = models.CharField(max_length=32, blank=True, verbose_name="领取标记")
+    last_error = models.TextField(blank=True, verbose_name="最近错误")
+    
+    class Meta:
+        verbose_name = "待删除文件"
+        verbose_name_plural = "待删除文件"
+        indexes = [
+            # worker 领取：WHERE run_after <= now ORDER BY run_after
+            models.Index(fields=['run_after'], name='file_deletion_run_after_idx'),
+        ]
+    
+    def __str__(self):
+        return self.name
+
+class InvoiceFingerprint(models.Model):
+    """发票指纹：提交时按 (类型, 值) 查找是否有其他申请使用了同一张发票"""
+    KIND_CHOICES = [
+        ('sha256', '文件哈希'),
+        ('amount_date', '金额+开票日期'),
+        ('invoice_no', '发票号码'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="类型")
+    key = models.CharField(max_length=100, verbose_name="指纹")
+    request = models.ForeignKey(ReimbursementRequest, on_delete=models.CASCADE, related_name='fingerprints', verbose_name="报销申请")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    
+    class Meta:
+        verbose_name = "发票指纹"
+        verbose_name_plural = "发票指纹"
+        constraints = [
+            # 同时作为 (kind, key) 查找的索引
+            models.UniqueConstraint(fields=['kind', 'key', 'request'], name='fingerprint_kind_key_request'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.key}"
+
+class UploadSession(models.Model):
+    """分片上传会话：文件分片写入 MEDIA_ROOT/uploads/<id>.part，全部到齐后合并为存储文件"""
+    KIND_CHOICES = [('invoice', '发票'), ('itinerary', '行程单')]
+    STATUS_CHOICES = [('uploading', '上传中'), ('complete', '已完成')]
+    
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="上传用户")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="文件类型")
+    filename = models.CharField(max_length=FILENAME_MAX_LENGTH, verbose_name="原文件名")
+    size = models.PositiveBigIntegerField(verbose_name="文件大小")
+    chunk_size = models.PositiveIntegerField(verbose_name="分片大小")
+    total_chunks = models.PositiveIntegerField(verbose_name="分片数")
+    sha256 = models.CharField(max_length=64, blank=True, verbose_name="文件哈希", help_text="客户端提供时合并后校验，完成后为实际哈希")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='uploading', verbose_name="状态")
+    file = models.CharField(max_length=255, blank=True, db_index=True, verbose_name="存储名称", help_text="合并完成后的存储文件")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    expires_at = models.DateTimeField(verbose_name="过期时间")
+    
+    class Meta:
+        verbose_name = "分片上传"
+        verbose_name_plural = "分片上传"
+        indexes = [
+            models.Index(fields=['expires_at'], name='upload_expires_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.filename} ({self.get_status_display()})"
+
+class UploadChunk(models.Model):
+    """已收到的分片"""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks', verbose_name="上传会话")
+    index = models.PositiveIntegerField(verbose_name="分片序号")
+    size = models.PositiveIntegerField(verbose_name="大小")
+    sha256 = models.CharField(max_length=64, verbose_name="分片哈希")
+    
+    class Meta:
+        verbose_name = "上传分片"
+        verbose_name_plural = "上传分片"
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'index'], name='upload_chunk_unique_index'),
+        ]
+
+class ArchivedRequest(models.Model):
+    """
+    归档的报销申请（manage.py archive_requests）：从热表移出，发票/行程单打包在 ARCHIVE_ROOT 下的月度 zip 中
+    按原申请ID仍可下载文件；统计汇总表和记账快照中的数据不变
+    """
+    original_id = models.BigIntegerField(unique=True, verbose_name="原申请ID")
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="提交用户")
+    username = models.CharField(max_length=150, blank=True, verbose_name="提交用户名")
+    real_name = models.CharField(max_length=100, verbose_name="真实姓名")
+    reason = models.CharField(max_length=255, verbose_name="报销事由")
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="金额")
+    is_taxi_invoice = models.BooleanField(default=False, verbose_name="是否为打车发票")
+    remarks = models.TextField(blank=True, verbose_name="备注")
+    status = models.CharField(max_length=10, choices=ReimbursementRequest.STATUS_CHOICES, verbose_name="审核状态")
+    submission_date = models.DateTimeField(verbose_name="提交日期")
+    last_modified_date = models.DateTimeField(verbose_name="最后修改日期")
+    approved_at = models.DateTimeField(null=True, blank=True, verbose_name="审核通过时间")
+    invoice_filename = models.CharField(max_length=FILENAME_MAX_LENGTH, blank=True, verbose_name="发票文件名")
+    itinerary_filename = models.CharField(max_length=FILENAME_MAX_LENGTH, blank=True, verbose_name="行程单文件名")
+    invoice_size = models.PositiveBigIntegerField(null=True, blank=True, verbose_name="发票文件大小")
+    invoice_pages = models.PositiveIntegerField(null=True, blank=True, verbose_name="发票页数")
+    invoice_sha256 = models.CharField(max_length=64, blank=True, verbose_name="发票文件哈希")
+    invoice_mime = models.CharField(max_length=100, blank=True, verbose_name="发票文件类型")
+    itinerary_size = models.PositiveBigIntegerField(null=True, blank=True, verbose_name="行程单文件大小")
+    itinerary_pages = models.PositiveIntegerField(null=True, blank=True, verbose_name="行程单页数")
+    itinerary_sha256 = models.CharField(max_length=64, blank=True, verbose_name="行程单文件哈希")
+    itinerary_mime = models.CharField(max_length=100, blank=True, verbose_name="行程单文件类型")
+    container = models.CharField(max_length=100, blank=True, verbose_name="归档文件", help_text="相对于 ARCHIVE_ROOT 的月度 zip")
+    invoice_member = models.CharField(max_length=100, blank=True, verbose_name="发票在归档中的名称")
+    itinerary_member = models.CharField(max_length=100, blank=True, verbose_name="行程单在归档中的名称")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="归档时间")
+    
+    class Meta:
+        verbose_name = "归档的报销申请"
+        verbose_name_plural = "归档的报销申请"
+        ordering = ['-submission_date', '-id']
+        indexes = [
+            models.Index(fields=['-submission_date', '-id'], name='archived_submitted_idx'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.original_id} {self.submission_date.strftime('%Y-%m-%d')} - {self.real_name} - {self.reason}"
+    
+    @property
+    def invoice_display_name(self):
+        return self.invoice_filename or self.invoice_member
+    
+    @property
+    def itinerary_display_name(self):
+        return self.itinerary_filename or self.itinerary_member
+
+class ArchivedAccountBook(models.Model):
+    """归档申请的记账记录（所在月份已结账，余额由 LedgerSnapshot 保存）"""
+    original_id = models.BigIntegerField(unique=True, verbose_name="原记录ID")
+    request = models.ForeignKey(ArchivedRequest, on_delete=models.CASCADE, related_name='entries', verbose_name="归档的报销申请")
+    entry_date = models.DateTimeField(verbose_name="记账日期")
+    entry_type = models.CharField(max_length=20, choices=AccountBook.ENTRY_TYPE_CHOICES, verbose_name="类型")
+    real_name = models.CharField(max_length=100, verbose_name="提交人姓名")
+    reason = models.CharField(max_length=255, verbose_name="事由")
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="金额")
+    remarks = models.TextField(blank=True, verbose_name="备注")
+    created_at = models.DateTimeField(verbose_name="创建时间")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="创建人")
+    
+    class Meta:
+        verbose_name = "归档的记账记录"
+        verbose_name_plural = "归档的记账记录"
+        ordering = ['-entry_date']
+    
+    def __str__(self):
+        return f"{self.entry_date.strftime('%Y-%m-%d')} - {self.real_name} - {self.reason} - ¥{self.amount}"
+
+class ArchivedFingerprint(models.Model):
+    """归档申请的发票指纹：归档后的发票仍不能重复报销"""
+    kind = models.CharField(max_length=20, choices=InvoiceFingerprint.KIND_CHOICES, verbose_name="类型")
+    key = models.CharField(max_length=100, verbose_name="指纹")
+    request = models.ForeignKey(ArchivedRequest, on_delete=models.CASCADE, related_name='fingerprints', verbose_name="归档的报销申请")
+    
+    class Meta:
+        verbose_name = "归档的发票指纹"
+        verbose_name_plural = "归档的发票指纹"
+        indexes = [
+            models.Index(fields=['kind', 'key'], name='archived_fingerprint_key_idx'),
+        ]
+
+# 批量删除（bulk.delete_requests、archive.archive_batch）在调用方按批处理汇总、索引、同步记录和文件，
+# 期间报销申请、记账记录的逐行删除信号不再重复处理；级联删除、SET_NULL 仍由 QuerySet.delete() 完成
+_delete_signals_suppressed = ContextVar('delete_signals_suppressed', default=False)
+
+@contextmanager
+def suppress_delete_signals():
+    token = _delete_signals_suppressed.set(True)
+    try:
+        yield
+    finally:
+        _delete_signals_suppressed.reset(token)
+
+def delete_signals_suppressed():
+    return _delete_signals_suppressed.get()
+
+# 信号处理：注意事项变化后（事务提交时）更换缓存版本号
+@receiver(post_save, sender=Notice)
+@receiver(post_delete, sender=Notice)
+def invalidate_notice_cache(sender, **kwargs):
+    from django.db import transaction
+    from .notices import bump_notice_version
+    transaction.on_commit(bump_notice_version)
+
+# 信号处理：用户信息变化时清除 JWT 认证的用户缓存（立即清除，事务提交后再清除一次）
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return  # 登录时只更新最后登录时间，不影响认证
+    from django.db import transaction
+    from .auth import invalidate_user
+    user_id = instance.pk
+    invalidate_user(user_id)
+    transaction.on_commit(lambda: invalidate_user(user_id))
+
+# 信号处理：删除报销申请时登记删除关联的PDF文件（事务提交后由 worker 删除）
 @receiver(post_delete, sender=ReimbursementRequest)
 def delete_invoice_file(sender, instance, **kwargs):
-    """删除报销申请时，自动删除对应的发票PDF和行程单文件"""
-    if instance.invoice_pdf:
-        if os.path.isfile(instance.invoice_pdf.path):
-            try:
-                os.remove(instance.invoice_pdf.path)
-            except Exception as e:
-                print(f"删除发票文件失败: {instance.invoice_pdf.path}, 错误: {e}")
-    
-    if instance.itinerary_pdf:
-        if os.path.isfile(instance.itinerary_pdf.path):
-            try:
-                os.remove(instance.itinerary_pdf.path)
-            except Exception as e:
-                print(f"删除行程单文件失败: {instance.itinerary_pdf.path}, 错误: {e}")
+    """删除报销申请时，登记删除发票PDF和行程单文件；仍被其他申请引用的文件在删除时跳过"""
+    if delete_signals_suppressed():
+        return
+    from .files import queue_file_deletions
+    queue_file_deletions([instance.invoice_pdf.name, instance.itinerary_pdf.name])
+
+# 信号处理：记录删除的申请，供增量同步使用
+@receiver(post_delete, sender=ReimbursementRequest)
+def record_deleted_request(sender, instance, **kwargs):
+    if delete_signals_suppressed():
+        return
+    from .sync import record_deletions
+    record_deletions([(instance.pk, instance.user_id)])
+
+# 信号处理：审核汇总表随报销申请增量更新（并维护审核通过时间）
+@receiver(pre_save, sender=ReimbursementRequest)
+def load_request_report_state(sender, instance, **kwargs):
+    from .reports import prepare_request_save
+    prepare_request_save(instance)
+
+@receiver(post_save, sender=ReimbursementRequest)
+def update_approval_summary_on_save(sender, instance, created, **kwargs):
+    from .reports import apply_request_change
+    apply_request_change(instance, created=created)
+
+@receiver(post_delete, sender=ReimbursementRequest)
+def update_approval_summary_on_delete(sender, instance, **kwargs):
+    if delete_signals_suppressed():
+        return
+    from .reports import apply_request_change
+    apply_request_change(instance, deleted=True)
 
 # 信号处理：报销申请审核通过时自动添加到记账本
 @receiver(post_save, sender=ReimbursementRequest)
 def add_to_account_book(sender, instance, created, **kwargs):
-    """当报销申请状态变为审核通过时，自动添加到记账本"""
-    # 只处理审核通过的情况
-    if instance.status == 'approved':
-        # 检查是否已经添加到记账本（避免重复）
-        existing = AccountBook.objects.filter(reimbursement=instance).first()
-        
-        if not existing:
-            # 创建记账本记录
-            AccountBook.objects.create(
-                entry_date=instance.submission_date,
-                entry_type='reimbursement',
-                real_name=instance.real_name,
-                reason=instance.reason,
-                amount=instance.amount,
-                remarks=instance.remarks or f'报销申请 #{instance.id}',
-                reimbursement=instance,
-                created_by=instance.user
-            )
-            print(f"✅ 报销申请 #{instance.id} 已自动添加到记账本")
+    """仅在状态真正变为审核通过时记账；重复记账由数据库唯一约束兜底"""
+    previous = getattr(instance, '_loaded_status', None)
+    instance._loaded_status = instance.status
+    if instance.status != 'approved' or previous == 'approved':
+        return
+    
+    from .ledger import post_reimbursement
+    if post_reimbursement(instance):
+        print(f"✅ 报销申请 #{instance.id} 已自动添加到记账本")
+
+# 信号处理：记账记录增删改时增量更新已结账月份的快照
+@receiver(pre_save, sender=AccountBook)
+def load_account_book_state(sender, instance, **kwargs):
+    """未通过查询加载（或加载时字段被延迟）的实例，保存前补查一次原始值"""
+    from .ledger import ensure_entry_state
+    ensure_entry_state(instance)
+
+@receiver(post_save, sender=AccountBook)
+def update_ledger_on_save(sender, instance, created, **kwargs):
+    from .ledger import apply_entry_change
+    apply_entry_change(instance, created=created)
+
+@receiver(post_delete, sender=AccountBook)
+def update_ledger_on_delete(sender, instance, **kwargs):
+    if delete_signals_suppressed():
+        return
+    from .ledger import apply_entry_change
+    apply_entry_change(instance, deleted=True)
+
+# 信号处理：姓名/事由/备注变化时更新搜索倒排索引
+@receiver(post_save, sender=ReimbursementRequest)
+@receiver(post_save, sender=AccountBook)
+def update_search_index(sender, instance, **kwargs):
+    from .search import index_instance
+    index_instance(instance)
+
+@receiver(post_delete, sender=ReimbursementRequest)
+@receiver(post_delete, sender=AccountBook)
+def remove_search_index(sender, instance, **kwargs):
+    if delete_signals_suppressed():
+        return
+    from .search import unindex
+    unindex(sender, [instance.pk])
+
+# 信号处理：删除上传会话时删除分片临时文件，以及未被任何申请使用的合并文件
+@receiver(post_delete, sender=UploadSession)
+def delete_upload_files(sender, instance, **kwargs):
+    from .uploads import discard_session_files
+    discard_session_files(instance)
+
+# 信号处理：删除后台任务时删除其生成的文件
+@receiver(post_delete, sender=BackgroundJob)
+def delete_job_artifact(sender, instance, **kwargs):
+    from .jobs import discard_artifact
+    discard_artifact(instance)
@@ -0,0 +1,53 @@
+# reimbursement/notices.py
+"""
+注意事项接口的响应缓存
+
+- 缓存内容按版本号存放：notices:body:<版本号>，Notice 保存或删除后（事务提交时）更换版本号，旧缓存自然失效
+- 版本号取更换时的时间戳，同时作为 Last-Modified（删除公告后也会前移）
+- ETag 为响应内容的哈希，内容不变时浏览器重新验证得到 304
+"""
+import hashlib
+import time
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+VERSION_KEY = 'notices:version'
+BODY_KEY = 'notices:body:{version}'
+BODY_TIMEOUT = 24 * 3600
+
+
+def notice_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # 缓存被清空或首次访问：以当前时间作为版本号（add 保证并发时只有一个生效）
+        cache.add(VERSION_KEY, time.time(), None)
+        version = cache.get(VERSION_KEY) or time.time()
+    return version
+
+
+def bump_notice_version():
+    cache.set(VERSION_KEY, time.time(), None)
+
+
+def build_notice_entry(version):
+    from .models import Notice
+    from .serializers import NoticeSerializer
+    notices = list(Notice.objects.filter(is_active=True))
+    body = JSONRenderer().render(NoticeSerializer(notices, many=True).data)
+    last_modified = max([version] + [notice.updated_at.timestamp() for notice in notices])
+    return {
+        'body': body,
+        'etag': '"%s"' % hashlib.sha256(body).hexdigest()[:32],
+        'last_modified': last_modified,
+    }
+
+
+def cached_notices():
+    """返回 {'body', 'etag', 'last_modified'}，命中缓存时不查询数据库"""
+    version = notice_version()
+    key = BODY_KEY.format(version=version)
+    entry = cache.get(key)
+    if entry is None:
+        entry = build_notice_entry(version)
+        cache.set(key, entry, BODY_TIMEOUT)
+    return entry
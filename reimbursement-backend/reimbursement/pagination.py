@@ -0,0 +1,92 @@
+# reimbursement/pagination.py
+import base64
+from datetime import datetime
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class SubmissionKeysetPagination(BasePagination):
+    """
+    按 (submission_date, id) 倒序的游标（keyset）分页
+
+    游标记录上一页最后一行的 (提交时间, id)，下一页直接用 WHERE 条件定位，
+    配合 (user, -submission_date, -id) 复合索引，翻到第几页代价都相同。
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('-submission_date', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        if position is not None:
+            submitted, pk = position
+            queryset = queryset.filter(Q(submission_date__lt=submitted) | Q(submission_date=submitted, id__lt=pk))
+
+        # 多取一行用于判断是否还有下一页
+        rows = list(queryset.order_by(*self.ordering)[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_position = self.position_of(rows[-1]) if self.has_next else None
+        return rows
+
+    def position_of(self, row):
+        # 列表快速路径传入 values() 查询集，行是字典
+        if isinstance(row, dict):
+            return row['submission_date'], row['id']
+        return row.submission_date, row.pk
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            submitted, pk = raw.rsplit('|', 1)
+            submitted = datetime.fromisoformat(submitted)
+            if timezone.is_naive(submitted):
+                raise ValueError
+            return submitted, int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound('无效的分页游标')
+
+    def encode_cursor(self, position):
+        submitted, pk = position
+        raw = f'{submitted.isoformat()}|{pk}'
+        encoded = base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
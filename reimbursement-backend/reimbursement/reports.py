@@ -0,0 +1,283 @@
+# reimbursement/reports.py
+"""
+报销统计报表：按人、按月、按类型、打车/非打车汇总金额，以及审核耗时
+
+- SpendingSummary：记账本按 (月份, 姓名, 类型) 汇总金额和笔数；
+  记账记录增删改时随月度快照一起增量更新（ledger.apply_entry_change / apply_bulk_entries）
+- ApprovalSummary：审核通过的报销申请按 (提交月份, 姓名, 是否打车) 汇总笔数、金额和审核耗时；
+  申请状态变为/离开审核通过、修改或删除时增量更新，批量审核/删除时按批次计入
+- 汇总行用 F() 表达式累加，不存在时创建（并发创建冲突时改为累加）
+- 报表只查询汇总表，代价与 月份数 × 人数 成正比，与原始记录数无关
+- rebuild_summaries() 由原始数据（含已归档的申请和记账记录）全量重算（首次部署、定期校验）
+"""
+from datetime import date
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .ledger import ZERO, month_of
+from .models import (
+    AccountBook, ApprovalSummary, ArchivedAccountBook, ArchivedRequest, ReimbursementRequest, SpendingSummary,
+)
+
+_REQUEST_STATE_FIELDS = ('status', 'real_name', 'is_taxi_invoice', 'amount', 'submission_date', 'approved_at')
+
+
+def can_view_reports(user):
+    """超级用户，或被授予查看记账汇总权限的管理员"""
+    return bool(user and user.is_active and (user.is_superuser or user.has_perm('reimbursement.view_spendingsummary')))
+
+
+def bump(model, key, deltas):
+    """汇总行累加 deltas，行不存在时创建"""
+    if not any(deltas.values()):
+        return
+    expressions = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**key).update(**expressions):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **deltas)
+    except IntegrityError:
+        # 并发请求刚创建了同一行
+        model.objects.filter(**key).update(**expressions)
+
+
+# ── 记账汇总 ──────────────────────────────────────────────────────────────
+
+def apply_spending_changes(states):
+    """states 为 [((类型, 金额, 日期, 姓名), 符号)]，按汇总行合并后累加"""
+    changes = {}
+    for (entry_type, amount, entry_date, real_name), sign in states:
+        total = changes.setdefault((month_of(entry_date), real_name, entry_type), [ZERO, 0])
+        total[0] += sign * Decimal(amount)
+        total[1] += sign
+    for (period, real_name, entry_type), (amount, count) in changes.items():
+        bump(SpendingSummary, {'period': period, 'real_name': real_name, 'entry_type': entry_type},
+             {'amount': amount, 'entry_count': count})
+
+
+# ── 审核汇总 ──────────────────────────────────────────────────────────────
+
+def request_state(req):
+    return tuple(getattr(req, name) for name in _REQUEST_STATE_FIELDS)
+
+
+def remember_request_state(req):
+    """记录实例在数据库中的当前值；字段被延迟加载时不记录，保存前再补查"""
+    deferred = req.get_deferred_fields()
+    if any(name in deferred for name in _REQUEST_STATE_FIELDS):
+        req._report_state = None
+    else:
+        req._report_state = request_state(req)
+
+
+def prepare_request_save(req):
+    """保存前：补查原始值，并按状态变化填写或清空审核通过时间"""
+    if req._state.adding:
+        req._report_state = None
+        previous = None
+    else:
+        if getattr(req, '_report_state', None) is None:
+            req._report_state = (
+                ReimbursementRequest.objects.filter(pk=req.pk).values_list(*_REQUEST_STATE_FIELDS).first()
+            )
+        previous = req._report_state[0] if req._report_state else None
+    if req.status != 'approved':
+        req.approved_at = None
+    elif previous != 'approved' or req.approved_at is None:
+        req.approved_at = timezone.now()
+
+
+def latency_seconds(submitted, approved):
+    if submitted is None or approved is None:
+        return 0
+    return max(0, int((approved - submitted).total_seconds()))
+
+
+def approval_contribution(state):
+    """一条申请对审核汇总的贡献：(汇总键, 金额, 耗时秒数)，未审核通过时为 None"""
+    if state is None:
+        return None
+    status, real_name, is_taxi, amount, submitted, approved = state
+    if status != 'approved':
+        return None
+    key = (month_of(submitted), real_name, bool(is_taxi))
+    return key, Decimal(amount), latency_seconds(submitted, approved)
+
+
+def apply_approval_changes(contributions):
+    """contributions 为 [(贡献, 符号)]，按汇总行合并后累加"""
+    changes = {}
+    for contribution, sign in contributions:
+        if contribution is None:
+            continue
+        key, amount, latency = contribution
+        total = changes.setdefault(key, [0, ZERO, 0])
+        total[0] += sign
+        total[1] += sign * amount
+        total[2] += sign * latency
+    for (period, real_name, is_taxi), (count, amount, latency) in changes.items():
+        bump(ApprovalSummary, {'period': period, 'real_name': real_name, 'is_taxi_invoice': is_taxi},
+             {'approved_count': count, 'amount': amount, 'latency_seconds': latency})
+
+
+def apply_request_change(req, created=False, deleted=False):
+    """报销申请保存/删除后调用，撤销旧贡献并计入新贡献"""
+    old = None if created else getattr(req, '_report_state', None)
+    if deleted:
+        old = old or request_state(req)
+        new = None
+    else:
+        new = request_state(req)
+    old_contribution, new_contribution = approval_contribution(old), approval_contribution(new)
+    if old_contribution != new_contribution:
+        apply_approval_changes([(old_contribution, -1), (new_contribution, 1)])
+    req._report_state = new
+
+
+def apply_bulk_requests(ids, sign=1):
+    """
+    批量审核/删除不会触发信号，调用方在 UPDATE 之后（sign=1）或 DELETE 之前（sign=-1）
+    用此函数一次性计入这些申请中已审核通过的部分
+    """
+    rows = ReimbursementRequest.objects.filter(pk__in=ids, status='approved').values_list(*_REQUEST_STATE_FIELDS)
+    apply_approval_changes([(approval_contribution(row), sign) for row in rows])
+
+
+# ── 全量重算 ──────────────────────────────────────────────────────────────
+
+def _spending_rows():
+    # 已归档的记账记录仍计入汇总
+    totals = {}
+    for model in (AccountBook, ArchivedAccountBook):
+        rows = (
+            model.objects.annotate(month=TruncMonth('entry_date'))
+            .values('month', 'real_name', 'entry_type')
+            .annotate(amount=Sum('amount'), count=Count('id'))
+            .order_by()
+        )
+        for row in rows:
+            total = totals.setdefault((month_of(row['month']), row['real_name'], row['entry_type']), [ZERO, 0])
+            total[0] += row['amount']
+            total[1] += row['count']
+    return {key: tuple(total) for key, total in totals.items()}
+
+
+def _approval_rows():
+    # 已归档的申请仍计入汇总
+    totals = {}
+    for model in (ReimbursementRequest, ArchivedRequest):
+        rows = model.objects.filter(status='approved').values_list(*_REQUEST_STATE_FIELDS)
+        for row in rows.iterator(chunk_size=2000):
+            key, amount, latency = approval_contribution(row)
+            total = totals.setdefault(key, [0, ZERO, 0])
+            total[0] += 1
+            total[1] += amount
+            total[2] += latency
+    return {key: tuple(total) for key, total in totals.items()}
+
+
+@transaction.atomic
+def rebuild_summaries(check_only=False):
+    """
+    由原始数据全量重算两张汇总表，返回不一致的汇总行数 {'spending': n, 'approval': n}
+    check_only=True 时只比较不修改；重算与增量更新不互斥，应在无人审核/记账时执行
+    """
+    result = {}
+    specs = (
+        ('spending', SpendingSummary, ('period', 'real_name', 'entry_type'), ('amount', 'entry_count'), _spending_rows),
+        ('approval', ApprovalSummary, ('period', 'real_name', 'is_taxi_invoice'),
+         ('approved_count', 'amount', 'latency_seconds'), _approval_rows),
+    )
+    for name, model, key_fields, value_fields, compute in specs:
+        expected = compute()
+        stored = {
+            row[:len(key_fields)]: row[len(key_fields):]
+            for row in model.objects.values_list(*key_fields, *value_fields)
+            if any(row[len(key_fields):])   # 全为零的行与不存在等价
+        }
+        mismatched = {key for key in expected.keys() | stored.keys() if expected.get(key) != stored.get(key)}
+        result[name] = len(mismatched)
+        if mismatched and not check_only:
+            model.objects.all().delete()
+            model.objects.bulk_create(
+                [model(**dict(zip(key_fields, key)), **dict(zip(value_fields, values))) for key, values in expected.items()],
+                batch_size=1000,
+            )
+    return result
+
+
+# ── 报表查询 ──────────────────────────────────────────────────────────────
+
+SPENDING_DIMENSIONS = {'month': 'period', 'person': 'real_name', 'entry_type': 'entry_type'}
+APPROVAL_DIMENSIONS = {'month': 'period', 'person': 'real_name', 'taxi': 'is_taxi_invoice'}
+
+
+def parse_month(value):
+    """'2025-03' -> date(2025, 3, 1)，格式错误时抛出 ValueError"""
+    year, month = value.split('-')
+    return date(int(year), int(month), 1)
+
+
+def parse_group_by(value, dimensions):
+    names = [name.strip() for name in (value or '').split(',') if name.strip()]
+    unknown = [name for name in names if name not in dimensions]
+    if unknown:
+        raise ValueError(f'不支持的分组维度：{", ".join(unknown)}（可选：{", ".join(dimensions)}）')
+    return list(dict.fromkeys(names))
+
+
+def _filter(queryset, start=None, end=None, person=None):
+    if start:
+        queryset = queryset.filter(period__gte=start)
+    if end:
+        queryset = queryset.filter(period__lte=end)
+    if person:
+        queryset = queryset.filter(real_name=person)
+    return queryset
+
+
+def _grouped(queryset, group_by, dimensions, aggregates):
+    fields = [dimensions[name] for name in group_by]
+    if fields:
+        rows = queryset.values(*fields).annotate(**aggregates).order_by(*fields)
+    else:
+        rows = [queryset.aggregate(**aggregates)]
+    for row in rows:
+        yield {name: row[dimensions[name]] for name in group_by}, row
+
+
+def spending_report(group_by, start=None, end=None, person=None, entry_type=None):
+    """记账本汇总：返回 [{维度..., 'amount', 'count'}]，月份为当月1日"""
+    queryset = _filter(SpendingSummary.objects.all(), start, end, person)
+    if entry_type:
+        queryset = queryset.filter(entry_type=entry_type)
+    aggregates = {'total_amount': Sum('amount'), 'total_count': Sum('entry_count')}
+    report = []
+    for dims, row in _grouped(queryset, group_by, SPENDING_DIMENSIONS, aggregates):
+        if row['total_count']:
+            report.append({**dims, 'amount': row['total_amount'] or ZERO, 'count': row['total_count']})
+    return report
+
+
+def approval_report(group_by, start=None, end=None, person=None, taxi=None):
+    """审核汇总：返回 [{维度..., 'amount', 'count', 'average_latency_hours'}]"""
+    queryset = _filter(ApprovalSummary.objects.all(), start, end, person)
+    if taxi is not None:
+        queryset = queryset.filter(is_taxi_invoice=taxi)
+    aggregates = {
+        'total_amount': Sum('amount'), 'total_count': Sum('approved_count'), 'total_latency': Sum('latency_seconds'),
+    }
+    report = []
+    for dims, row in _grouped(queryset, group_by, APPROVAL_DIMENSIONS, aggregates):
+        if row['total_count']:
+            report.append({
+                **dims,
+                'amount': row['total_amount'] or ZERO,
+                'count': row['total_count'],
+                'average_latency_hours': round(row['total_latency'] / row['total_count'] / 3600, 1),
+            })
+    return report
+
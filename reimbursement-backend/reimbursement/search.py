@@ -0,0 +1,193 @@
+# reimbursement/search.py
+"""
+报销申请和记账记录的搜索（姓名、事由、备注，报销申请还包括提交用户名），后台列表和“我的报销”接口共用
+
+- PostgreSQL（SEARCH_BACKEND=auto/trigram）：迁移 0018 在 UPPER(列) 上建 pg_trgm 的 GIN 索引，
+  与 icontains 生成的 UPPER(列::text) LIKE UPPER(...) 一致，搜索仍用 icontains，由索引完成匹配
+- 其他数据库（SEARCH_BACKEND=auto/index）：应用内倒排索引 SearchToken
+  · 中文等宽字符按单字和相邻两字切分，字母数字按相邻两字符和三字符切分（大小写不敏感）
+  · 查询词切出同样的 token，取同时包含全部 token 的记录作为候选，再在候选上用 icontains 校验，
+    结果与原来逐行 icontains 相同；查询词只有一个字母/数字时无法使用索引，退回 icontains
+  · 保存/删除时（信号）更新，文本没有变化时不重建；批量删除、批量记账时由调用方一并处理
+- 用户名不建索引：auth_user 行数少，用子查询匹配，不再 JOIN
+- 切换 SEARCH_BACKEND 后执行 manage.py rebuild_search_index
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils.text import smart_split, unescape_string_literal
+from .models import AccountBook, ReimbursementRequest, SearchToken
+
+# 模型 -> (索引类型, 搜索字段, 用户外键字段)
+SEARCH_MODELS = {
+    ReimbursementRequest: ('request', ('real_name', 'reason', 'remarks'), 'user'),
+    AccountBook: ('entry', ('real_name', 'reason', 'remarks'), None),
+}
+# 此码位之后的文字（CJK、假名、谚文等）按单字和两字切分
+WIDE_START = 0x2E80
+INDEX_BATCH_SIZE = 1000
+
+
+def backend():
+    if settings.SEARCH_BACKEND == 'auto':
+        return 'trigram' if connection.vendor == 'postgresql' else 'index'
+    return settings.SEARCH_BACKEND
+
+
+# ── 切分 ──────────────────────────────────────────────────────────────────
+
+def runs(text):
+    """把文本切成连续的 (是否宽字符, 片段)，标点和空白作为分隔"""
+    result = []
+    current = []
+    wide = False
+    # 逐字转小写：str.lower() 对整段文本处理时与上下文有关（希腊文词尾 sigma），查询词与文本的结果可能不同
+    for ch in (c for char in (text or '') for c in char.lower()):
+        if not ch.isalnum():
+            if current:
+                result.append((wide, ''.join(current)))
+                current = []
+            continue
+        ch_wide = ord(ch) >= WIDE_START
+        if current and ch_wide != wide:
+            result.append((wide, ''.join(current)))
+            current = []
+        current.append(ch)
+        wide = ch_wide
+    if current:
+        result.append((wide, ''.join(current)))
+    return result
+
+
+def ngrams(run, n):
+    return {run[i:i + n] for i in range(len(run) - n + 1)}
+
+
+def document_tokens(texts):
+    """记录各字段文本的 token 集合（字段之间不跨界切分）"""
+    tokens = set()
+    for text in texts:
+        for wide, run in runs(text):
+            if wide:
+                tokens |= ngrams(run, 1) | ngrams(run, 2)
+            else:
+                tokens |= ngrams(run, 2) | ngrams(run, 3)
+    return tokens
+
+
+def query_tokens(term):
+    """查询词的 token 集合：包含该词的文本一定包含全部这些 token"""
+    tokens = set()
+    for wide, run in runs(term):
+        if wide:
+            tokens |= ngrams(run, 1 if len(run) == 1 else 2)
+        elif len(run) >= 2:
+            tokens |= ngrams(run, 2 if len(run) == 2 else 3)
+    return tokens
+
+
+def split_terms(query):
+    """与后台搜索相同：按空白拆分，引号内作为一个词"""
+    terms = []
+    for bit in smart_split(query or ''):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        if bit:
+            terms.append(bit)
+    return terms
+
+
+# ── 索引维护 ──────────────────────────────────────────────────────────────
+
+def search_text(instance):
+    _, fields, _ = SEARCH_MODELS[type(instance)]
+    return tuple(getattr(instance, name) for name in fields)
+
+
+def remember_search_text(instance):
+    """记录加载时的搜索字段；字段被延迟加载时不记录（保存时按有变化处理）"""
+    _, fields, _ = SEARCH_MODELS[type(instance)]
+    deferred = instance.get_deferred_fields()
+    instance._search_text = None if any(name in deferred for name in fields) else search_text(instance)
+
+
+def token_rows(kind, pk, texts):
+    return [SearchToken(kind=kind, token=token, object_id=pk) for token in document_tokens(texts)]
+
+
+def index_instance(instance):
+    """保存后调用：搜索字段有变化时重建该记录的 token"""
+    if backend() != 'index':
+        return
+    text = search_text(instance)
+    if text == getattr(instance, '_search_text', None):
+        return
+    kind, _, _ = SEARCH_MODELS[type(instance)]
+    with transaction.atomic():
+        SearchToken.objects.filter(kind=kind, object_id=instance.pk).delete()
+        SearchToken.objects.bulk_create(token_rows(kind, instance.pk, text), ignore_conflicts=True)
+    instance._search_text = text
+
+
+def index_objects(instances):
+    """bulk_create 不会触发信号，调用方用此函数为新记录建索引"""
+    if backend() != 'index':
+        return
+    rows = []
+    for instance in instances:
+        kind, _, _ = SEARCH_MODELS[type(instance)]
+        rows.extend(token_rows(kind, instance.pk, search_text(instance)))
+    SearchToken.objects.bulk_create(rows, batch_size=INDEX_BATCH_SIZE, ignore_conflicts=True)
+
+
+def unindex(model, ids):
+    """删除记录的 token（批量删除时由调用方调用）"""
+    if backend() != 'index':
+        return
+    kind, _, _ = SEARCH_MODELS[model]
+    SearchToken.objects.filter(kind=kind, object_id__in=ids).delete()
+
+
+def rebuild_index(model):
+    """重建某个模型的全部 token，返回索引的记录数"""
+    kind, fields, _ = SEARCH_MODELS[model]
+    SearchToken.objects.filter(kind=kind).delete()
+    count = 0
+    rows = []
+    for pk, *texts in model.objects.values_list('pk', *fields).iterator(chunk_size=INDEX_BATCH_SIZE):
+        count += 1
+        rows.extend(token_rows(kind, pk, texts))
+        if len(rows) >= INDEX_BATCH_SIZE * 10:
+            SearchToken.objects.bulk_create(rows, batch_size=INDEX_BATCH_SIZE, ignore_conflicts=True)
+            rows = []
+    SearchToken.objects.bulk_create(rows, batch_size=INDEX_BATCH_SIZE, ignore_conflicts=True)
+    return count
+
+
+# ── 查询 ──────────────────────────────────────────────────────────────────
+
+def candidates(kind, tokens):
+    """同时包含全部 token 的记录ID（子查询）"""
+    return (
+        SearchToken.objects.filter(kind=kind, token__in=tokens)
+        .values('object_id').annotate(matched=Count('id')).filter(matched=len(tokens))
+        .values('object_id')
+    )
+
+
+def search(queryset, query):
+    """每个查询词都要在任一搜索字段（或提交用户名）中出现，与后台 search_fields 的语义相同"""
+    kind, fields, user_field = SEARCH_MODELS[queryset.model]
+    use_index = backend() == 'index'
+    for term in split_terms(query):
+        match = Q()
+        for name in fields:
+            match |= Q(**{f'{name}__icontains': term})
+        tokens = query_tokens(term) if use_index else None
+        if tokens:
+            match = Q(pk__in=candidates(kind, tokens)) & match
+        if user_field:
+            match |= Q(**{f'{user_field}_id__in': User.objects.filter(username__icontains=term).values('pk')})
+        queryset = queryset.filter(match)
+    return queryset
@@ -1,7 +1,13 @@
 # reimbursement/serializers.py
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import ReimbursementRequest, Notice
+from django.utils import timezone
+from .models import ReimbursementRequest, Notice, UploadSession, friendly_filename
+from .fingerprints import BLOCKING_KINDS, find_duplicates, invoice_fingerprints, save_fingerprints, stored_digest
+from .storage import file_sha256, media_storage
+from .uploads import resolve_upload
+from .downloads import FILE_KINDS, DownloadUrlBuilder, signed_download_url
+from .file_metadata import PDF_MIME, empty_metadata, inspect_file, inspect_stored, model_values
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=6)
@@ -31,35 +37,138 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         
         return user
 
-class ReimbursementRequestSerializer(serializers.ModelSerializer):
+class ChunkedUploadMixin:
+    """invoice_upload_id / itinerary_upload_id 引用分片上传完成的文件，代替在本请求中直接上传"""
+    UPLOAD_FIELDS = (
+        ('invoice', 'invoice_pdf', 'invoice_filename', ''),
+        ('itinerary', 'itinerary_pdf', 'itinerary_filename', '行程单'),
+    )
+    _used_uploads = ()
+    
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        user = self.context['request'].user
+        real_name = attrs.get('real_name', getattr(self.instance, 'real_name', ''))
+        reason = attrs.get('reason', getattr(self.instance, 'reason', ''))
+        used = []
+        for kind, field, filename_field, label in self.UPLOAD_FIELDS:
+            upload_id = attrs.pop(f'{kind}_upload_id', None)
+            if upload_id is None:
+                continue
+            if attrs.get(field):
+                raise serializers.ValidationError({f'{kind}_upload_id': f'不能同时上传 {field} 和引用分片上传'})
+            session = resolve_upload(user, upload_id, kind)
+            # 文件已在存储中，直接保存存储名称
+            attrs[field] = session.file
+            attrs[filename_field] = friendly_filename(real_name, reason, label)
+            used.append(session.pk)
+        if self.instance is None and not attrs.get('invoice_pdf'):
+            raise serializers.ValidationError({'invoice_pdf': self.fields['invoice_pdf'].error_messages['required']})
+        self._used_uploads = used
+        return attrs
+    
+    def save(self, **kwargs):
+        instance = super().save(**kwargs)
+        if self._used_uploads:
+            # 文件已被申请引用，删除会话时不会删除文件
+            UploadSession.objects.filter(pk__in=self._used_uploads).delete()
+        return instance
+
+class FileMetadataMixin:
+    """新文件保存前记录大小、页数、哈希和类型（见 file_metadata.py），并拒绝不是 PDF 的文件"""
+    
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        for kind, field in FILE_KINDS.items():
+            if field not in attrs:
+                continue
+            value = attrs[field]
+            if not value:
+                attrs.update(empty_metadata(kind))
+                continue
+            if isinstance(value, str):
+                # 分片上传完成的文件，存储名称中已包含哈希
+                info = inspect_stored(value, stored_digest(value))
+            else:
+                info = inspect_file(value)
+                value.sha256 = info['sha256']  # 查重和存储层直接使用，不再重复计算
+            if info['mime'] != PDF_MIME:
+                raise serializers.ValidationError({field: '文件内容不是PDF，请上传PDF文件'})
+            attrs.update(model_values(kind, info))
+        return attrs
+
+class DuplicateInvoiceCheckMixin:
+    """提交或修改发票/金额时按发票指纹检查重复报销，保存后更新指纹"""
+    _fingerprint_keys = None
+    
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        instance = self.instance
+        invoice = attrs.get('invoice_pdf')
+        amount = attrs.get('amount', instance.amount if instance else None)
+        
+        if isinstance(invoice, str):
+            # 分片上传完成的文件，存储名称中已包含哈希
+            keys = invoice_fingerprints(media_storage.path(invoice), amount, timezone.localdate(), stored_digest(invoice))
+        elif invoice:
+            digest = getattr(invoice, 'sha256', None) or file_sha256(invoice)
+            invoice.sha256 = digest  # 存储层直接使用，不再重复计算
+            fallback_date = timezone.localdate()
+            keys = invoice_fingerprints(invoice, amount, fallback_date, digest)
+        elif instance is not None and instance.invoice_pdf and 'amount' in attrs and amount != instance.amount:
+            fallback_date = timezone.localtime(instance.submission_date).date()
+            keys = invoice_fingerprints(
+                instance.invoice_pdf.path, amount, fallback_date, stored_digest(instance.invoice_pdf.name)
+            )
+        else:
+            return attrs
+        
+        duplicates = find_duplicates(keys, exclude_request_id=instance.pk if instance else None)
+        blocking = sorted(set().union(*(duplicates.get(kind, ()) for kind in BLOCKING_KINDS)))
+        if blocking:
+            ids = '、'.join(f'#{request_id}' for request_id in blocking)
+            raise serializers.ValidationError({'invoice_pdf': f'该发票已在报销申请 {ids} 中提交过，不能重复报销'})
+        attrs['is_suspected_duplicate'] = bool(duplicates.get('amount_date'))
+        self._fingerprint_keys = keys
+        return attrs
+    
+    def save(self, **kwargs):
+        instance = super().save(**kwargs)
+        if self._fingerprint_keys is not None:
+            save_fingerprints({instance.pk: self._fingerprint_keys})
+        return instance
+
+class ReimbursementRequestSerializer(DuplicateInvoiceCheckMixin, FileMetadataMixin, ChunkedUploadMixin, serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
-    invoice_pdf = serializers.FileField(required=True)  # 可读可写，新建时必须
+    invoice_pdf = serializers.FileField(required=False)  # 可读可写，新建时必须（或提供 invoice_upload_id）
     invoice_pdf_url = serializers.SerializerMethodField()  # 只读，用于返回完整URL
     itinerary_pdf = serializers.FileField(required=False)  # 行程单可选
     itinerary_pdf_url = serializers.SerializerMethodField()  # 只读，用于返回完整URL
+    invoice_upload_id = serializers.UUIDField(write_only=True, required=False)  # 分片上传完成的发票
+    itinerary_upload_id = serializers.UUIDField(write_only=True, required=False)  # 分片上传完成的行程单
     
     class Meta:
         model = ReimbursementRequest
-        fields = ['id', 'user', 'real_name', 'reason', 'amount', 'invoice_pdf', 'invoice_pdf_url', 'is_taxi_invoice', 'itinerary_pdf', 'itinerary_pdf_url', 'remarks', 'status', 'rejection_reason', 'submission_date']
+        fields = ['id', 'user', 'real_name', 'reason', 'amount', 'invoice_pdf', 'invoice_pdf_url', 'is_taxi_invoice', 'itinerary_pdf', 'itinerary_pdf_url', 'remarks', 'status', 'rejection_reason', 'submission_date', 'invoice_upload_id', 'itinerary_upload_id']
         read_only_fields = ['id', 'user', 'status', 'rejection_reason', 'submission_date', 'invoice_pdf_url', 'itinerary_pdf_url']
     
     def get_invoice_pdf_url(self, obj):
-        """返回发票PDF文件的完整访问URL"""
-        if obj.invoice_pdf and obj.invoice_pdf.name:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.invoice_pdf.url)
-            return obj.invoice_pdf.url
-        return None
+        """返回发票PDF的下载地址（短期有效的签名链接）"""
+        return self.file_url(obj, 'invoice')
     
     def get_itinerary_pdf_url(self, obj):
-        """返回行程单PDF文件的完整访问URL"""
-        if obj.itinerary_pdf and obj.itinerary_pdf.name:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.itinerary_pdf.url)
-            return obj.itinerary_pdf.url
-        return None
+        """返回行程单PDF的下载地址（短期有效的签名链接）"""
+        return self.file_url(obj, 'itinerary')
+    
+    def file_url(self, obj, kind):
+        field_file = obj.invoice_pdf if kind == 'invoice' else obj.itinerary_pdf
+        if not (field_file and field_file.name):
+            return None
+        url = signed_download_url(obj, kind)
+        request = self.context.get('request')
+        if request:
+            return request.build_absolute_uri(url)
+        return url
     
     def to_representation(self, instance):
         """自定义返回格式，保持向后兼容"""
@@ -69,51 +178,99 @@ class ReimbursementRequestSerializer(serializers.ModelSerializer):
         ret['itinerary_pdf'] = ret.get('itinerary_pdf_url')
         return ret
 
-class ReimbursementRequestUpdateSerializer(serializers.ModelSerializer):
+class ReimbursementListSerializer:
+    """
+    列表接口的只读快速路径，输出与 ReimbursementRequestSerializer 完全相同的 JSON
+    
+    - 只查询输出用到的列（values()，不实例化模型，提交用户通过 JOIN 取用户名）
+    - 下载链接的域名前缀、路径模板和签名器每个请求只准备一次
+    - 不经过 DRF 逐字段的 get_attribute / to_representation，金额和日期沿用同样的格式化
+    """
+    COLUMNS = (
+        'id', 'user__username', 'real_name', 'reason', 'amount', 'invoice_pdf', 'is_taxi_invoice',
+        'itinerary_pdf', 'remarks', 'status', 'rejection_reason', 'submission_date',
+    )
+    amount_field = serializers.DecimalField(max_digits=10, decimal_places=2)
+    date_field = serializers.DateTimeField()
+    
+    def __init__(self, request=None):
+        self.file_url = DownloadUrlBuilder(request)
+    
+    @classmethod
+    def rows(cls, queryset):
+        return queryset.values(*cls.COLUMNS)
+    
+    def to_representation(self, row):
+        pk = row['id']
+        invoice_url = self.file_url(pk, 'invoice') if row['invoice_pdf'] else None
+        itinerary_url = self.file_url(pk, 'itinerary') if row['itinerary_pdf'] else None
+        return {
+            'id': pk,
+            'user': row['user__username'],
+            'real_name': row['real_name'],
+            'reason': row['reason'],
+            'amount': self.amount_field.to_representation(row['amount']),
+            'invoice_pdf': invoice_url,
+            'invoice_pdf_url': invoice_url,
+            'is_taxi_invoice': row['is_taxi_invoice'],
+            'itinerary_pdf': itinerary_url,
+            'itinerary_pdf_url': itinerary_url,
+            'remarks': row['remarks'],
+            'status': row['status'],
+            'rejection_reason': row['rejection_reason'],
+            'submission_date': self.date_field.to_representation(row['submission_date']),
+        }
+    
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+class ReimbursementRequestUpdateSerializer(DuplicateInvoiceCheckMixin, FileMetadataMixin, ChunkedUploadMixin, serializers.ModelSerializer):
     invoice_pdf = serializers.FileField(required=False)  # 重新提交时发票可选
     itinerary_pdf = serializers.FileField(required=False)  # 行程单可选
+    invoice_upload_id = serializers.UUIDField(write_only=True, required=False)
+    itinerary_upload_id = serializers.UUIDField(write_only=True, required=False)
     
     class Meta:
         model = ReimbursementRequest
-        fields = ['real_name', 'reason', 'amount', 'invoice_pdf', 'is_taxi_invoice', 'itinerary_pdf', 'remarks']
+        fields = ['real_name', 'reason', 'amount', 'invoice_pdf', 'is_taxi_invoice', 'itinerary_pdf', 'remarks', 'invoice_upload_id', 'itinerary_upload_id']
     
     def update(self, instance, validated_data):
-        """更新时，如果上传了新的PDF，删除旧的PDF文件"""
-        import os
+        """更新时，如果上传了新的PDF，登记删除旧PDF文件（事务提交后删除，仍被引用时跳过）"""
+        from .files import queue_file_deletions
         
         # 检查是否上传了新的发票PDF文件
         new_invoice_pdf = validated_data.get('invoice_pdf')
         new_itinerary_pdf = validated_data.get('itinerary_pdf')
         
-        old_invoice_path = None
-        old_itinerary_path = None
-        
+        old_names = []
         if new_invoice_pdf and instance.invoice_pdf:
-            old_invoice_path = instance.invoice_pdf.path
-        
+            old_names.append(instance.invoice_pdf.name)
         if new_itinerary_pdf and instance.itinerary_pdf:
-            old_itinerary_path = instance.itinerary_pdf.path
+            old_names.append(instance.itinerary_pdf.name)
         
         # 更新实例（这会保存新文件）
         instance = super().update(instance, validated_data)
         
-        # 删除旧的发票文件
-        if old_invoice_path and os.path.exists(old_invoice_path):
-            try:
-                os.remove(old_invoice_path)
-            except Exception as e:
-                print(f"删除旧发票文件失败: {old_invoice_path}, 错误: {e}")
-        
-        # 删除旧的行程单文件
-        if old_itinerary_path and os.path.exists(old_itinerary_path):
-            try:
-                os.remove(old_itinerary_path)
-            except Exception as e:
-                print(f"删除旧行程单文件失败: {old_itinerary_path}, 错误: {e}")
+        # 新旧文件内容相同时存储名称不变，仍被引用，不会被删除
+        queue_file_deletions(old_names)
         
         return instance
 class NoticeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notice
         fields = ['id', 'title', 'content', 'priority', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']        
\ No newline at end of file
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    received = serializers.SerializerMethodField()  # 已收到的分片序号，用于断点续传
+    
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'kind', 'filename', 'size', 'sha256', 'chunk_size', 'total_chunks', 'status', 'received', 'expires_at']
+        read_only_fields = ['id', 'chunk_size', 'total_chunks', 'status', 'received', 'expires_at']
+        extra_kwargs = {'sha256': {'required': False}}
+    
+    def get_received(self, obj):
+        if obj.status == 'complete':
+            return list(range(obj.total_chunks))
+        return list(obj.chunks.order_by('index').values_list('index', flat=True))
@@ -0,0 +1,111 @@
+# reimbursement/storage.py
+"""
+按内容寻址的文件存储：文件按 SHA-256 保存为 blobs/ab/<sha256>.pdf
+
+- 目录层数由 MEDIA_BLOB_SHARD_DEPTH 决定（2 时为 blobs/ab/cd/<sha256>.pdf），只影响新写入的文件；
+  已有文件由 manage.py reshard_media 在线迁移到当前布局
+
+- 相同内容只存一份，重复上传直接复用已有文件
+- 文件是否还能删除由引用计数决定：发票和行程单两列中都没有行引用时才删除（见 files.py）
+- 用户看到的文件名单独保存在模型的 invoice_filename / itinerary_filename 字段
+"""
+import hashlib
+import os
+import time
+from uuid import uuid4
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = 'blobs'
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def blob_name(digest, ext='.pdf', depth=None):
+    """按当前分层布局得到存储名称：每层取哈希的两位十六进制"""
+    if depth is None:
+        depth = settings.MEDIA_BLOB_SHARD_DEPTH
+    shards = [digest[i * 2:i * 2 + 2] for i in range(depth)]
+    return '/'.join([BLOB_DIR, *shards, f'{digest}{ext}'])
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_DIR + '/')
+
+
+def file_sha256(file_obj):
+    """计算文件对象的 SHA-256，计算后回到开头"""
+    digest = hashlib.sha256()
+    if hasattr(file_obj, 'seek'):
+        file_obj.seek(0)
+    if hasattr(file_obj, 'chunks'):
+        for chunk in file_obj.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    else:
+        for chunk in iter(lambda: file_obj.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    if hasattr(file_obj, 'seek'):
+        file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def path_sha256(path):
+    with open(path, 'rb') as f:
+        return file_sha256(f)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """忽略传入的文件名，只保留扩展名，按内容哈希决定存储位置"""
+
+    def get_available_name(self, name, max_length=None):
+        # 存储位置由内容决定，同名即同内容，不需要另找可用名称
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1].lower() or '.pdf'
+        digest = getattr(content, 'sha256', None) or file_sha256(content)
+        target = blob_name(digest, ext)
+        full_path = self.path(target)
+
+        if os.path.exists(full_path):
+            # 已有相同内容：更新修改时间，避免刚好被并发的删除流程当作无人引用的文件清理
+            os.utime(full_path)
+            return target
+
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        temp_path = f'{full_path}.{uuid4().hex}.tmp'
+        try:
+            moved = False
+            if hasattr(content, 'temporary_file_path'):
+                # 大文件上传已在磁盘上，同一文件系统时直接改名，不再复制
+                try:
+                    os.rename(content.temporary_file_path(), temp_path)
+                    moved = True
+                except OSError:
+                    pass
+            if not moved:
+                with open(temp_path, 'wb') as target_file:
+                    content.seek(0)
+                    for chunk in content.chunks(HASH_CHUNK_SIZE):
+                        target_file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            # 原子替换：并发写入相同内容时结果一致
+            os.replace(temp_path, full_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return target
+
+
+media_storage = ContentAddressedStorage()
+
+
+def blob_in_grace_period(name):
+    """最近被写入或复用过的文件暂不删除（可能有尚未提交的新引用）"""
+    try:
+        mtime = os.path.getmtime(media_storage.path(name))
+    except OSError:
+        return False
+    return time.time() - mtime < settings.MEDIA_BLOB_DELETE_GRACE
@@ -1,3 +1,345 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .bulk import approve_requests, delete_requests
+from .ledger import post_reimbursements
+from .models import (
+    AccountBook, ApprovalSummary, DeletedReimbursement, InvoiceFingerprint, PendingFileDeletion, ReimbursementRequest,
+    SearchToken, SpendingSummary,
+)
+from .reports import apply_bulk_requests, rebuild_summaries
+from .search import search, split_terms
+from .storage import media_storage
+from .uploads import complete_session, create_session, part_path, received_chunks, write_chunk
 
-# Create your tests here.
+
+class SummaryConsistencyTests(TestCase):
+    """增量维护的 SpendingSummary / ApprovalSummary 与全量重算的结果一致"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='x')
+
+    def new_request(self, amount='10.00', **kwargs):
+        kwargs.setdefault('real_name', '张三')
+        return ReimbursementRequest.objects.create(
+            user=self.user, reason='出差', amount=Decimal(amount), **kwargs,
+        )
+
+    def assertSummariesConsistent(self):
+        self.assertEqual(rebuild_summaries(check_only=True), {'spending': 0, 'approval': 0})
+
+    def test_save_and_delete_signals(self):
+        req = self.new_request()
+        self.assertSummariesConsistent()
+
+        # 审核通过：审核汇总计入，记账后记账汇总计入
+        req.status = 'approved'
+        req.save()
+        self.assertEqual(ApprovalSummary.objects.get().approved_count, 1)
+        self.assertEqual(SpendingSummary.objects.get().entry_count, 1)
+        self.assertSummariesConsistent()
+
+        req.amount = Decimal('25.50')
+        req.save()
+        self.assertEqual(ApprovalSummary.objects.get().amount, Decimal('25.50'))
+        self.assertSummariesConsistent()
+
+        # 从数据库重新加载的实例同样按原始值撤销
+        req = ReimbursementRequest.objects.get(pk=req.pk)
+        req.real_name = '李四'
+        req.is_taxi_invoice = True
+        req.save()
+        self.assertSummariesConsistent()
+
+        req.status = 'pending'
+        req.save()
+        self.assertFalse(ApprovalSummary.objects.exclude(approved_count=0).exists())
+        self.assertSummariesConsistent()
+
+        req.status = 'approved'
+        req.save()
+        self.assertSummariesConsistent()
+
+        req.delete()
+        self.assertFalse(ApprovalSummary.objects.exclude(approved_count=0).exists())
+        self.assertSummariesConsistent()
+
+    def test_account_book_signals(self):
+        entry = AccountBook.objects.create(
+            entry_date=timezone.now(), entry_type='income', real_name='财务', reason='拨款', amount=Decimal('100.00'),
+        )
+        self.assertSummariesConsistent()
+
+        entry.amount = Decimal('80.00')
+        entry.entry_type = 'expense'
+        entry.save()
+        self.assertSummariesConsistent()
+
+        entry.delete()
+        self.assertSummariesConsistent()
+
+    def test_bulk_approve_and_delete(self):
+        already = self.new_request('5.00', status='approved')
+        pending = [self.new_request(f'{i + 1}.00', real_name=f'员工{i % 2}') for i in range(4)]
+        rejected = self.new_request('7.00', status='rejected')
+        self.assertSummariesConsistent()
+
+        ids = [req.pk for req in pending] + [already.pk, rejected.pk]
+        self.assertEqual(approve_requests(ReimbursementRequest.objects.filter(pk__in=ids)), 5)
+        self.assertEqual(AccountBook.objects.count(), 6)
+        self.assertSummariesConsistent()
+
+        # 再次批量审核不会重复计入
+        self.assertEqual(approve_requests(ReimbursementRequest.objects.filter(pk__in=ids)), 0)
+        self.assertSummariesConsistent()
+
+        self.assertEqual(delete_requests(ReimbursementRequest.objects.filter(pk__in=ids[:3])), 3)
+        self.assertSummariesConsistent()
+
+        delete_requests(ReimbursementRequest.objects.all())
+        self.assertFalse(ApprovalSummary.objects.exclude(approved_count=0).exists())
+        self.assertSummariesConsistent()
+
+    def test_post_reimbursements(self):
+        requests = [self.new_request(f'{i + 1}.00') for i in range(3)]
+        # 绕过信号直接改为审核通过，审核汇总按批量审核的方式补记，再批量记账
+        ReimbursementRequest.objects.filter(pk__in=[req.pk for req in requests]).update(status='approved')
+        for req in requests:
+            req.refresh_from_db()
+        apply_bulk_requests([req.pk for req in requests])
+
+        self.assertEqual(len(post_reimbursements(requests)), 3)
+        self.assertSummariesConsistent()
+
+        # 已记账的申请不会重复记账
+        self.assertEqual(post_reimbursements(requests), [])
+        self.assertEqual(AccountBook.objects.count(), 3)
+        self.assertSummariesConsistent()
+
+
+class BulkActionTests(TestCase):
+    """后台批量审核/删除不逐行触发信号，结果应与逐行 save()/delete() 相同"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='x')
+
+    def make_requests(self, prefix):
+        requests = []
+        for i, (real_name, reason) in enumerate([('张三', '北京出差 taxi'), ('李四', '办公用品'), ('Wang 五', '会议-午餐')]):
+            req = ReimbursementRequest.objects.create(
+                user=self.user, real_name=real_name, reason=reason, amount=Decimal(f'{i + 1}.50'),
+                invoice_pdf=f'blobs/{prefix}/invoice-{i}.pdf',
+                itinerary_pdf=f'blobs/{prefix}/itinerary-{i}.pdf' if i % 2 == 0 else None,
+            )
+            InvoiceFingerprint.objects.create(kind='invoice_no', key=f'{prefix}{i}', request=req)
+            requests.append(req)
+        return requests
+
+    def state(self, prefix, requests):
+        """按请求顺序汇总各处的结果，文件名去掉两组之间不同的前缀"""
+        rows = []
+        for req in requests:
+            entry = AccountBook.objects.filter(reimbursement_id=req.pk).values_list(
+                'entry_type', 'real_name', 'reason', 'amount',
+            ).first()
+            entry_ids = AccountBook.objects.filter(reimbursement_id=req.pk).values_list('pk', flat=True)
+            rows.append((
+                entry,
+                sorted(SearchToken.objects.filter(kind='request', object_id=req.pk).values_list('token', flat=True)),
+                sorted(SearchToken.objects.filter(kind='entry', object_id__in=entry_ids).values_list('token', flat=True)),
+                DeletedReimbursement.objects.filter(request_id=req.pk).count(),
+                InvoiceFingerprint.objects.filter(request_id=req.pk).count(),
+            ))
+        deletions = sorted(
+            name.replace(f'/{prefix}/', '/')
+            for name in PendingFileDeletion.objects.filter(name__startswith=f'blobs/{prefix}/').values_list('name', flat=True)
+        )
+        return rows, deletions
+
+    def test_approve_matches_save(self):
+        single = self.make_requests('a')
+        bulk = self.make_requests('b')
+
+        for req in single:
+            req.status = 'approved'
+            req.save()
+        self.assertEqual(approve_requests(ReimbursementRequest.objects.filter(pk__in=[req.pk for req in bulk])), 3)
+
+        self.assertEqual(AccountBook.objects.count(), 6)
+        self.assertEqual(self.state('a', single), self.state('b', bulk))
+        self.assertEqual(rebuild_summaries(check_only=True), {'spending': 0, 'approval': 0})
+
+    def test_delete_matches_delete(self):
+        single = self.make_requests('a')
+        bulk = self.make_requests('b')
+        approve_requests(ReimbursementRequest.objects.all())
+        entries = set(AccountBook.objects.values_list('pk', flat=True))
+
+        for req in single:
+            ReimbursementRequest.objects.get(pk=req.pk).delete()
+        self.assertEqual(delete_requests(ReimbursementRequest.objects.filter(pk__in=[req.pk for req in bulk])), 3)
+
+        self.assertFalse(ReimbursementRequest.objects.exists())
+        # 记账记录保留，只解除与申请的关联
+        self.assertEqual(set(AccountBook.objects.filter(reimbursement__isnull=True).values_list('pk', flat=True)), entries)
+        single_state, bulk_state = self.state('a', single), self.state('b', bulk)
+        self.assertEqual(single_state, bulk_state)
+        self.assertEqual([row[1:] for row in bulk_state[0]], [([], [], 1, 0)] * 3)
+        self.assertEqual(len(bulk_state[1]), 5)
+        self.assertFalse(SearchToken.objects.filter(kind='request').exists())
+        self.assertEqual(rebuild_summaries(check_only=True), {'spending': 0, 'approval': 0})
+
+
+@override_settings(SEARCH_BACKEND='index')
+class SearchIndexTests(TestCase):
+    """倒排索引的搜索结果与逐行 icontains 相同"""
+
+    TEXTS = [
+        ('Wang五', '会议-午餐（北京）', ''),
+        ('张三丰', 'taxi/出租车 2024', 'ABC-123'),
+        ("O'Brien", '购买 USB-C 线缆', '备注：已核对'),
+        ('李四', '出差 Shanghai上海', 'ΟΔΟΣΑ'),
+        ('王小二', '办公用品', 'x'),
+    ]
+    TERMS = [
+        # 中英文混排
+        '五', 'g五', 'ng五', 'Wang五', '张三', '张', '三丰', 'hai上', 'Shanghai上海', '上海',
+        # 一个、两个字符
+        'a', 'A', '1', 'ab', 'AB', 'c-', '出',
+        # 标点
+        '会议-午餐', '午餐（北京', 'taxi/出', "O'B", 'usb-c', 'C-123', '：已', '备注：',
+        # 多个词、引号
+        '北京 会议', '"会议-午餐"', 'taxi 2024', '张三 bob',
+        # 大小写（含希腊文词尾 sigma）
+        'WANG', 'shanghai', 'ΟΔΟΣ', 'οδοσ',
+        # 提交用户名、无结果
+        'bob', '不存在',
+    ]
+
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='x')
+        self.requests = [
+            ReimbursementRequest.objects.create(
+                user=self.user, real_name=real_name, reason=reason, remarks=remarks, amount=Decimal('1.00'),
+            )
+            for real_name, reason, remarks in self.TEXTS
+        ]
+
+    def icontains(self, query):
+        queryset = ReimbursementRequest.objects.all()
+        for term in split_terms(query):
+            match = Q(real_name__icontains=term) | Q(reason__icontains=term) | Q(remarks__icontains=term)
+            queryset = queryset.filter(match | Q(user__username__icontains=term))
+        return set(queryset.values_list('pk', flat=True))
+
+    def assertSearchMatches(self, terms):
+        for term in terms:
+            with self.subTest(term=term):
+                expected = self.icontains(term)
+                self.assertEqual(set(search(ReimbursementRequest.objects.all(), term).values_list('pk', flat=True)), expected)
+
+    def test_matches_icontains(self):
+        self.assertSearchMatches(self.TERMS)
+
+    def test_text_edited_after_indexing(self):
+        req = self.requests[0]
+        req.reason = '培训费 Python'
+        req.save()
+        entry = AccountBook.objects.create(
+            entry_date=timezone.now(), real_name='会计', reason='初始事由', amount=Decimal('1.00'),
+        )
+        entry.reason = '修改后的事由'
+        entry.save()
+
+        self.assertSearchMatches(['会议', '午餐', '培训', 'python', 'Py', '培训费 Python'])
+        self.assertEqual(list(search(AccountBook.objects.all(), '修改后').values_list('pk', flat=True)), [entry.pk])
+        self.assertFalse(search(AccountBook.objects.all(), '初始').exists())
+
+        # 从数据库重新加载后修改
+        req = ReimbursementRequest.objects.get(pk=req.pk)
+        req.remarks = 'Wang五'
+        req.save()
+        self.assertSearchMatches(['Wang五', 'ng五', '培训'])
+
+
+class ChunkedUploadTests(TestCase):
+    """分片重传失败、.part 文件损坏时不会合并出错误的文件，续传后可以完成"""
+
+    CONTENT = b'%PDF-1.4 ' + bytes(range(256)) * 3
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, UPLOAD_CHUNK_SIZE=256)
+        self.settings_override.enable()
+        self.user = User.objects.create_user('carol', password='x')
+        # 不提供整个文件的哈希：合并时只能依靠分片校验
+        self.session = create_session(self.user, 'invoice', 'invoice.pdf', len(self.CONTENT))
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def chunk(self, index):
+        return self.CONTENT[index * 256:(index + 1) * 256]
+
+    def put(self, index, data=None, sha256=None):
+        data = self.chunk(index) if data is None else data
+        sha256 = sha256 or hashlib.sha256(self.chunk(index)).hexdigest()
+        write_chunk(self.session, index, io.BytesIO(data), sha256)
+
+    def upload_all(self):
+        for index in range(self.session.total_chunks):
+            self.put(index)
+
+    def assertCompletes(self):
+        session = complete_session(self.session)
+        self.assertEqual(session.status, 'complete')
+        with media_storage.open(session.file) as f:
+            self.assertEqual(f.read(), self.CONTENT)
+
+    def test_bad_retransmit_marks_chunk_missing(self):
+        self.upload_all()
+        bad = bytearray(self.chunk(1))
+        bad[10] ^= 0xFF
+        with self.assertRaises(ValidationError):
+            self.put(1, bytes(bad))
+        self.assertNotIn(1, received_chunks(self.session))
+        with self.assertRaises(ValidationError) as raised:
+            complete_session(self.session)
+        self.assertEqual(raised.exception.detail['missing'], ['1'])
+
+        self.put(1)
+        self.assertCompletes()
+
+    def test_truncated_retransmit_marks_chunk_missing(self):
+        self.upload_all()
+        with self.assertRaises(ValidationError):
+            self.put(2, self.chunk(2)[:100])
+        self.assertEqual(received_chunks(self.session), [0, 1, 3])
+
+        self.put(2)
+        self.assertCompletes()
+
+    def test_corrupted_part_file_resumes(self):
+        self.upload_all()
+        # 分片已登记，但 .part 文件中的数据被改动（如并发的重传覆盖）
+        with open(part_path(self.session), 'r+b') as f:
+            f.seek(256 * 3 + 5)
+            f.write(b'XX')
+        with self.assertRaises(ValidationError) as raised:
+            complete_session(self.session)
+        self.assertEqual(raised.exception.detail['missing'], ['3'])
+        # 撤销登记在报错前已提交，查询进度时该分片为未收到
+        self.assertEqual(received_chunks(self.session), [0, 1, 2])
+        self.assertTrue(os.path.exists(part_path(self.session)))
+
+        self.put(3)
+        self.assertCompletes()
@@ -0,0 +1,222 @@
+# reimbursement/uploads.py
+"""
+分片断点续传
+
+1. 创建上传会话：服务端按文件大小预分配 MEDIA_ROOT/uploads/<id>.part，返回分片大小和分片数
+2. 逐个 PUT 分片（请求头 X-Chunk-SHA256 为分片哈希），服务端按偏移量直接写入 .part 文件，哈希不符的分片需重传
+   （重传时先撤销原登记，重传失败的分片按未收到处理）
+3. 中断后查询会话状态，只补传缺少的分片
+4. 全部到齐后合并：按登记的哈希逐个校验分片（不符的撤销登记，客户端续传），客户端提供时再校验整文件哈希，
+   按内容寻址存入 blobs/（同一文件系统内直接改名，不再复制）
+5. 创建或修改报销申请时用 invoice_upload_id / itinerary_upload_id 引用完成的上传
+"""
+import hashlib
+import math
+import os
+import re
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ValidationError
+from .files import queue_file_deletions
+from .models import UploadChunk, UploadSession
+from .storage import media_storage
+
+UPLOAD_DIR = 'uploads'
+READ_SIZE = 64 * 1024
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def part_path(session):
+    return media_storage.path(f'{UPLOAD_DIR}/{session.pk}.part')
+
+
+def next_expiry():
+    return timezone.now() + timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+
+
+class AssembledFile(File):
+    """合并完成的 .part 文件，交给存储层时直接改名而不是复制"""
+
+    def __init__(self, path, sha256):
+        super().__init__(open(path, 'rb'), name=os.path.basename(path))
+        self.sha256 = sha256
+        self._path = path
+
+    def temporary_file_path(self):
+        return self._path
+
+
+def create_session(user, kind, filename, size, sha256=''):
+    if size <= 0 or size > settings.UPLOAD_MAX_SIZE:
+        raise ValidationError({'size': f'文件大小必须在 1 字节到 {settings.UPLOAD_MAX_SIZE // (1024 * 1024)}MB 之间'})
+    sha256 = (sha256 or '').lower()
+    if sha256 and not SHA256_RE.match(sha256):
+        raise ValidationError({'sha256': '文件哈希格式不正确'})
+    chunk_size = settings.UPLOAD_CHUNK_SIZE
+    session = UploadSession.objects.create(
+        user=user, kind=kind, filename=os.path.basename(filename)[:255] or 'upload.pdf', size=size,
+        chunk_size=chunk_size, total_chunks=math.ceil(size / chunk_size), sha256=sha256,
+        expires_at=next_expiry(),
+    )
+    path = part_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.truncate(size)
+    return session
+
+
+def expected_chunk_size(session, index):
+    if index == session.total_chunks - 1:
+        return session.size - session.chunk_size * index
+    return session.chunk_size
+
+
+def received_chunks(session):
+    return list(session.chunks.order_by('index').values_list('index', flat=True))
+
+
+def write_chunk(session, index, stream, expected_sha256):
+    """把请求体按偏移量写入 .part 文件，边写边计算哈希"""
+    if session.status != 'uploading':
+        raise ValidationError({'detail': '该上传已完成'})
+    if not 0 <= index < session.total_chunks:
+        raise ValidationError({'detail': f'分片序号超出范围（0 ~ {session.total_chunks - 1}）'})
+    expected_sha256 = (expected_sha256 or '').lower()
+    if not SHA256_RE.match(expected_sha256):
+        raise ValidationError({'detail': '缺少或无效的 X-Chunk-SHA256 请求头'})
+
+    # 先撤销该分片的登记：重传的数据直接写入 .part 文件，写入中断或校验失败时原来的数据已被覆盖，
+    # 该分片按未收到处理，客户端查询进度后重新上传
+    UploadChunk.objects.filter(session=session, index=index).delete()
+
+    expected_size = expected_chunk_size(session, index)
+    digest = hashlib.sha256()
+    written = 0
+    offset = index * session.chunk_size
+    try:
+        fd = os.open(part_path(session), os.O_WRONLY)
+    except FileNotFoundError:
+        raise NotFound('上传会话已过期，请重新上传')
+    try:
+        while True:
+            data = stream.read(READ_SIZE) if stream is not None else b''
+            if not data:
+                break
+            written += len(data)
+            if written > expected_size:
+                raise ValidationError({'detail': f'分片大小应为 {expected_size} 字节'})
+            digest.update(data)
+            os.pwrite(fd, data, offset)
+            offset += len(data)
+    finally:
+        os.close(fd)
+
+    if written != expected_size:
+        raise ValidationError({'detail': f'分片大小应为 {expected_size} 字节，实际收到 {written} 字节'})
+    if digest.hexdigest() != expected_sha256:
+        raise ValidationError({'detail': '分片校验失败，请重新上传该分片'})
+
+    UploadChunk.objects.update_or_create(
+        session=session, index=index, defaults={'size': written, 'sha256': expected_sha256},
+    )
+    UploadSession.objects.filter(pk=session.pk).update(expires_at=next_expiry())
+
+
+def verify_part(session, path):
+    """按登记的分片哈希逐段校验 .part 文件，同时计算整个文件的哈希，返回 (文件哈希, 校验失败的分片序号)"""
+    expected = dict(session.chunks.values_list('index', 'sha256'))
+    whole = hashlib.sha256()
+    corrupted = []
+    with open(path, 'rb') as f:
+        for index in range(session.total_chunks):
+            remaining = expected_chunk_size(session, index)
+            chunk = hashlib.sha256()
+            while remaining:
+                data = f.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                chunk.update(data)
+                whole.update(data)
+                remaining -= len(data)
+            if remaining or chunk.hexdigest() != expected.get(index):
+                corrupted.append(index)
+    return whole.hexdigest(), corrupted
+
+
+def assemble_part(session, path, digest):
+    """把校验通过的 .part 文件存入 blobs/，会话标记为完成"""
+    if session.sha256 and session.sha256 != digest:
+        raise ValidationError({'detail': '文件校验失败，请重新上传'})
+    # 扩展名固定为 .pdf（内容由序列化器校验），不取客户端文件名：与普通上传去重一致，也不允许任意扩展名
+    content = AssembledFile(path, digest)
+    try:
+        name = media_storage.save(f'{UPLOAD_DIR}/{session.pk}.pdf', content)
+    finally:
+        content.close()
+    if os.path.exists(path):
+        # 已有相同内容的文件，合并结果不需要保留
+        os.remove(path)
+
+    session.chunks.all().delete()
+    session.status = 'complete'
+    session.sha256 = digest
+    session.file = name
+    session.expires_at = next_expiry()
+    session.save(update_fields=['status', 'sha256', 'file', 'expires_at'])
+
+
+def complete_session(session):
+    """所有分片到齐后校验并合并为存储文件；重复调用直接返回结果"""
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.status == 'complete':
+            return session
+        missing = sorted(set(range(session.total_chunks)) - set(received_chunks(session)))
+        if missing:
+            raise ValidationError({'detail': f'还有 {len(missing)} 个分片未上传', 'missing': missing[:100]})
+
+        path = part_path(session)
+        if not os.path.exists(path):
+            raise NotFound('上传会话已过期，请重新上传')
+        # 客户端未提供整个文件的哈希时也逐个分片校验
+        digest, corrupted = verify_part(session, path)
+        if corrupted:
+            # 撤销登记随事务提交（事务结束后再报错），客户端续传这些分片
+            session.chunks.filter(index__in=corrupted).delete()
+        else:
+            assemble_part(session, path, digest)
+    if corrupted:
+        raise ValidationError({'detail': f'{len(corrupted)} 个分片校验失败，请重新上传', 'missing': corrupted[:100]})
+    return session
+
+
+def resolve_upload(user, upload_id, kind):
+    """报销申请引用的上传：必须属于当前用户且已合并完成"""
+    session = UploadSession.objects.filter(pk=upload_id, user=user, kind=kind, status='complete').first()
+    if session is None:
+        raise ValidationError({f'{kind}_upload_id': '上传不存在、未完成或已过期'})
+    return session
+
+
+def discard_session_files(session):
+    """删除会话的 .part 文件，并登记删除合并文件（未被任何申请引用时由 worker 删除）"""
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"删除分片文件失败: {session.pk}, 错误: {e}")
+    if session.file:
+        queue_file_deletions([session.file])
+
+
+def purge_expired_sessions():
+    """清理过期的上传会话（未完成的分片以及未被使用的合并文件）"""
+    deleted = 0
+    for session in UploadSession.objects.filter(expires_at__lt=timezone.now()).iterator():
+        session.delete()
+        deleted += 1
+    return deleted
@@ -3,11 +3,27 @@ from django.urls import path
 from .views import (
     ReimbursementListCreateView, 
     ReimbursementDetailView, 
-    NoticeListView
+    NoticeListView,
+    ReimbursementFileView,
+    StatusEventTicketView,
+    SpendingReportView,
+    ApprovalReportView,
+    UploadSessionCreateView,
+    UploadSessionDetailView,
+    UploadChunkView,
+    UploadSessionCompleteView
 )
 
 urlpatterns = [
     path('', ReimbursementListCreateView.as_view(), name='reimbursement-list-create'),
     path('<int:pk>/', ReimbursementDetailView.as_view(), name='reimbursement-detail'),
+    path('<int:pk>/files/<str:kind>/', ReimbursementFileView.as_view(), name='reimbursement-file'),
+    path('events/ticket/', StatusEventTicketView.as_view(), name='status-event-ticket'),
+    path('reports/spending/', SpendingReportView.as_view(), name='report-spending'),
+    path('reports/approvals/', ApprovalReportView.as_view(), name='report-approvals'),
     path('notices/', NoticeListView.as_view(), name='notice-list'),
+    path('uploads/', UploadSessionCreateView.as_view(), name='upload-create'),
+    path('uploads/<uuid:pk>/', UploadSessionDetailView.as_view(), name='upload-detail'),
+    path('uploads/<uuid:pk>/chunks/<int:index>/', UploadChunkView.as_view(), name='upload-chunk'),
+    path('uploads/<uuid:pk>/complete/', UploadSessionCompleteView.as_view(), name='upload-complete'),
 ]
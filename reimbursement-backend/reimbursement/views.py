@@ -1,36 +1,73 @@
 # reimbursement/views.py
 from rest_framework import generics, status
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, BasePermission
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.authentication import SessionAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework.exceptions import ValidationError
 from rest_framework_simplejwt.views import TokenObtainPairView
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import ReimbursementRequest, Notice
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import datetime, time, timedelta
+from .models import AccountBook, ArchivedRequest, ReimbursementRequest, Notice, UploadSession
 from .serializers import (
     ReimbursementRequestSerializer, 
+    ReimbursementListSerializer,
     ReimbursementRequestUpdateSerializer,
     UserRegistrationSerializer,
-    NoticeSerializer
+    NoticeSerializer,
+    UploadSessionSerializer
 )
+from .uploads import complete_session, create_session, write_chunk
+from .notices import cached_notices
+from .events import status_events_url
+from .auth import CachedJWTAuthentication, VersionedTokenObtainPairSerializer, remember_user
+from .sync import changes_since, decode_cursor, encode_cursor, list_etag, sync_state
+from .downloads import FILE_KINDS, can_view_all_files, check_download_token, serve_file
+from .archive import serve_archived
+from .pagination import SubmissionKeysetPagination
+from .search import search
+from .reports import (
+    APPROVAL_DIMENSIONS, SPENDING_DIMENSIONS, approval_report, can_view_reports, parse_group_by, parse_month,
+    spending_report
+)
+
+BOOLEAN_PARAMS = {'true': True, '1': True, 'false': False, '0': False}
+
+def start_of_day(value):
+    """日期当天零点（本地时区）"""
+    return timezone.make_aware(datetime.combine(value, time.min))
 
 class RestrictedTokenObtainPairView(TokenObtainPairView):
     """限制只有超级用户或管理员才能登录"""
+    serializer_class = VersionedTokenObtainPairSerializer
     
     def post(self, request, *args, **kwargs):
-        # 调用父类方法进行正常的 token 生成（包含认证失败处理）
-        response = super().post(request, *args, **kwargs)
+        # 与父类相同的认证流程（包含认证失败处理），认证得到的用户直接用于权限检查，不再按用户名查询
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
         
         # 仅在认证成功后再检查权限，避免用户名枚举攻击
-        if response.status_code == status.HTTP_200_OK:
-            username = request.data.get('username', '')
-            user = User.objects.filter(username=username).first()
-            if user is None or not (user.is_superuser or user.is_staff):
-                # 返回与认证失败相同的状态码，避免泄露用户是否存在
-                return Response(
-                    {"detail": "用户名或密码错误"},
-                    status=status.HTTP_401_UNAUTHORIZED
-                )
+        user = serializer.user
+        if not (user.is_superuser or user.is_staff):
+            # 返回与认证失败相同的状态码，避免泄露用户是否存在
+            return Response(
+                {"detail": "用户名或密码错误"},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
         
-        return response
+        remember_user(user)
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
 
 class UserRegistrationView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -38,10 +75,100 @@ class UserRegistrationView(generics.CreateAPIView):
     serializer_class = UserRegistrationSerializer
 
 class ReimbursementListCreateView(generics.ListCreateAPIView):
+    """
+    GET 默认按游标分页返回 {"next": ..., "results": [...], "sync_cursor": ...}
+    支持过滤：status、is_taxi_invoice、submitted_after、submitted_before（YYYY-MM-DD，含当天）
+    兼容模式：?paginate=false 返回旧版的完整列表
+    增量同步：?since=<sync_cursor> 返回 {"cursor": ..., "changed": [...], "deleted": [id, ...]}（忽略过滤条件）
+    所有 GET 响应带 ETag，数据未变化时返回 304
+    """
     permission_classes = [IsAuthenticated]
     serializer_class = ReimbursementRequestSerializer
+    pagination_class = SubmissionKeysetPagination
+    
     def get_queryset(self):
-        return ReimbursementRequest.objects.filter(user=self.request.user).order_by('-submission_date')
+        queryset = ReimbursementRequest.objects.filter(user=self.request.user)
+        if self.request.method == 'GET':
+            queryset = self.filter_list(queryset, self.request.query_params)
+        return queryset.order_by('-submission_date', '-id')
+    
+    def filter_list(self, queryset, params):
+        status_value = params.get('status')
+        if status_value:
+            if status_value not in dict(ReimbursementRequest.STATUS_CHOICES):
+                raise ValidationError({'status': '无效的审核状态'})
+            queryset = queryset.filter(status=status_value)
+        
+        taxi = params.get('is_taxi_invoice')
+        if taxi:
+            if taxi.lower() not in BOOLEAN_PARAMS:
+                raise ValidationError({'is_taxi_invoice': '请使用 true 或 false'})
+            queryset = queryset.filter(is_taxi_invoice=BOOLEAN_PARAMS[taxi.lower()])
+        
+        submitted_after = self.parse_date_param(params, 'submitted_after')
+        if submitted_after:
+            queryset = queryset.filter(submission_date__gte=start_of_day(submitted_after))
+        submitted_before = self.parse_date_param(params, 'submitted_before')
+        if submitted_before:
+            queryset = queryset.filter(submission_date__lt=start_of_day(submitted_before + timedelta(days=1)))
+        
+        # 按姓名、事由、备注搜索，多个词以空格分隔，需全部出现
+        query = params.get('search', '').strip()
+        if query:
+            queryset = search(queryset, query)
+        return queryset
+    
+    def parse_date_param(self, params, name):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({name: '日期格式应为 YYYY-MM-DD'})
+        return parsed
+    
+    def list(self, request, *args, **kwargs):
+        count, cursor = sync_state(request.user)
+        etag = list_etag(request, count, cursor)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            since = request.query_params.get('since')
+            if since:
+                response = self.delta_response(decode_cursor(since), cursor)
+            else:
+                response = self.list_response()
+                if isinstance(response.data, dict):
+                    response.data['sync_cursor'] = encode_cursor(cursor)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
+    def list_response(self):
+        """与 ListModelMixin.list 相同，但用只读快速路径序列化（输出相同）"""
+        rows = ReimbursementListSerializer.rows(self.filter_queryset(self.get_queryset()))
+        serializer = ReimbursementListSerializer(self.request)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(serializer.serialize(rows))
+        return self.get_paginated_response(serializer.serialize(page))
+    
+    def delta_response(self, since, cursor):
+        changed, deleted = changes_since(self.request.user, since)
+        return Response({
+            'cursor': encode_cursor(cursor),
+            'changed': ReimbursementListSerializer(self.request).serialize(ReimbursementListSerializer.rows(changed)),
+            'deleted': deleted,
+        })
+    
+    def paginate_queryset(self, queryset):
+        # 兼容旧版前端：显式要求时返回不分页的完整列表
+        if self.request.query_params.get('paginate', '').lower() in ('0', 'false'):
+            return None
+        return super().paginate_queryset(queryset)
+    
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
@@ -74,10 +201,158 @@ class ReimbursementDetailView(generics.RetrieveUpdateDestroyAPIView):
         # 返回完整的序列化数据
         return Response(ReimbursementRequestSerializer(instance).data)
 
+class StatusEventTicketView(APIView):
+    """
+    获取审核结果推送（SSE）的订阅地址：EventSource 无法携带 JWT，地址中带有签名的订阅凭证
+    重新获取时可传 last_event_id，连接后补发断线期间的变化
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        url = status_events_url(request.user, request.data.get('last_event_id'))
+        return Response({'url': url, 'expires_in': settings.STATUS_EVENT_TICKET_MAX_AGE})
+
+class CanViewReports(BasePermission):
+    def has_permission(self, request, view):
+        return can_view_reports(request.user)
+
+class ReportView(APIView):
+    """
+    统计报表的公共参数：group_by（逗号分隔的维度）、start / end（YYYY-MM，含）、person（姓名）
+    只查询汇总表；月份维度输出为 YYYY-MM；子类提供 report(group_by, filters, params) 返回汇总行
+    """
+    permission_classes = [IsAuthenticated, CanViewReports]
+    dimensions = {}
+    
+    def get(self, request):
+        params = request.query_params
+        try:
+            group_by = parse_group_by(params.get('group_by'), self.dimensions)
+        except ValueError as e:
+            raise ValidationError({'group_by': str(e)})
+        filters = {'start': self.parse_month_param(params, 'start'), 'end': self.parse_month_param(params, 'end'),
+                   'person': params.get('person') or None}
+        rows = self.report(group_by, filters, params)
+        for row in rows:
+            row['amount'] = f"{row['amount']:.2f}"  # 与其他接口一致，金额输出为字符串
+            if 'month' in row:
+                row['month'] = row['month'].strftime('%Y-%m')
+        return Response({'group_by': group_by, 'results': rows})
+    
+    def parse_month_param(self, params, name):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            return parse_month(value)
+        except ValueError:
+            raise ValidationError({name: '月份格式应为 YYYY-MM'})
+
+class SpendingReportView(ReportView):
+    """记账本金额汇总：可按 month / person / entry_type 分组，可按 entry_type 筛选"""
+    dimensions = SPENDING_DIMENSIONS
+    
+    def report(self, group_by, filters, params):
+        entry_type = params.get('entry_type')
+        if entry_type and entry_type not in dict(AccountBook.ENTRY_TYPE_CHOICES):
+            raise ValidationError({'entry_type': '无效的记账类型'})
+        return spending_report(group_by, entry_type=entry_type, **filters)
+
+class ApprovalReportView(ReportView):
+    """审核通过的报销汇总（笔数、金额、平均审核耗时）：可按 month / person / taxi 分组，可按 is_taxi_invoice 筛选"""
+    dimensions = APPROVAL_DIMENSIONS
+    
+    def report(self, group_by, filters, params):
+        taxi = params.get('is_taxi_invoice')
+        if taxi:
+            if taxi.lower() not in BOOLEAN_PARAMS:
+                raise ValidationError({'is_taxi_invoice': '请使用 true 或 false'})
+            taxi = BOOLEAN_PARAMS[taxi.lower()]
+        else:
+            taxi = None
+        return approval_report(group_by, taxi=taxi, **filters)
+
+class ReimbursementFileView(APIView):
+    """
+    下载申请的发票/行程单，满足其一即可：
+    带有效签名的链接（列表接口返回）、申请人本人（JWT）、有查看权限的后台管理员（后台登录状态）
+    已归档的申请按原申请ID从月度归档中读取
+    """
+    permission_classes = [AllowAny]
+    # 后台使用 session 登录，同时接受 session 认证
+    authentication_classes = [CachedJWTAuthentication, SessionAuthentication]
+    
+    def get(self, request, pk, kind):
+        if kind not in FILE_KINDS:
+            raise Http404
+        token = request.query_params.get('token')
+        if token and not check_download_token(token, pk, kind):
+            return Response({"detail": "下载链接无效或已过期，请刷新页面后重试。"}, status=status.HTTP_403_FORBIDDEN)
+        obj = ReimbursementRequest.objects.filter(pk=pk).first()
+        if obj is None:
+            obj = get_object_or_404(ArchivedRequest, original_id=pk)
+        if not token and not self.can_download(request, obj):
+            raise Http404
+        if isinstance(obj, ArchivedRequest):
+            return serve_archived(obj, kind)
+        return serve_file(request, obj, kind)
+    
+    def can_download(self, request, obj):
+        if request.user.is_authenticated and request.user.pk == obj.user_id:
+            return True
+        return can_view_all_files(request.user)
+
+class UploadSessionCreateView(generics.CreateAPIView):
+    """创建分片上传会话，返回分片大小和分片数"""
+    permission_classes = [IsAuthenticated]
+    serializer_class = UploadSessionSerializer
+    
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        serializer.instance = create_session(
+            self.request.user, data['kind'], data['filename'], data['size'], data.get('sha256', '')
+        )
+
+class UploadSessionDetailView(generics.RetrieveAPIView):
+    """查询上传进度（已收到的分片），用于中断后续传"""
+    permission_classes = [IsAuthenticated]
+    serializer_class = UploadSessionSerializer
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
+
+class UploadChunkView(UploadSessionDetailView):
+    """PUT 上传一个分片：请求体为分片原始数据，请求头 X-Chunk-SHA256 为分片哈希"""
+    http_method_names = ['put', 'options']
+    def put(self, request, *args, **kwargs):
+        session = self.get_object()
+        write_chunk(session, kwargs['index'], request.stream, request.headers.get('X-Chunk-SHA256'))
+        return Response({'index': kwargs['index'], 'received': session.chunks.count(), 'total_chunks': session.total_chunks})
+
+class UploadSessionCompleteView(UploadSessionDetailView):
+    """所有分片上传完成后合并文件，返回的 id 用作 invoice_upload_id / itinerary_upload_id"""
+    http_method_names = ['post', 'options']
+    def post(self, request, *args, **kwargs):
+        session = complete_session(self.get_object())
+        return Response(self.get_serializer(session).data)
+
 class NoticeListView(generics.ListAPIView):
-    """获取所有启用的注意事项（无需认证）"""
+    """获取所有启用的注意事项（无需认证）：响应缓存在共享缓存中，支持 ETag / Last-Modified 条件请求"""
     permission_classes = [AllowAny]
+    authentication_classes = []  # 不解析 JWT，匿名请求命中缓存时不查询数据库
     serializer_class = NoticeSerializer
     
     def get_queryset(self):
         return Notice.objects.filter(is_active=True)
+    
+    def list(self, request, *args, **kwargs):
+        entry = cached_notices()
+        response = get_conditional_response(
+            request, etag=entry['etag'], last_modified=int(entry['last_modified']),
+        )
+        if response is None:
+            response = HttpResponse(entry['body'], content_type='application/json')
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        # 每次都向服务器确认，内容未变时返回 304
+        response['Cache-Control'] = 'no-cache'
+        return response
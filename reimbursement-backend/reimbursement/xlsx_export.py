@@ -0,0 +1,97 @@
+# reimbursement/xlsx_export.py
+"""
+流式Excel导出：使用 openpyxl 的 write-only 模式逐行写入，行数据直接落到临时文件，
+内存占用与导出行数无关。
+
+用法：
+    columns = [ExcelColumn('日期', 15), ExcelColumn('金额', 12, number_format='#,##0.00')]
+    return xlsx_response('导出.xlsx', '工作表', columns, rows)
+"""
+import tempfile
+from collections import namedtuple
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.utils import get_column_letter
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# header: 表头文字；width: 列宽；number_format/alignment: 数据单元格样式（None 表示不设置）
+ExcelColumn = namedtuple('ExcelColumn', ['header', 'width', 'number_format', 'alignment'], defaults=[None, None])
+
+HEADER_FILL = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
+HEADER_FONT = Font(bold=True, color='FFFFFF', size=12)
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='center')
+
+
+class _StyledCellFactory:
+    """
+    为带样式的列预先准备好样式，每个单元格只做一次赋值
+    write-only 模式下样式只能设置在 WriteOnlyCell 上，无样式的列直接写原始值
+    """
+
+    def __init__(self, ws, columns):
+        self.ws = ws
+        self.styles = []
+        for column in columns:
+            if column.number_format or column.alignment:
+                self.styles.append((column.number_format or 'General', column.alignment))
+            else:
+                self.styles.append(None)
+
+    def row(self, values):
+        cells = []
+        for value, style in zip(values, self.styles):
+            if style is None:
+                cells.append(value)
+                continue
+            cell = WriteOnlyCell(self.ws, value=value)
+            cell.number_format = style[0]
+            if style[1] is not None:
+                cell.alignment = style[1]
+            cells.append(cell)
+        return cells
+
+
+def write_xlsx(target, sheet_title, columns, rows):
+    """
+    将 rows（可迭代的值列表）写入 target（文件路径或可写文件对象）
+    返回写入的数据行数
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title)
+
+    # 列宽必须在写入任何行之前设置
+    for index, column in enumerate(columns, 1):
+        ws.column_dimensions[get_column_letter(index)].width = column.width
+
+    header = []
+    for column in columns:
+        cell = WriteOnlyCell(ws, value=column.header)
+        cell.fill = HEADER_FILL
+        cell.font = HEADER_FONT
+        cell.alignment = HEADER_ALIGNMENT
+        header.append(cell)
+    ws.append(header)
+
+    factory = _StyledCellFactory(ws, columns)
+    count = 0
+    for values in rows:
+        ws.append(factory.row(values))
+        count += 1
+
+    wb.save(target)
+    return count
+
+
+def xlsx_response(filename, sheet_title, columns, rows):
+    """生成xlsx到临时文件后以文件流返回，临时文件在响应结束关闭时自动删除"""
+    spool = tempfile.TemporaryFile(suffix='.xlsx')
+    try:
+        write_xlsx(spool, sheet_title, columns, rows)
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+    return FileResponse(spool, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
@@ -0,0 +1,95 @@
+# reimbursement/zipstream.py
+"""
+流式ZIP打包：边读文件边产出ZIP数据块，内存占用与文件数量无关。
+
+用法：StreamingHttpResponse(stream_zip(entries), content_type='application/zip')
+其中 entries 为 (磁盘路径, 压缩包内路径) 的可迭代对象。
+"""
+import os
+import zipfile
+
+# 已经压缩过的格式直接存储，重复压缩只会浪费CPU
+STORED_EXTENSIONS = {'.pdf', '.jpg', '.jpeg', '.png', '.zip', '.gz'}
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class _StreamBuffer:
+    """只支持 write/tell 的缓冲区，ZipFile 会因此进入不可 seek 的流式模式（使用数据描述符）"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        """取出并清空当前缓冲的数据"""
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def unique_arcname(arcname, used):
+    """压缩包内重名时追加序号，例如 张三/a.pdf -> 张三/a (2).pdf"""
+    if arcname not in used:
+        used.add(arcname)
+        return arcname
+    stem, ext = os.path.splitext(arcname)
+    index = 2
+    while f'{stem} ({index}){ext}' in used:
+        index += 1
+    arcname = f'{stem} ({index}){ext}'
+    used.add(arcname)
+    return arcname
+
+
+def safe_folder_name(name):
+    """压缩包内的目录名不能包含路径分隔符"""
+    cleaned = str(name).replace('/', '_').replace('\\', '_').strip(' .')
+    return cleaned or '未命名'
+
+
+def stream_zip(entries, chunk_size=READ_CHUNK_SIZE):
+    """
+    逐个读取文件并产出ZIP字节块
+    读取失败的文件会被跳过（在写入本地文件头之前检查），不会破坏压缩包结构
+    """
+    buffer = _StreamBuffer()
+    used = set()
+    with zipfile.ZipFile(buffer, 'w', allowZip64=True) as zip_file:
+        for file_path, arcname in entries:
+            try:
+                zinfo = zipfile.ZipInfo.from_file(file_path, unique_arcname(arcname, used))
+                source = open(file_path, 'rb')
+            except OSError as e:
+                print(f"打包文件读取失败: {file_path}, 错误: {e}")
+                continue
+
+            ext = os.path.splitext(file_path)[1].lower()
+            zinfo.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+            with source, zip_file.open(zinfo, 'w') as target:
+                while True:
+                    chunk = source.read(chunk_size)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                    data = buffer.pop()
+                    if data:
+                        yield data
+            data = buffer.pop()
+            if data:
+                yield data
+    # 关闭时写入中央目录
+    data = buffer.pop()
+    if data:
+        yield data
@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reimbursement_system.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Django 初始化之后才能导入应用模块
+from reimbursement.events import STATUS_EVENTS_PATH, status_events_app  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # 审核结果推送（SSE）的长连接直接由协程处理，不占用 Django 的线程
+    if scope['type'] == 'http' and scope['path'] == STATUS_EVENTS_PATH:
+        return await status_events_app(scope, receive, send)
+    return await django_application(scope, receive, send)
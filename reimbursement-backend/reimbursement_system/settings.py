@@ -71,11 +71,47 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/api/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# 上传文件按内容去重存储；刚写入或被复用的文件在宽限期内不会因引用计数为零而删除（秒）
+MEDIA_BLOB_DELETE_GRACE = config('MEDIA_BLOB_DELETE_GRACE', default=600, cast=int)
+# 文件按哈希分层的目录层数（每层 256 个子目录）；修改后执行 manage.py reshard_media 迁移已有文件
+MEDIA_BLOB_SHARD_DEPTH = config('MEDIA_BLOB_SHARD_DEPTH', default=1, cast=int)
+# 分片断点续传：单个分片需小于 nginx 的 client_max_body_size
+UPLOAD_CHUNK_SIZE = config('UPLOAD_CHUNK_SIZE', default=2 * 1024 * 1024, cast=int)
+UPLOAD_MAX_SIZE = 50 * 1024 * 1024                                          # 与前端限制一致
+UPLOAD_SESSION_TTL = config('UPLOAD_SESSION_TTL', default=24 * 3600, cast=int)  # 最后一次上传后保留的秒数
+# 文件下载：权限校验后由 nginx 发送文件（X-Accel-Redirect 到 internal location），留空则由 Django 发送
+MEDIA_ACCEL_REDIRECT_PREFIX = config('MEDIA_ACCEL_REDIRECT_PREFIX', default='')
+DOWNLOAD_URL_MAX_AGE = config('DOWNLOAD_URL_MAX_AGE', default=3600, cast=int)  # 签名下载链接有效期（秒）
+# “我的报销”增量同步：重叠窗口覆盖并发事务的提交延迟（秒），删除记录保留天数
+DELTA_SYNC_OVERLAP = config('DELTA_SYNC_OVERLAP', default=60, cast=int)
+DELTA_SYNC_TOMBSTONE_DAYS = config('DELTA_SYNC_TOMBSTONE_DAYS', default=30, cast=int)
+# 审核结果推送（SSE，ASGI 入口）：每个进程轮询变化的间隔、空闲连接保活间隔（秒），订阅凭证有效期（秒）
+STATUS_EVENT_POLL_INTERVAL = config('STATUS_EVENT_POLL_INTERVAL', default=2.0, cast=float)
+STATUS_EVENT_KEEPALIVE = config('STATUS_EVENT_KEEPALIVE', default=20, cast=int)
+STATUS_EVENT_TICKET_MAX_AGE = config('STATUS_EVENT_TICKET_MAX_AGE', default=3600, cast=int)
+# 后台和列表接口的搜索（见 reimbursement/search.py）：auto 时 PostgreSQL 用 pg_trgm 索引，其他数据库用应用内倒排索引；
+# 可强制为 trigram / index，切换后执行 manage.py rebuild_search_index
+SEARCH_BACKEND = config('SEARCH_BACKEND', default='auto')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# 多个 gunicorn 进程共享的缓存（注意事项等），基于本地文件，无需额外服务
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache')),
+        'TIMEOUT': 300,
+    },
+    # 登录失败计数（django-axes）：本机 SQLite 文件，所有进程共享且计数原子递增，见 reimbursement/lockout.py
+    'axes': {
+        'BACKEND': 'reimbursement.local_cache.LocalCounterCache',
+        'LOCATION': config('AXES_CACHE_LOCATION', default=str(BASE_DIR / 'lockout' / 'axes.sqlite3')),
+        'TIMEOUT': None,
+    },
+}
+
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': ('rest_framework_simplejwt.authentication.JWTAuthentication',),
+    'DEFAULT_AUTHENTICATION_CLASSES': ('reimbursement.auth.CachedJWTAuthentication',),
 }
 
 SIMPLE_JWT = {
@@ -83,6 +119,11 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# JWT 认证的进程内用户缓存（见 reimbursement/auth.py）：有效期（秒）、检查其他进程失效通知的间隔（秒）、最多缓存的用户数
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=300, cast=int)
+AUTH_USER_CACHE_CHECK_INTERVAL = config('AUTH_USER_CACHE_CHECK_INTERVAL', default=1.0, cast=float)
+AUTH_USER_CACHE_SIZE = config('AUTH_USER_CACHE_SIZE', default=10000, cast=int)
+
 # CORS 配置 - 允许所有192网段访问
 CORS_ALLOWED_ORIGIN_REGEXES = [
     r"^http://211\.87\.236\.94(:\d+)?$",
@@ -120,8 +161,22 @@ AXES_COOLOFF_TIME = 24           # 锁定 24 小时
 AXES_LOCK_OUT_AT_FAILURE = True  # 超限后锁定
 AXES_LOCKOUT_PARAMETERS = ['ip_address', 'username']  # 按 IP + 用户名双维度锁定
 AXES_RESET_ON_SUCCESS = True     # 登录成功后自动解锁
+AXES_HANDLER = 'reimbursement.lockout.AuditedAxesCacheHandler'  # 失败计数放在缓存中，数据库只写审计记录
+AXES_CACHE = 'axes'
 
 AUTHENTICATION_BACKENDS = [
     'axes.backends.AxesStandaloneBackend',
     'django.contrib.auth.backends.ModelBackend',
 ]
+
+# ── 后台任务（manage.py run_jobs）────────────────────────────────────────
+JOB_ARTIFACT_ROOT = BASE_DIR / 'job_artifacts'   # 任务生成的导出文件，只能通过后台下载
+JOB_INLINE_LIMIT = config('JOB_INLINE_LIMIT', default=200, cast=int)  # 选中记录超过此数量时转为后台任务
+JOB_WORKER_PROCESSES = config('JOB_WORKER_PROCESSES', default=2, cast=int)
+# 待删除文件由 worker 空闲时批量删除：每批领取的数量、每批并发删除的线程数
+FILE_DELETE_BATCH_SIZE = config('FILE_DELETE_BATCH_SIZE', default=500, cast=int)
+FILE_DELETE_THREADS = config('FILE_DELETE_THREADS', default=8, cast=int)
+
+# ── 冷数据归档（manage.py archive_requests）──────────────────────────────
+ARCHIVE_ROOT = config('ARCHIVE_ROOT', default=str(BASE_DIR / 'archive'))   # 每月一个 zip，可放在廉价存储上
+ARCHIVE_AFTER_DAYS = config('ARCHIVE_AFTER_DAYS', default=3 * 365, cast=int)  # 提交超过此天数的已通过申请才归档
@@ -1,10 +1,11 @@
 # reimbursement_system/urls.py
-from django.urls import path, include
+import re
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenRefreshView
 from reimbursement.views import UserRegistrationView, RestrictedTokenObtainPairView
 from reimbursement.admin_site import restricted_admin_site
+from reimbursement.downloads import staff_media_view
 
 urlpatterns = [
     path(settings.ADMIN_URL, restricted_admin_site.urls),
@@ -14,5 +15,7 @@ urlpatterns = [
     path('api/reimbursements/', include('reimbursement.urls')),
 ]
 
-# 生产环境也需要提供media文件访问
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# 媒体文件不再公开访问：用户通过带签名的下载接口获取文件，MEDIA_URL 只对后台管理员开放
+urlpatterns += [
+    re_path(r'^%s(?P<name>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), staff_media_view, name='staff-media'),
+]
\ No newline at end of file